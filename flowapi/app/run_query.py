@@ -3,6 +3,7 @@
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
 import json
+from base64 import b64decode
 from functools import wraps
 
 from flask_jwt_extended import jwt_required, get_jwt_claims, get_jwt_identity
@@ -196,6 +197,27 @@ async def get_query(query_id):
         return jsonify({}), 404
 
 
+@blueprint.route("/tile/<query_id>/<int:z>/<int:x>/<int:y>")
+@check_claims("get_result")
+async def get_tile(query_id, z, x, y):
+    request.socket.send_json(
+        {"action": "get_tile", "query_id": query_id, "z": z, "x": x, "y": y}
+    )
+    message = await request.socket.recv_json()
+    current_app.logger.debug(f"Got tile reply for {query_id}/{z}/{x}/{y}")
+    if message["status"] == "done":
+        return (
+            b64decode(message["tile"]),
+            200,
+            {"Content-type": "application/vnd.mapbox-vector-tile"},
+        )
+    elif message["status"] == "rejected":
+        reason = message.get("reason", message.get("error"))
+        return jsonify({"status": "Error", "reason": reason}), 403
+    else:
+        return jsonify({}), 404
+
+
 async def generate_json(sql_query, query_id):
     """
     Generate a JSON representation of a query.
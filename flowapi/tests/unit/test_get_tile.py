@@ -0,0 +1,68 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import pytest
+from base64 import b64encode
+
+
+@pytest.mark.asyncio
+async def test_get_tile(app, dummy_zmq_server, access_token_builder):
+    """
+    Test that the protobuf tile bytes are returned when getting a tile.
+    """
+    client, db, log_dir = app
+    token = access_token_builder(
+        {
+            "modal_location": {
+                "permissions": {"get_result": True},
+                "spatial_aggregation": ["DUMMY_AGGREGATION"],
+            }
+        }
+    )
+
+    dummy_zmq_server.side_effect = (
+        {"id": 0, "query_kind": "modal_location"},
+        {"id": 0, "params": {"aggregation_unit": "DUMMY_AGGREGATION"}},
+        {"status": "done", "tile": b64encode(b"DUMMY_TILE").decode()},
+    )
+    response = await client.get(
+        f"/api/0/tile/0/1/0/1", headers={"Authorization": f"Bearer {token}"}
+    )
+    assert 200 == response.status_code
+    assert b"DUMMY_TILE" == await response.get_data()
+    assert "application/vnd.mapbox-vector-tile" == response.headers["content-type"]
+
+
+@pytest.mark.parametrize(
+    "reply, http_code",
+    [
+        ({"status": "rejected", "reason": "Still running."}, 403),
+        ({"status": "awol", "id": 0}, 404),
+    ],
+)
+@pytest.mark.asyncio
+async def test_get_tile_status(
+    reply, http_code, app, dummy_zmq_server, access_token_builder
+):
+    """
+    Test that the correct status code is returned when a tile is not available.
+    """
+    client, db, log_dir = app
+    token = access_token_builder(
+        {
+            "modal_location": {
+                "permissions": {"get_result": True},
+                "spatial_aggregation": ["DUMMY_AGGREGATION"],
+            }
+        }
+    )
+    dummy_zmq_server.side_effect = (
+        {"id": 0, "query_kind": "modal_location"},
+        {"id": 0, "params": {"aggregation_unit": "DUMMY_AGGREGATION"}},
+        reply,
+    )
+    response = await client.get(
+        f"/api/0/tile/0/1/0/1", headers={"Authorization": f"Bearer {token}"}
+    )
+    assert http_code == response.status_code
@@ -13,7 +13,7 @@ set -e
 export PGUSER="$POSTGRES_USER"
 EXTENSIONS=('postgis' 'postgis_topology' 'fuzzystrmatch' \
             'file_fdw' 'uuid-ossp' 'plpythonu' \
-            'tsm_system_rows' 'pgrouting' 'pldbgapi')
+            'tsm_system_rows' 'pgrouting' 'pldbgapi' 'btree_gist')
 
 #
 #  Create the 'template_postgis' template db
@@ -90,6 +90,10 @@ CREATE SCHEMA IF NOT EXISTS infrastructure;
         ON infrastructure.sites
         USING GIST (geom_point);
 
+    CREATE INDEX IF NOT EXISTS infrastructure_sites_geog_point_index
+        ON infrastructure.sites
+        USING GIST ((geom_point::geography));
+
     CREATE INDEX IF NOT EXISTS infrastructure_sites_geom_polygon_index
         ON infrastructure.sites
         USING GIST (geom_polygon);
@@ -132,9 +136,78 @@ CREATE SCHEMA IF NOT EXISTS infrastructure;
         ON infrastructure.cells
         USING GIST (geom_point);
 
+    CREATE INDEX IF NOT EXISTS infrastructure_cells_geog_point_index
+        ON infrastructure.cells
+        USING GIST ((geom_point::geography));
+
     CREATE INDEX IF NOT EXISTS infrastructure_cells_geom_polygon_index
         ON infrastructure.cells
         USING GIST (geom_polygon);
+
+    /*
+
+        The period for which each version of a site or cell
+        is in service is also held as a daterange in the `validity`
+        column, inclusive of both the first and last dates of service,
+        and unbounded where either is missing. Versions whose last date
+        of service is before their first are never in service, so have
+        an empty range. This is kept in step
+        with the date columns by a trigger, and indexed together with
+        the id so that joins matching events to the version in service
+        on the day of the event can use the `@>` containment operator.
+
+    */
+    CREATE OR REPLACE FUNCTION infrastructure.validity_range(first_service DATE, last_service DATE)
+        RETURNS DATERANGE AS
+    $$
+        SELECT CASE
+            WHEN last_service < first_service THEN 'empty'::daterange
+            ELSE daterange(first_service, last_service, '[]')
+        END;
+    $$ LANGUAGE sql IMMUTABLE;
+
+    CREATE OR REPLACE FUNCTION infrastructure.set_validity()
+        RETURNS TRIGGER AS
+    $$
+        BEGIN
+            NEW.validity := infrastructure.validity_range(NEW.date_of_first_service, NEW.date_of_last_service);
+            RETURN NEW;
+        END
+    $$ LANGUAGE plpgsql;
+
+    ALTER TABLE infrastructure.sites ADD COLUMN IF NOT EXISTS validity DATERANGE;
+    ALTER TABLE infrastructure.cells ADD COLUMN IF NOT EXISTS validity DATERANGE;
+
+    DROP TRIGGER IF EXISTS infrastructure_sites_validity ON infrastructure.sites;
+    CREATE TRIGGER infrastructure_sites_validity
+        BEFORE INSERT OR UPDATE OF date_of_first_service, date_of_last_service
+        ON infrastructure.sites
+        FOR EACH ROW EXECUTE PROCEDURE infrastructure.set_validity();
+
+    DROP TRIGGER IF EXISTS infrastructure_cells_validity ON infrastructure.cells;
+    CREATE TRIGGER infrastructure_cells_validity
+        BEFORE INSERT OR UPDATE OF date_of_first_service, date_of_last_service
+        ON infrastructure.cells
+        FOR EACH ROW EXECUTE PROCEDURE infrastructure.set_validity();
+
+    /*
+        The trigger only fires for rows written after it is created,
+        so fill in the validity of any rows which already exist.
+    */
+    UPDATE infrastructure.sites
+        SET validity = infrastructure.validity_range(date_of_first_service, date_of_last_service)
+        WHERE validity IS NULL;
+    UPDATE infrastructure.cells
+        SET validity = infrastructure.validity_range(date_of_first_service, date_of_last_service)
+        WHERE validity IS NULL;
+
+    CREATE INDEX IF NOT EXISTS infrastructure_sites_validity_index
+        ON infrastructure.sites
+        USING GIST (id, validity);
+
+    CREATE INDEX IF NOT EXISTS infrastructure_cells_validity_index
+        ON infrastructure.cells
+        USING GIST (id, validity);
     
     CREATE TABLE IF NOT EXISTS infrastructure.tacs(
 
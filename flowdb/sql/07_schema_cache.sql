@@ -7,7 +7,9 @@ file, You can obtain one at http://mozilla.org/MPL/2.0/.
 /*
     Cache schema
     ------------
-    Schema and tables for managing caching of queries.
+    Schema and tables for managing caching of queries. The backend
+    column records whether a query is stored as a table in this schema
+    ('postgres') or as a file in the parquet cache ('parquet').
 
 */
 
@@ -22,8 +24,11 @@ CREATE TABLE IF NOT EXISTS cache.cached
                                 schema CHARACTER VARYING,
                                 tablename CHARACTER VARYING,
                                 obj BYTEA,
+                                backend CHARACTER VARYING NOT NULL DEFAULT 'postgres',
                                 CONSTRAINT cache_pkey PRIMARY KEY (query_id)
                             );
+ALTER TABLE cache.cached
+    ADD COLUMN IF NOT EXISTS backend CHARACTER VARYING NOT NULL DEFAULT 'postgres';
 CREATE TABLE IF NOT EXISTS cache.dependencies
                             (
                                 query_id CHARACTER(32) NOT NULL,
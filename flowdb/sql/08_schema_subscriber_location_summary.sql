@@ -0,0 +1,60 @@
+/*
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+*/
+
+/*
+SUBSCRIBER LOCATION SUMMARY ------------------------------
+
+Optional summary of where subscribers were seen, with one
+row per subscriber, day, hour and location for each events
+table. The summary is populated at ingestion time by calling
+`summarise_subscriber_locations` for each ingested day, e.g.
+
+    SELECT summarise_subscriber_locations('calls', '2016-01-01');
+
+and is used by flowmachine in place of the raw events tables
+to count subscriber sightings when all the requested days
+have been summarised. Days and hours are in UTC, unless a
+different time zone is given to the summarise function.
+
+  - subscriber_location_summary:        event counts, and the
+                                        first and last event
+                                        times for each bucket.
+  - subscriber_location_summary_dates:  the days which have been
+                                        summarised for each
+                                        events table.
+
+-----------------------------------------------------------
+*/
+
+    CREATE TABLE IF NOT EXISTS events.subscriber_location_summary(
+
+        table_name TEXT NOT NULL,
+
+        msisdn TEXT NOT NULL,
+        date DATE NOT NULL,
+        hour SMALLINT NOT NULL,
+        location_id TEXT NOT NULL,
+
+        event_count INTEGER NOT NULL,
+        first_event TIMESTAMPTZ NOT NULL,
+        last_event TIMESTAMPTZ NOT NULL
+
+        );
+
+    CREATE INDEX IF NOT EXISTS subscriber_location_summary_date_index
+        ON events.subscriber_location_summary (table_name, date);
+
+    CREATE INDEX IF NOT EXISTS subscriber_location_summary_msisdn_index
+        ON events.subscriber_location_summary (msisdn);
+
+    CREATE TABLE IF NOT EXISTS events.subscriber_location_summary_dates(
+
+        table_name TEXT NOT NULL,
+        date DATE NOT NULL,
+
+        PRIMARY KEY (table_name, date)
+
+        );
@@ -0,0 +1,32 @@
+/*
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+*/
+
+/*
+SUBSCRIBER IDS -------------------------------------------
+
+Optional dictionary of integer keys for subscriber
+identifiers (msisdns, imeis and imsis), which flowmachine
+can use in place of the identifiers themselves when grouping,
+joining and deduplicating subscribers. Counterparts
+are encoded as msisdns.
+
+The dictionary is populated at ingestion time by calling
+`encode_subscribers` for each ingested day, e.g.
+
+    SELECT encode_subscribers('calls', '2016-01-01');
+
+-----------------------------------------------------------
+*/
+
+    CREATE TABLE IF NOT EXISTS events.subscriber_ids(
+
+        subscriber_id BIGSERIAL PRIMARY KEY,
+        identifier_type TEXT NOT NULL,
+        identifier TEXT NOT NULL,
+
+        UNIQUE (identifier_type, identifier)
+
+        );
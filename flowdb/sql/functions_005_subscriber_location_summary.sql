@@ -0,0 +1,55 @@
+/*
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+*/
+
+/******************************************************************************
+### summarise_subscriber_locations ###
+
+(Re)builds the rows of `events.subscriber_location_summary` for one day of one
+events table, and records that the day has been summarised. Returns the number
+of summary rows created.
+
+Days and hours are taken in the time zone given by `events_time_zone` (UTC by
+default), independent of the time zone of the session doing the ingest.
+flowmachine assumes the summary is in UTC.
+
+Should be called during ingestion, once the day's events have been loaded.
+
+******************************************************************************/
+CREATE OR REPLACE FUNCTION summarise_subscriber_locations(source_table TEXT, summary_date DATE,
+    events_time_zone TEXT DEFAULT 'UTC')
+    RETURNS BIGINT AS
+$$
+DECLARE
+    summarised BIGINT;
+BEGIN
+    DELETE FROM events.subscriber_location_summary AS s
+        WHERE s.table_name = source_table AND s.date = summary_date;
+
+    EXECUTE format(
+        'INSERT INTO events.subscriber_location_summary
+            (table_name, msisdn, date, hour, location_id, event_count, first_event, last_event)
+        SELECT
+            %L, msisdn, (datetime AT TIME ZONE %L)::date,
+            EXTRACT(hour FROM datetime AT TIME ZONE %L)::SMALLINT,
+            location_id, count(*), min(datetime), max(datetime)
+        FROM events.%I
+        WHERE datetime >= %L::timestamp AT TIME ZONE %L
+          AND datetime < %L::timestamp AT TIME ZONE %L
+          AND location_id IS NOT NULL
+          AND location_id != %L
+        GROUP BY 1, 2, 3, 4, 5',
+        source_table, events_time_zone, events_time_zone, source_table,
+        summary_date, events_time_zone, summary_date + 1, events_time_zone, ''
+    );
+    GET DIAGNOSTICS summarised = ROW_COUNT;
+
+    INSERT INTO events.subscriber_location_summary_dates (table_name, date)
+        VALUES (source_table, summary_date)
+        ON CONFLICT DO NOTHING;
+
+    RETURN summarised;
+END;
+$$  LANGUAGE plpgsql;
@@ -0,0 +1,55 @@
+/*
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+*/
+
+/******************************************************************************
+### encode_subscribers ###
+
+Adds any msisdns, counterpart msisdns, imeis and imsis seen on one day of an
+events table to `events.subscriber_ids`. Returns the number of new keys created.
+
+Should be called during ingestion, once the day's events have been loaded.
+
+******************************************************************************/
+CREATE OR REPLACE FUNCTION encode_subscribers(source_table TEXT, encode_date DATE)
+    RETURNS BIGINT AS
+$$
+DECLARE
+    identifier_column RECORD;
+    encoded BIGINT;
+    total_encoded BIGINT := 0;
+BEGIN
+    FOR identifier_column IN
+        SELECT c.column_name, v.identifier_type
+        FROM information_schema.columns AS c
+        JOIN (
+            VALUES
+                ('msisdn', 'msisdn'),
+                ('msisdn_counterpart', 'msisdn'),
+                ('imei', 'imei'),
+                ('imsi', 'imsi')
+            ) AS v(column_name, identifier_type)
+        ON c.column_name = v.column_name
+        WHERE c.table_schema = 'events' AND c.table_name = source_table
+    LOOP
+        EXECUTE format(
+            'INSERT INTO events.subscriber_ids (identifier_type, identifier)
+            SELECT DISTINCT %L, %I
+            FROM events.%I
+            WHERE datetime >= %L::timestamptz
+              AND datetime < %L::timestamptz
+              AND %I IS NOT NULL
+            ON CONFLICT DO NOTHING',
+            identifier_column.identifier_type, identifier_column.column_name,
+            source_table, encode_date, encode_date + 1,
+            identifier_column.column_name
+        );
+        GET DIAGNOSTICS encoded = ROW_COUNT;
+        total_encoded := total_encoded + encoded;
+    END LOOP;
+
+    RETURN total_encoded;
+END;
+$$  LANGUAGE plpgsql;
@@ -225,9 +225,12 @@ def write_day_csv(subscribers, cells, date, num_calls, call_seed, output_root_di
             CREATE INDEX ON events.calls_{table} (datetime);
             CLUSTER events.calls_{table} USING calls_{table}_msisdn_idx;
             ANALYZE events.calls_{table};
+            SELECT summarise_subscriber_locations('calls', '{date}');
+            SELECT encode_subscribers('calls', '{date}');
         COMMIT;""".format(
         output_root_dir=output_root_dir,
         table=date.strftime("%Y%m%d"),
+        date=date.strftime("%Y-%m-%d"),
         end_date=(date + datetime.timedelta(days=1)).strftime("%Y%m%d"),
     )
     return ingest_sql
@@ -129,6 +129,12 @@ CREATE INDEX ON events.sms_20160107 (datetime);
 ANALYZE events.sms_20160107;
 ANALYZE events.sms;
 
+SELECT encode_subscribers('sms', encode_date::date)
+    FROM generate_series('2016-01-01'::date, '2016-01-07'::date, '1 day') AS encode_date;
+
+SELECT summarise_subscriber_locations('sms', summary_date::date)
+    FROM generate_series('2016-01-01'::date, '2016-01-07'::date, '1 day') AS summary_date;
+
 INSERT INTO available_tables (table_name, has_locations, has_subscribers, has_counterparts) VALUES ('sms', true, true, true)
     ON conflict (table_name)
     DO UPDATE SET has_locations=EXCLUDED.has_locations, has_subscribers=EXCLUDED.has_subscribers, has_counterparts=EXCLUDED.has_counterparts;
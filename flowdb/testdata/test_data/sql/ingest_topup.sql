@@ -130,6 +130,9 @@ CREATE INDEX ON events.topups_20160107 (datetime);
 ANALYZE events.topups_20160107;
 ANALYZE events.topups;
 
+SELECT summarise_subscriber_locations('topups', summary_date::date)
+    FROM generate_series('2016-01-01'::date, '2016-01-07'::date, '1 day') AS summary_date;
+
 INSERT INTO available_tables (table_name, has_locations, has_subscribers) VALUES ('topups', true, true)
     ON conflict (table_name)
     DO UPDATE SET has_locations=EXCLUDED.has_locations, has_subscribers=EXCLUDED.has_subscribers;
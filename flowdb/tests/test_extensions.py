@@ -18,7 +18,8 @@ def activate_pg_cron(cursor):
 
 
 @pytest.mark.parametrize(
-    "extension", ["postgis", "file_fdw", "uuid-ossp", "pgrouting", "pldbgapi"]
+    "extension",
+    ["postgis", "file_fdw", "uuid-ossp", "pgrouting", "pldbgapi", "btree_gist"],
 )
 def test_extension_available(pg_available_extensions, extension):
     """Extension is installed."""
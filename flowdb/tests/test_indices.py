@@ -61,3 +61,30 @@ def query(cursor, infrastructure_table):
 def test_infrastructure_index(query, expected_index):
     """infrastructure.* tables contain spatial indices."""
     assert expected_index in query
+
+
+def test_infrastructure_validity_index(query, infrastructure_table):
+    """infrastructure.* tables contain an index on id and period of validity."""
+    assert f"infrastructure_{infrastructure_table}_validity_index" in query
+
+
+def test_infrastructure_validity(cursor, infrastructure_table):
+    """The validity range of infrastructure.* tables matches the dates of service."""
+    cursor.execute(
+        f"""
+        SELECT count(*) AS mismatched FROM infrastructure.{infrastructure_table}
+        WHERE validity IS DISTINCT FROM
+            CASE WHEN date_of_last_service < date_of_first_service THEN 'empty'::daterange
+                 ELSE daterange(date_of_first_service, date_of_last_service, '[]')
+            END
+        """
+    )
+    assert cursor.fetchone()["mismatched"] == 0
+
+
+def test_validity_of_inverted_dates_is_empty(cursor):
+    """Versions whose last date of service is before their first have an empty validity range."""
+    cursor.execute(
+        "SELECT isempty(infrastructure.validity_range('2016-01-02', '2016-01-01')) AS empty"
+    )
+    assert cursor.fetchone()["empty"]
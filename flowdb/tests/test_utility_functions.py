@@ -130,3 +130,70 @@ def test_grid(cursor):
     assert 121 == vals["count"]
     assert 1 == vals["avg"]
     assert 0 == vals["stddev"]
+
+
+def test_summarise_subscriber_locations(cursor):
+    """summarise_subscriber_locations() summarises a day of events by subscriber, hour and location."""
+    sql = """
+        CREATE TABLE events.calls_20170101 () INHERITS (events.calls);
+        INSERT INTO events.calls_20170101 (datetime, msisdn, location_id)
+            VALUES
+                ('2017-01-01 10:05:00', 'A', 'X'),
+                ('2017-01-01 10:45:00', 'A', 'X'),
+                ('2017-01-01 11:05:00', 'A', 'X'),
+                ('2017-01-01 10:15:00', 'B', NULL);
+        SELECT summarise_subscriber_locations('calls', '2017-01-01') AS summarised
+        """
+    cursor.execute(sql)
+    assert 2 == cursor.fetchall()[0]["summarised"]
+    cursor.execute(
+        """
+        SELECT msisdn, hour, location_id, event_count, first_event::time AS first_time
+        FROM events.subscriber_location_summary
+        WHERE table_name = 'calls' AND date = '2017-01-01'
+        ORDER BY hour
+        """
+    )
+    rows = [
+        (
+            r["msisdn"],
+            r["hour"],
+            r["location_id"],
+            r["event_count"],
+            str(r["first_time"]),
+        )
+        for r in cursor.fetchall()
+    ]
+    assert [("A", 10, "X", 2, "10:05:00"), ("A", 11, "X", 1, "11:05:00")] == rows
+    cursor.execute(
+        "SELECT count(*) FROM events.subscriber_location_summary_dates WHERE table_name = 'calls' AND date = '2017-01-01'"
+    )
+    assert 1 == cursor.fetchall()[0]["count"]
+
+
+def test_encode_subscribers(cursor):
+    """encode_subscribers() adds a key for every subscriber and counterpart seen on a day."""
+    sql = """
+        CREATE TABLE events.calls_20170101 () INHERITS (events.calls);
+        INSERT INTO events.calls_20170101 (datetime, msisdn, msisdn_counterpart, imei)
+            VALUES
+                ('2017-01-01 10:05:00', 'ENCODE_A', 'ENCODE_B', 'ENCODE_IMEI'),
+                ('2017-01-01 10:45:00', 'ENCODE_B', 'ENCODE_A', NULL);
+        SELECT encode_subscribers('calls', '2017-01-01') AS encoded
+        """
+    cursor.execute(sql)
+    assert 3 == cursor.fetchall()[0]["encoded"]
+    cursor.execute(
+        """
+        SELECT identifier_type, identifier FROM events.subscriber_ids
+        WHERE identifier LIKE 'ENCODE_%'
+        ORDER BY identifier
+        """
+    )
+    assert [
+        ("msisdn", "ENCODE_A"),
+        ("msisdn", "ENCODE_B"),
+        ("imei", "ENCODE_IMEI"),
+    ] == [(r["identifier_type"], r["identifier"]) for r in cursor.fetchall()]
+    cursor.execute("SELECT encode_subscribers('calls', '2017-01-01') AS encoded")
+    assert 0 == cursor.fetchall()[0]["encoded"]
@@ -0,0 +1,118 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Compare the plans of the current MostFrequentLocation and LastLocation queries
+against the window function formulations they replaced, reporting the number of
+scans, sorts, sort spill to disk and execution time of each.
+
+Run against a flowdb loaded with the synthetic dataset, with the usual
+flowmachine connection environment variables set:
+
+    python benchmarks/location_strategies.py 2016-01-01 2016-01-07 --level admin3
+"""
+
+import argparse
+
+import flowmachine
+from flowmachine.features import MostFrequentLocation, LastLocation
+from flowmachine.utils.utils import get_columns_for_level
+
+SCAN_NODES = {"Seq Scan", "Index Scan", "Index Only Scan", "Bitmap Heap Scan"}
+
+
+def window_most_frequent_location(query):
+    """
+    The previous MostFrequentLocation query, which sorted every event by time
+    before grouping and then ranked the totals with a window function.
+    """
+    rc = ", ".join(get_columns_for_level(query.level, query.column_name))
+    return f"""
+    SELECT ranked.subscriber, {rc}
+    FROM
+         (SELECT times_visited.subscriber, {rc},
+         row_number() OVER (PARTITION BY times_visited.subscriber
+          ORDER BY total DESC) AS rank
+         FROM (SELECT subscriber_locs.subscriber, {rc}, count(*) AS total
+               FROM ({query.subscriber_locs.get_query()} ORDER BY time) AS subscriber_locs
+               GROUP BY subscriber_locs.subscriber, {rc}) AS times_visited) AS ranked
+    WHERE rank = 1
+    """
+
+
+def window_last_location(query):
+    """
+    The previous LastLocation query, which ranked every event with a window function.
+    """
+    rc = ",".join(get_columns_for_level(query.level, query.column_name))
+    return f"""
+    SELECT final_time.subscriber, {rc}
+    FROM
+         (SELECT subscriber_locs.subscriber, time, {rc},
+         row_number() OVER (PARTITION BY subscriber_locs.subscriber ORDER BY time DESC)
+             AS rank
+         FROM ({query.subscriber_locs.get_query()}) AS subscriber_locs) AS final_time
+    WHERE rank = 1
+    """
+
+
+def plan_summary(sql):
+    """
+    Run a query under EXPLAIN ANALYZE and summarise its plan.
+
+    Parameters
+    ----------
+    sql : str
+        Query to explain
+
+    Returns
+    -------
+    dict
+        Number of scan and sort nodes, kB of sort spilled to disk and
+        execution time in ms.
+    """
+    plan = flowmachine.core.Query.connection.fetch(
+        f"EXPLAIN (ANALYZE, FORMAT JSON) {sql}"
+    )[0][0][0]
+    summary = {"scans": 0, "sorts": 0, "sort_spill_kb": 0}
+    nodes = [plan["Plan"]]
+    while nodes:
+        node = nodes.pop()
+        if node["Node Type"] in SCAN_NODES:
+            summary["scans"] += 1
+        if node["Node Type"] == "Sort":
+            summary["sorts"] += 1
+            if node.get("Sort Space Type") == "Disk":
+                summary["sort_spill_kb"] += node["Sort Space Used"]
+        nodes.extend(node.get("Plans", []))
+    summary["execution_ms"] = plan["Execution Time"]
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("start")
+    parser.add_argument("stop")
+    parser.add_argument("--level", default="admin3")
+    args = parser.parse_args()
+
+    flowmachine.connect()
+    for query_class, previous in (
+        (MostFrequentLocation, window_most_frequent_location),
+        (LastLocation, window_last_location),
+    ):
+        query = query_class(args.start, args.stop, level=args.level)
+        for name, sql in (
+            ("window", previous(query)),
+            ("current", query.get_query()),
+        ):
+            summary = plan_summary(sql)
+            print(
+                f"{query_class.__name__:>20} {name:>8}: "
+                + ", ".join(f"{k}={v}" for k, v in summary.items())
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Time constructing and hashing queries for a range of feature classes, and
+hashing a deep chain of unions from scratch.
+
+Run against a flowdb loaded with the synthetic dataset, with the usual
+flowmachine connection environment variables set:
+
+    python benchmarks/query_construction.py 2016-01-01 2016-01-07 --repeat 5
+"""
+
+import argparse
+import gc
+import statistics
+import time
+
+import flowmachine
+from flowmachine.core import CustomQuery
+from flowmachine.core.query import Query
+from flowmachine.utils import list_of_dates
+from flowmachine.features import (
+    daily_location,
+    DayTrajectories,
+    HomeLocation,
+    RadiusOfGyration,
+    SubscriberDegree,
+    TotalActivePeriodsSubscriber,
+    TotalSubscriberEvents,
+)
+
+
+def constructors(start, stop):
+    """
+    Functions constructing a query of each feature class being timed.
+    """
+
+    def daily_locations():
+        return [daily_location(d, level="admin3") for d in list_of_dates(start, stop)]
+
+    return {
+        "daily_location": lambda: daily_location(start, level="admin3"),
+        "TotalSubscriberEvents": lambda: TotalSubscriberEvents(start, stop),
+        "SubscriberDegree": lambda: SubscriberDegree(start, stop),
+        "RadiusOfGyration": lambda: RadiusOfGyration(start, stop),
+        "HomeLocation": lambda: HomeLocation(*daily_locations()),
+        "DayTrajectories": lambda: DayTrajectories(*daily_locations()),
+        "TotalActivePeriodsSubscriber": lambda: TotalActivePeriodsSubscriber(start, 7),
+    }
+
+
+def time_construction(construct, repeat):
+    """
+    Time constructing a query and computing its md5, with no previously
+    constructed queries for it to be shared with.
+
+    Parameters
+    ----------
+    construct : function
+        Function returning a new query
+    repeat : int
+        Number of times to construct the query
+
+    Returns
+    -------
+    list of float
+        Time taken, in ms, for each repeat
+    """
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        Query._QueryPool.clear()
+        began = time.perf_counter()
+        construct().md5
+        timings.append((time.perf_counter() - began) * 1000)
+    return timings
+
+
+def time_deep_hash(depth):
+    """
+    Time hashing a chain of `depth` nested unions whose hashes have been
+    forgotten, as after unpickling.
+
+    Returns
+    -------
+    float
+        Time taken in ms
+    """
+    query = CustomQuery("SELECT 1 AS x")
+    queries = [query]
+    for i in range(depth):
+        query = query.union(CustomQuery(f"SELECT {i} AS x"))
+        queries.append(query)
+    for q in queries:
+        del q._md5
+    began = time.perf_counter()
+    query.md5
+    return (time.perf_counter() - began) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("start")
+    parser.add_argument("stop")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--depth", type=int, default=2000)
+    args = parser.parse_args()
+
+    flowmachine.connect()
+    for name, construct in constructors(args.start, args.stop).items():
+        timings = time_construction(construct, args.repeat)
+        print(
+            f"{name:>30}: min={min(timings):.1f}ms, "
+            f"median={statistics.median(timings):.1f}ms"
+        )
+    print(
+        f"{'union chain of ' + str(args.depth):>30}: {time_deep_hash(args.depth):.1f}ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
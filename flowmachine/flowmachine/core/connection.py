@@ -10,6 +10,8 @@ regarding the database.
 import os
 import re
 import datetime
+import threading
+import uuid
 import warnings
 import logging
 from functools import reduce
@@ -26,6 +28,140 @@ from cachetools import cached, TTLCache
 logger = logging.getLogger("flowmachine").getChild(__name__)
 
 
+class SchemaCatalog:
+    """
+    In-memory catalog of the columns of database tables, and of which
+    tables have been recorded in the cache metadata. Shared by everything
+    using a connection, so that constructing Table objects doesn't need to
+    query the database each time.
+
+    Tables are only added to the catalog once they have been seen to exist,
+    so tables created elsewhere are picked up as soon as they are asked for.
+    Tables dropped or altered outside flowmachine must be removed using
+    `invalidate`.
+
+    Parameters
+    ----------
+    connection : Connection
+        Connection to look up tables through
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self._columns = {}
+        self._recorded = {}
+        self._lock = threading.Lock()
+
+    def columns(self, name, schema="public"):
+        """
+        Get the columns of a table.
+
+        Parameters
+        ----------
+        name : str
+            Name of the table
+        schema : str, default 'public'
+            Schema the table belongs to
+
+        Returns
+        -------
+        tuple of str
+            The table's column names in order, empty if the table doesn't exist.
+        """
+        try:
+            return self._columns[(schema, name)]
+        except KeyError:
+            pass
+        columns = tuple(
+            row[0]
+            for row in self.connection.fetch(
+                f"""SELECT column_name FROM information_schema.columns
+                WHERE table_name = '{name}' AND table_schema = '{schema}'
+                ORDER BY ordinal_position"""
+            )
+        )
+        if columns:
+            with self._lock:
+                self._columns[(schema, name)] = columns
+        return columns
+
+    def has_table(self, name, schema="public"):
+        """
+        Check if a table exists, using the catalog where possible.
+
+        Parameters
+        ----------
+        name : str
+            Name of the table
+        schema : str, default 'public'
+            Schema the table belongs to
+
+        Returns
+        -------
+        bool
+            True if the table exists
+        """
+        return len(self.columns(name, schema)) > 0
+
+    def is_recorded(self, query_id, name, schema="public"):
+        """
+        Check whether a query over a table is known to be recorded in the
+        cache metadata.
+
+        Parameters
+        ----------
+        query_id : str
+            md5 of the query
+        name : str
+            Name of the table
+        schema : str, default 'public'
+            Schema the table belongs to
+
+        Returns
+        -------
+        bool
+        """
+        return query_id in self._recorded.get((schema, name), ())
+
+    def mark_recorded(self, query_id, name, schema="public"):
+        """
+        Note that a query over a table has been recorded in the cache metadata.
+
+        Parameters
+        ----------
+        query_id : str
+            md5 of the query
+        name : str
+            Name of the table
+        schema : str, default 'public'
+            Schema the table belongs to
+        """
+        with self._lock:
+            self._recorded.setdefault((schema, name), set()).add(query_id)
+
+    def invalidate(self, name=None, schema=None):
+        """
+        Remove tables from the catalog, so that they are looked up again
+        next time they are needed.
+
+        Parameters
+        ----------
+        name : str, optional
+            Name of the table to remove. If not given, all tables in the
+            schema are removed.
+        schema : str, optional
+            Schema to remove tables from. If neither name nor schema are
+            given, the whole catalog is cleared.
+        """
+        with self._lock:
+            for cache in (self._columns, self._recorded):
+                for table_schema, table_name in list(cache.keys()):
+                    if (schema is None or schema == table_schema) and (
+                        name is None or name == table_name
+                    ):
+                        del cache[(table_schema, table_name)]
+
+
 class Connection:
     """
     Establishes a connection with the database and provide methods for
@@ -113,6 +249,7 @@ class Connection:
         )
 
         self.inspector = sqlalchemy.inspect(self.engine)
+        self.catalog = SchemaCatalog(self)
         self.max_connections = pool_size + overflow
         if self.max_connections > os.cpu_count():
             warnings.warn(
@@ -162,6 +299,37 @@ class Connection:
                 rs = curs.fetchall()
         return rs
 
+    def fetch_batches(self, query, batch_size=100000):
+        """
+        Fetch the result of a query through a server-side cursor, a batch of
+        rows at a time, so that the full result never has to be held in memory.
+
+        Parameters
+        ----------
+        query : str
+            SQL query string.
+        batch_size : int, default 100000
+            Number of rows to fetch at a time
+
+        Yields
+        ------
+        list of tuple
+            A batch of rows
+        """
+        with self.engine.connect() as con:
+            with con.begin():
+                # A named cursor is held on the server, and sends rows as
+                # they are fetched
+                cursor = con.connection.cursor(name=f"batches_{uuid.uuid4().hex}")
+                cursor.itersize = batch_size
+                cursor.execute(query)
+                while True:
+                    batch = cursor.fetchmany(batch_size)
+                    if not batch:
+                        break
+                    yield batch
+                cursor.close()
+
     def tables(self, regex=None):
         """
         Parameters
@@ -246,8 +414,8 @@ class Connection:
         return len(self.fetch(sql)) == 1
 
     @cached(
-        TTLCache(5, 120)
-    )  # Only a few base tables to cache, two minutes seems reasonable to balance db access against speed boost
+        TTLCache(64, 120)
+    )  # Looked up whenever sql is built for an events table, so room for every table and schema, two minutes seems reasonable to balance db access against speed boost
     def _known_dates(self, table, schema):
         """
         Get the dates of all subtables for a table.
@@ -276,6 +444,31 @@ class Connection:
             if x.isnumeric()
         )
 
+    @cached(
+        TTLCache(64, 120)
+    )  # Looked up whenever sql is built for subscriber locations, two minutes seems reasonable to balance db access against speed boost
+    def _summarised_dates(self, table):
+        """
+        Get the dates for which a table has been summarised in
+        events.subscriber_location_summary.
+
+        Parameters
+        ----------
+        table : str
+            Name of the events table
+
+        Returns
+        -------
+        list of datetime
+
+        """
+        if not self.has_table("subscriber_location_summary_dates", "events"):
+            return []
+        qur = f"""SELECT date FROM events.subscriber_location_summary_dates
+                  WHERE table_name='{table}'
+                  ORDER BY date;"""
+        return [datetime.datetime(d.year, d.month, d.day) for d, in self.fetch(qur)]
+
     @cached(
         TTLCache(1024, 120)
     )  # Many dates to cache, two minutes seems reasonable to balance db access against speed boost
@@ -490,6 +683,31 @@ class Connection:
         """
         return self.fetch("select location_table();")[0][0]
 
+    @cached(
+        TTLCache(5, 120)
+    )  # Only a few infrastructure tables, two minutes seems reasonable to balance db access against speed boost
+    def infrastructure_version(self, table):
+        """
+        Get a fingerprint of the contents of an infrastructure table, which
+        changes whenever a cell or site is added, removed, or re-versioned.
+
+        Parameters
+        ----------
+        table : str
+            Fully qualified name of the infrastructure table, e.g. infrastructure.cells
+
+        Returns
+        -------
+        str
+            md5 hash of the ids, versions and periods of validity in the table
+        """
+        return self.fetch(
+            f"""SELECT md5(coalesce(string_agg(
+                    concat_ws(':', id, version, validity),
+                    ',' ORDER BY id, version), ''))
+                FROM {table}"""
+        )[0][0]
+
     @property
     def available_tables(self):
         return self.fetch("select * from available_tables();")
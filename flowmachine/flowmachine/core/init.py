@@ -39,6 +39,9 @@ def connect(
     pool_overflow=None,
     redis_host=None,
     redis_port=None,
+    cache_unlogged=None,
+    cache_tablespace=None,
+    parquet_cache_dir=None,
     conn=None,
 ):
     """
@@ -68,6 +71,16 @@ def connect(
         Hostname for redis server.
     redis_port : int, default 6379
         Port the redis server is available on
+    cache_unlogged : bool, default False
+        Set to True to create cache tables as UNLOGGED, which skips writing them
+        to the write-ahead log. Unlogged tables are emptied if the database crashes,
+        and are not replicated.
+    cache_tablespace : str, default None
+        Name of an existing tablespace to create cache tables and their indexes in.
+        If none, the database default is used.
+    parquet_cache_dir : str, default None
+        Directory to cache the results of query classes using the parquet cache
+        backend in.
     conn : flowmachine.core.Connection
         Optionally provide an existing Connection object to use, overriding any the db options specified here.
 
@@ -139,6 +152,23 @@ def connect(
         else redis_port
     )
 
+    cache_unlogged = (
+        getsecret("CACHE_UNLOGGED", os.getenv("CACHE_UNLOGGED", "false")).lower()
+        == "true"
+        if cache_unlogged is None
+        else cache_unlogged
+    )
+    cache_tablespace = (
+        getsecret("CACHE_TABLESPACE", os.getenv("CACHE_TABLESPACE", None))
+        if cache_tablespace is None
+        else cache_tablespace
+    )
+    parquet_cache_dir = (
+        getsecret("PARQUET_CACHE_DIR", os.getenv("PARQUET_CACHE_DIR", None))
+        if parquet_cache_dir is None
+        else parquet_cache_dir
+    )
+
     try:
         Query.connection
         warnings.warn("FlowMachine already started. Ignoring.")
@@ -151,6 +181,9 @@ def connect(
         Query.connection = conn
 
         Query.redis = redis.StrictRedis(host=redis_host, port=redis_port)
+        Query.cache_unlogged = cache_unlogged
+        Query.cache_tablespace = cache_tablespace
+        Query.parquet_cache_dir = parquet_cache_dir
         _start_threadpool(pool_size)
 
         print(f"FlowMachine version: {flowmachine.__version__}")
@@ -143,6 +143,7 @@ class JoinToLocation(Query):
                         id AS location_id,
                         date_of_first_service,
                         date_of_last_service,
+                        validity,
                         ST_X(geom_point::geometry) AS lon,
                         ST_Y(geom_point::geometry) AS lat
                    FROM {self.location_table_fqn}"""
@@ -155,6 +156,7 @@ class JoinToLocation(Query):
                         id AS site_id,
                         date_of_first_service,
                         date_of_last_service,
+                        validity,
                         version,
                         ST_X(geom_point::geometry) AS lon,
                         ST_Y(geom_point::geometry) AS lat
@@ -167,6 +169,7 @@ class JoinToLocation(Query):
                         s.id AS site_id,
                         s.date_of_first_service AS date_of_first_service,
                         s.date_of_last_service AS date_of_last_service,
+                        coalesce(s.validity, daterange(NULL, NULL)) AS validity,
                         s.version as version,
                         ST_X(s.geom_point::geometry) AS lon,
                         ST_Y(s.geom_point::geometry) AS lat
@@ -183,6 +186,7 @@ class JoinToLocation(Query):
                         id AS location_id,
                         date_of_first_service,
                         date_of_last_service,
+                        validity,
                         version,
                         ST_X(geom_point::geometry) AS lon,
                         ST_Y(geom_point::geometry) AS lat
@@ -192,6 +196,15 @@ class JoinToLocation(Query):
             else:
                 raise ValueError("Versioned cell level is unavailable.")
 
+    @property
+    def index_cols(self):
+        ixen = super().index_cols
+        if {"subscriber", self.time_col}.issubset(self.column_names):
+            # Lets the first or last location of each subscriber be read
+            # in order, rather than sorting every row
+            ixen.append(["subscriber", self.time_col])
+        return ixen
+
     @property
     def column_names(self) -> List[str]:
         right_columns = get_columns_for_level(self.level, self.column_name)
@@ -221,10 +234,7 @@ class JoinToLocation(Query):
         ON
             l.location_id = sites.location_id
           AND
-            l.{self.time_col}::date BETWEEN coalesce(sites.date_of_first_service,
-                                                '-infinity'::timestamptz) AND
-                                       coalesce(sites.date_of_last_service,
-                                                'infinity'::timestamptz)
+            sites.validity @> l.{self.time_col}::date
         """
 
         return sql
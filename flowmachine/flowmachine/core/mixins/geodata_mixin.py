@@ -11,6 +11,9 @@ Mixin providing utility methods for geographic type queries.
 """
 import json
 import logging
+from threading import Lock
+
+from cachetools import LRUCache
 
 from flowmachine.utils.utils import proj4string
 
@@ -22,7 +25,64 @@ try:
 except ImportError:
     logger.debug("GeoPandas not found. `to_geopandas` unavailable.")
 
-from ...core.query import Query
+from ...core.query import Query, on_cache_invalidation
+
+# Rendered FeatureCollections, shared between all geographic queries and keyed
+# on (query md5, proj4 string, simplification tolerance, precision). Bounded by
+# number of entries because admin3 level payloads run to several megabytes.
+_geojson_cache = LRUCache(maxsize=64)
+_geojson_cache_lock = Lock()
+
+# Rendered Mapbox vector tiles, keyed on (query md5, z, x, y, extent, buffer, layer)
+_mvt_cache = LRUCache(maxsize=4096)
+_mvt_cache_lock = Lock()
+
+
+@on_cache_invalidation
+def _evict_rendered(query_id):
+    """
+    Remove any geojson or tiles rendered for a query from the shared caches.
+
+    Parameters
+    ----------
+    query_id : str
+        md5 of the query
+    """
+    for cache, lock in (
+        (_geojson_cache, _geojson_cache_lock),
+        (_mvt_cache, _mvt_cache_lock),
+    ):
+        with lock:
+            for key in [k for k in cache.keys() if k[0] == query_id]:
+                del cache[key]
+
+
+# Half the width of the web mercator (EPSG:3857) world, in metres
+_WEB_MERCATOR_EXTENT = 20037508.342789244
+
+
+def _tile_bounds(z, x, y):
+    """
+    Get the web mercator bounding box of a tile in the XYZ tiling scheme.
+
+    Parameters
+    ----------
+    z, x, y : int
+        Zoom level, column and row of the tile
+
+    Returns
+    -------
+    tuple of float
+        xmin, ymin, xmax, ymax of the tile in EPSG:3857
+    """
+    z, x, y = int(z), int(x), int(y)
+    n_tiles = 2 ** z
+    if z < 0 or not (0 <= x < n_tiles and 0 <= y < n_tiles):
+        raise ValueError(f"Tile {z}/{x}/{y} does not exist.")
+    size = 2 * _WEB_MERCATOR_EXTENT / n_tiles
+    xmin = -_WEB_MERCATOR_EXTENT + x * size
+    ymax = _WEB_MERCATOR_EXTENT - y * size
+    return xmin, ymax - size, xmin + size, ymax
 
 
 class GeoDataMixin:
@@ -162,7 +222,7 @@ class GeoDataMixin:
         cols = list(set(self.column_names + ["gid", "geom"]))
         return joined_query, cols
 
-    def _geo_json_query(self, crs=None):
+    def _geo_json_query(self, crs=None, simplify=None, precision=None):
         """
         Create a query which will transform this one into a geojson
         featurecollection.
@@ -171,6 +231,11 @@ class GeoDataMixin:
         ----------
         crs : int or str
             Optionally give an integer srid, or valid proj4 string to transform output to 
+        simplify : float, optional
+            Tolerance passed to ST_SimplifyPreserveTopology, in the units of
+            the output crs. If not given, geometries are returned unsimplified.
+        precision : int, optional
+            Maximum number of decimal places in the output coordinates.
         
         Returns
         -------
@@ -180,17 +245,21 @@ class GeoDataMixin:
         crs_trans = "geom"
         if crs:
             crs_trans = "ST_Transform(geom::geometry, {0!r})".format(crs)
+        geom = crs_trans
+        if simplify:
+            geom = f"ST_SimplifyPreserveTopology({crs_trans}::geometry, {float(simplify)!r})"
+        digits = "" if precision is None else f", {int(precision)}"
         joined_query, cols = self._geo_augmented_query()
         properties = [f"'{col}', {col}" for col in cols if col not in ("geom", "gid")]
         properties.append(
-            f"'centroid', ST_AsGeoJSON(ST_Centroid({crs_trans}::geometry))::json"
+            f"'centroid', ST_AsGeoJSON(ST_Centroid({crs_trans}::geometry){digits})::json"
         )
 
         json_query = f"""
                 SELECT json_build_object(
                     'type',       'Feature',
                     'id',         gid,
-                    'geometry',   ST_AsGeoJSON({crs_trans})::json,
+                    'geometry',   ST_AsGeoJSON({geom}{digits})::json,
                     'properties', json_build_object({", ".join(properties)})
                 ) FROM (
                             SELECT * 
@@ -199,7 +268,83 @@ class GeoDataMixin:
 
         return json_query
 
-    def to_geojson_file(self, filename, crs=None):
+    def _geo_mvt_query(self, z, x, y, extent=4096, buffer=256, layer=None):
+        """
+        Create a query which will render the part of this one falling within
+        a tile as a Mapbox vector tile.
+
+        Parameters
+        ----------
+        z, x, y : int
+            Zoom level, column and row of the tile in the XYZ tiling scheme
+        extent : int, default 4096
+            Size of the tile in tile coordinate space
+        buffer : int, default 256
+            Size of the buffer around the tile in tile coordinate space
+        layer : str, optional
+            Name of the layer in the tile, defaults to the class name
+
+        Returns
+        -------
+        str
+            A query returning a single bytea containing the tile
+        """
+        xmin, ymin, xmax, ymax = _tile_bounds(z, x, y)
+        layer = layer or self.__class__.__name__
+        joined_query, cols = self._geo_augmented_query()
+        properties = ", ".join(f"J.{col}" for col in cols if col != "geom")
+
+        return f"""
+                WITH bounds AS (
+                    SELECT ST_MakeEnvelope({xmin!r}, {ymin!r}, {xmax!r}, {ymax!r}, 3857) AS geom
+                ),
+                tile AS (
+                    SELECT ST_AsMVTGeom(
+                               ST_Transform(J.geom::geometry, 3857), bounds.geom,
+                               {int(extent)}, {int(buffer)}, true
+                           ) AS geom,
+                           {properties}
+                    FROM ({joined_query}) AS J, bounds
+                    WHERE ST_Intersects(J.geom::geometry, ST_Transform(bounds.geom, 4326))
+                )
+                SELECT ST_AsMVT(tile.*, '{layer}', {int(extent)}, 'geom') FROM tile
+        """
+
+    def to_mvt(self, z, x, y, extent=4096, buffer=256, layer=None):
+        """
+        Render the part of this query falling within a tile as a Mapbox vector tile.
+
+        Parameters
+        ----------
+        z, x, y : int
+            Zoom level, column and row of the tile in the XYZ tiling scheme
+        extent : int, default 4096
+            Size of the tile in tile coordinate space
+        buffer : int, default 256
+            Size of the buffer around the tile in tile coordinate space
+        layer : str, optional
+            Name of the layer in the tile, defaults to the class name
+
+        Returns
+        -------
+        bytes
+            The protobuf encoded tile, which will be empty if no features
+            fall within it.
+        """
+        key = (self.md5, int(z), int(x), int(y), int(extent), int(buffer), layer)
+        with _mvt_cache_lock:
+            tile = _mvt_cache.get(key)
+        if tile is None:
+            sql = self._geo_mvt_query(
+                z, x, y, extent=extent, buffer=buffer, layer=layer
+            )
+            tile = bytes(self.connection.fetch(sql)[0][0] or b"")
+            if self._cache:
+                with _mvt_cache_lock:
+                    _mvt_cache[key] = tile
+        return tile
+
+    def to_geojson_file(self, filename, crs=None, simplify=None, precision=None):
         """
         Export this query to a GeoJson FeatureCollection file.
         
@@ -209,25 +354,37 @@ class GeoDataMixin:
             File to save resulting geojson as.
         crs : int or str
             Optionally give an integer srid, or valid proj4 string to transform output to
+        simplify : float, optional
+            Optionally simplify geometries to this tolerance, in units of the output crs
+        precision : int, optional
+            Optionally limit coordinates to this many decimal places
         """
         with open(filename, "w") as fout:
-            json.dump(self.to_geojson(crs=crs), fout)
+            json.dump(
+                self.to_geojson(crs=crs, simplify=simplify, precision=precision), fout
+            )
 
-    def to_geojson_string(self, crs=None):
+    def to_geojson_string(self, crs=None, simplify=None, precision=None):
         """
         Parameters
         ----------
         crs : int or str
             Optionally give an integer srid, or valid proj4 string to transform output to
+        simplify : float, optional
+            Optionally simplify geometries to this tolerance, in units of the output crs
+        precision : int, optional
+            Optionally limit coordinates to this many decimal places
         
         Returns
         -------
         str
             A string containing the this query as a GeoJson FeatureCollection. 
         """
-        return json.dumps(self.to_geojson(crs=crs))
+        return json.dumps(
+            self.to_geojson(crs=crs, simplify=simplify, precision=precision)
+        )
 
-    def _get_geojson(self, proj4):
+    def _get_geojson(self, proj4, simplify=None, precision=None):
         """
         Helper function that actually retrieves geojson from the
         database, and sets a proj4 string on it.
@@ -237,6 +394,10 @@ class GeoDataMixin:
         ----------
         proj4 : str
             Valid proj4 string to project to.
+        simplify : float, optional
+            Simplification tolerance, in units of the output crs.
+        precision : int, optional
+            Maximum number of decimal places in the output coordinates.
 
         Returns
         -------
@@ -244,7 +405,10 @@ class GeoDataMixin:
 
         """
         features = [
-            x[0] for x in self.connection.fetch(self._geo_json_query(crs=proj4))
+            x[0]
+            for x in self.connection.fetch(
+                self._geo_json_query(crs=proj4, simplify=simplify, precision=precision)
+            )
         ]
         js = {
             "properties": {"crs": proj4},
@@ -253,12 +417,28 @@ class GeoDataMixin:
         }
         return js
 
-    def to_geojson(self, crs=None):
+    def _geojson_cache_key(self, proj4, simplify=None, precision=None):
+        """
+        Key under which the geojson for this query is held in the shared cache.
+        """
+        return (
+            self.md5,
+            proj4,
+            None if not simplify else float(simplify),
+            None if precision is None else int(precision),
+        )
+
+    def to_geojson(self, crs=None, simplify=None, precision=None):
         """
         Parameters
         ----------
         crs : int or str
             Optionally give an integer srid, or valid proj4 string to transform output to
+        simplify : float, optional
+            Optionally simplify geometries (using ST_SimplifyPreserveTopology)
+            to this tolerance, given in units of the output crs
+        precision : int, optional
+            Optionally limit coordinates to this many decimal places
         
         Returns
         -------
@@ -266,47 +446,33 @@ class GeoDataMixin:
             This query as a GeoJson FeatureCollection in dict form. 
         """
         proj4_string = proj4string(self.connection, crs)
-        try:
-            js = self._geojson.get(proj4_string, self._get_geojson(proj4_string))
-        except AttributeError:
-            self._geojson = {}
-            js = self._get_geojson(proj4_string)
-        if self._cache:
-            self._geojson[proj4_string] = js
+        key = self._geojson_cache_key(proj4_string, simplify, precision)
+        with _geojson_cache_lock:
+            js = _geojson_cache.get(key)
+        if js is None:
+            js = self._get_geojson(proj4_string, simplify=simplify, precision=precision)
+            if self._cache:
+                with _geojson_cache_lock:
+                    _geojson_cache[key] = js
         return js.copy()
 
-    def __getstate__(self):
-        """
-        Removes properties which should not be pickled, or hashed. Override
-        this method in your subclass if you need to add more.
-
-        Overridden to remove geojson storage.
-
-        Returns
-        -------
-        dict
-            A picklable and hash-safe copy of this objects internal dict.
-        """
-        state = super().__getstate__()
-        try:
-            del state["_geojson"]
-        except:
-            pass  # Not a problem if it doesn't exist
-        return state
-
     def turn_off_caching(self):
         """
-        Turn off caching. Overridden to also remove cached geojson.
+        Turn off caching. Overridden to also remove cached geojson and tiles.
         """
-        self._geojson = {}
+        _evict_rendered(self.md5)
         super().turn_off_caching()
 
-    def to_geopandas(self, crs=None):
+    def to_geopandas(self, crs=None, simplify=None, precision=None):
         """
         Parameters
         ----------
         crs : int or str
             Optionally give an integer srid, or valid proj4 string to transform output to
+        simplify : float, optional
+            Optionally simplify geometries to this tolerance, in units of the output crs
+        precision : int, optional
+            Optionally limit coordinates to this many decimal places
 
         Returns
         -------
@@ -314,7 +480,7 @@ class GeoDataMixin:
             This query as a GeoPandas GeoDataFrame.
         """
 
-        js = self.to_geojson(crs=crs)
+        js = self.to_geojson(crs=crs, simplify=simplify, precision=precision)
         gdf = geopandas.GeoDataFrame.from_features(js["features"])
         gdf.crs = js["properties"]["crs"]
 
@@ -9,17 +9,94 @@ Mixin providing utility methods for graph type queries.
 
 """
 import warnings
+
+import numpy as np
 import networkx as nx
 
 
+def _fetch_batches(query, columns, batch_size=100000):
+    """
+    Read some columns of a query's result through a server-side cursor, a
+    batch of rows at a time.
+
+    Parameters
+    ----------
+    query : flowmachine.core.Query
+        Query to read
+    columns : list of str
+        Columns to read
+    batch_size : int, default 100000
+        Number of rows to fetch at a time
+
+    Yields
+    ------
+    list of tuple
+        A batch of rows
+    """
+    sql = "SELECT {} FROM ({}) AS edges".format(", ".join(columns), query.get_query())
+    yield from query.connection.fetch_batches(sql, batch_size)
+
+
+def _edge_columns(query, source, target):
+    """
+    Check the source and target columns, defaulting to the first two.
+    """
+    if bool(source) != bool(target):
+        raise ValueError(
+            "Both source and target must be specified, " + "or neither should."
+        )
+    if not source:
+        source, target = query.column_names[:2]
+    return source, target
+
+
+def _edge_arrays(query, source=None, target=None, weight=None, batch_size=100000):
+    """
+    Read the edges of a query into arrays. See GraphMixin.to_edge_arrays.
+    """
+    source, target = _edge_columns(query, source, target)
+    columns = [source, target] + ([] if weight is None else [weight])
+    positions = {}
+    sources, targets, weights = [], [], []
+    for batch in _fetch_batches(query, columns, batch_size):
+        sources.append(
+            np.array(
+                [positions.setdefault(r[0], len(positions)) for r in batch],
+                dtype=np.int64,
+            )
+        )
+        targets.append(
+            np.array(
+                [positions.setdefault(r[1], len(positions)) for r in batch],
+                dtype=np.int64,
+            )
+        )
+        if weight is not None:
+            weights.append(np.array([r[2] for r in batch], dtype=float))
+    nodes = np.empty(len(positions), dtype=object)
+    nodes[:] = list(positions)
+    sources = np.concatenate(sources) if sources else np.empty(0, dtype=np.int64)
+    targets = np.concatenate(targets) if targets else np.empty(0, dtype=np.int64)
+    if weight is not None:
+        weights = np.concatenate(weights) if weights else np.empty(0, dtype=float)
+    else:
+        weights = None
+    return nodes, sources, targets, weights
+
+
 class GraphMixin:
     """
     Supplies utility functions for graph-like queries, specifically
     the to_networkx function which returns a networkx graph which
     can then be analysed further using standard libraries.
+
+    Edges are read from the database in batches, so the whole edge
+    list is never held in memory alongside the graph.
     """
 
-    def to_networkx(self, source=None, target=None, directed_graph=True):
+    def to_networkx(
+        self, source=None, target=None, directed_graph=True, batch_size=100000
+    ):
         """
         By default, the leftmost column will be used as the source, the next
         leftmost as the target, and any other columns will become edge attributes.
@@ -35,6 +112,8 @@ class GraphMixin:
             Optionally specify the column name for the target nodes.
         directed_graph : bool, default True
             Set to false to return an undirected graph.
+        batch_size : int, default 100000
+            Number of edges to read from the database at a time.
 
         Returns
         -------
@@ -43,37 +122,106 @@ class GraphMixin:
 
         """
 
-        if bool(source) != bool(target):
-            raise ValueError(
-                "Both source and target must be specified, " + "or neither should."
+        source, target = _edge_columns(self, source, target)
+
+        g = nx.DiGraph() if directed_graph else nx.Graph()
+
+        attributes = [c for c in self.column_names if c not in (source, target)]
+        n_rows = 0
+        for batch in _fetch_batches(self, [source, target] + attributes, batch_size):
+            n_rows += len(batch)
+            g.add_edges_from(
+                (row[0], row[1], dict(zip(attributes, row[2:]))) for row in batch
+            )
+        # Duplicate edges are merged as they are added, so there are fewer
+        # edges in the graph than rows read
+        if g.number_of_edges() < n_rows:
+            warnings.warn(
+                " Duplicate edges in {} graph. Edge "
+                "information will be lost.".format(
+                    "directed" if directed_graph else "undirected"
+                ),
+                stacklevel=2,
             )
+        return g
+
+    def to_edge_arrays(self, source=None, target=None, weight=None, batch_size=100000):
+        """
+        Get the edges of this query as integer arrays, for building large
+        graphs without networkx.
 
-        if not source:
-            source, target = self.column_names[:2]
-
-        df = self.get_dataframe()
-        if directed_graph:
-            if (df.groupby([source, target])[source].count() - 1).any():
-                warnings.warn(
-                    " Duplicate edges in directed graph. Edge "
-                    "information will be lost.",
-                    stacklevel=2,
-                )
-
-            g_type = nx.DiGraph()
-
-        else:
-            df["links"] = [tuple(sorted(x)) for x in zip(df[source], df[target])]
-            if (df.groupby(["links"])[source].count() - 1).any():
-                warnings.warn(
-                    " Duplicate edges in undirected graph. Edge "
-                    "information will be lost.",
-                    stacklevel=2,
-                )
-
-            del df["links"]
-            g_type = nx.Graph()
-
-        return nx.from_pandas_edgelist(
-            df, source, target, edge_attr=True, create_using=g_type
+        Parameters
+        ----------
+        source : str, optional
+            Optionally specify the column name for the source nodes.
+        target : str, optional
+            Optionally specify the column name for the target nodes.
+        weight : str, optional
+            Column to use as the edge weights.
+        batch_size : int, default 100000
+            Number of edges to read from the database at a time.
+
+        Returns
+        -------
+        nodes : numpy.ndarray
+            Labels of the nodes
+        sources, targets : numpy.ndarray
+            Positions in nodes of the ends of each edge
+        weights : numpy.ndarray or None
+            Weight of each edge, if weight was given
+        """
+        return _edge_arrays(
+            self, source=source, target=target, weight=weight, batch_size=batch_size
         )
+
+    def to_scipy_sparse(
+        self,
+        source=None,
+        target=None,
+        weight=None,
+        directed_graph=True,
+        batch_size=100000,
+    ):
+        """
+        Get this query as a sparse adjacency matrix. Requires scipy.
+
+        Parameters
+        ----------
+        source : str, optional
+            Optionally specify the column name for the source nodes.
+        target : str, optional
+            Optionally specify the column name for the target nodes.
+        weight : str, optional
+            Column to use as the edge weights. If not given, each edge
+            has weight 1.
+        directed_graph : bool, default True
+            Set to false to return a symmetric matrix.
+        batch_size : int, default 100000
+            Number of edges to read from the database at a time.
+
+        Returns
+        -------
+        nodes : numpy.ndarray
+            Labels of the nodes corresponding to the rows and columns
+        scipy.sparse.csr_matrix
+            The weights of the edges between each pair of nodes. Weights
+            of duplicate edges are summed.
+        """
+        from scipy.sparse import coo_matrix
+
+        nodes, sources, targets, weights = self.to_edge_arrays(
+            source=source, target=target, weight=weight, batch_size=batch_size
+        )
+        if weights is None:
+            weights = np.ones(len(sources))
+        if not directed_graph:
+            loops = sources == targets
+            sources, targets = (
+                np.concatenate([sources, targets[~loops]]),
+                np.concatenate([targets, sources[~loops]]),
+            )
+            weights = np.concatenate([weights, weights[~loops]])
+        matrix = coo_matrix(
+            (weights, (sources, targets)), shape=(len(nodes), len(nodes))
+        ).tocsr()
+        return nodes, matrix
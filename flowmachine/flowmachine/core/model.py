@@ -72,7 +72,7 @@ def model_result(f):
         mr = ModelResult(self, run_args=args, run_kwargs=kwargs)
         if mr.is_stored:
             return mr
-        mr._df = f(self, *args, **kwargs)
+        mr._set_result(f(self, *args, **kwargs))
         return mr
 
     return new_f
@@ -17,11 +17,22 @@ from typing import List
 import pandas as pd
 
 from flowmachine.utils.utils import rlock
-from .query import Query
+from .query import Query, on_cache_invalidation
 
 logger = logging.getLogger("flowmachine").getChild(__name__)
 
 
+@on_cache_invalidation
+def _forget_loaded_columns(query_id):
+    """
+    Discard any columns a live model result has read from its cache table,
+    when that table is invalidated.
+    """
+    result = Query._QueryPool.get(query_id)
+    if result is not None:
+        result.__dict__.pop("_columns", None)
+
+
 class ModelResult(Query):
     """
     Class representing a result calculated outside of the database.
@@ -37,17 +48,52 @@ class ModelResult(Query):
         List of named arguments passed in the Model.run() method
     df : pandas.DataFrame, optional
         Results of model.run()
+
+    Notes
+    -----
+    Results which take up more than `spill_threshold` bytes of memory are
+    stored in the cache as soon as they are set, and read back from there
+    rather than held in memory. The cache table then holds the only copy of
+    the result, so it is not invalidated along with the model's inputs.
     """
 
+    spill_threshold = 256 * 1024 ** 2
+
     def __init__(self, parent, run_args=None, run_kwargs=None, df=None):
         self.model_dependencies, self.model_args = self._split_query_objects(parent)
         self.parent_class = parent.__class__.__name__
         self.run_args = run_args
         self.run_kwargs = run_kwargs
-        if df is not None:
-            self._df = df
 
         super().__init__()
+        if df is not None:
+            self._set_result(df)
+
+    def _set_result(self, df):
+        """
+        Set the result of the model run, storing it in the cache and
+        dropping it from memory if it is larger than `spill_threshold`.
+
+        Parameters
+        ----------
+        df : pandas.DataFrame
+            Results of model.run()
+        """
+        self._df = df
+        size = df.memory_usage(index=True, deep=True).sum()
+        if size > self.spill_threshold:
+            logger.debug(
+                "Result uses {} bytes, storing and dropping from memory.".format(size)
+            )
+            self._spilled = True
+            self.store().result()
+            del self._df
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        state.pop("_columns", None)
+        state.pop("_spilled", None)
+        return state
 
     def __repr__(self):
         rargs = ", ".join(
@@ -89,17 +135,15 @@ class ModelResult(Query):
         return qs, args
 
     def __iter__(self):
-        if self.is_stored:
-            return super().__iter__()
-        else:
-            self._query_object = self._df.iterrows()
+        try:
+            self._query_object = self._df.itertuples(index=False, name=None)
+        except AttributeError:
+            super().__iter__()
+            self._query_object = iter(self._query_object)
         return self
 
     def __next__(self):
-        if self.is_stored:
-            return super().__next__()
-        else:
-            return self._query_object.__next__()
+        return next(self._query_object)
 
     def __len__(self):
         try:
@@ -114,6 +158,68 @@ class ModelResult(Query):
         except AttributeError:
             return super().column_names
 
+    def get_columns(self, columns):
+        """
+        Get some columns of the result. If the result is not in memory, only
+        those columns are read from the cache table, and they are kept for
+        later calls while caching is on.
+
+        Parameters
+        ----------
+        columns : list of str
+            Names of the columns to get
+
+        Returns
+        -------
+        pandas.DataFrame
+            DataFrame containing the requested columns
+        """
+        try:
+            return self._df[columns].copy()
+        except AttributeError:
+            pass
+        loaded = self.__dict__.get("_columns", pd.DataFrame())
+        missing = [c for c in columns if c not in loaded.columns]
+        if missing:
+            # Columns are always read together, so that their rows line up
+            if self._cache:
+                to_read = loaded.columns.tolist() + missing
+            else:
+                to_read = columns
+            qur = "SELECT {} FROM ({}) AS result".format(
+                ", ".join(to_read), self.get_query()
+            )
+            with self.connection.engine.begin():
+                loaded = pd.read_sql_query(qur, con=self.connection.engine)
+            if self._cache:
+                self._columns = loaded
+        return loaded[columns].copy()
+
+    def get_dataframe_async(self):
+        """
+        Execute the query in a worker thread and return a future object
+        which will contain the result as a pandas dataframe when complete.
+        Spilled results are read from the cache each time, rather than
+        held in memory again.
+
+        Returns
+        -------
+        Future
+            Future object which can be used to get the resulting dataframe
+        """
+        if not self.__dict__.get("_spilled", False) or "_df" in self.__dict__:
+            return super().get_dataframe_async()
+
+        def read():
+            with self.connection.engine.begin():
+                return pd.read_sql_query(self.get_query(), con=self.connection.engine)
+
+        return self.tp.submit(read)
+
+    def turn_off_caching(self):
+        self.__dict__.pop("_columns", None)
+        super().turn_off_caching()
+
     def to_sql_async(
         self, name=None, schema=None, as_view=False, as_temp=False, force=False
     ):
@@ -151,6 +257,10 @@ class ModelResult(Query):
             try:
                 self._df
             except AttributeError:
+                if self.__dict__.get("_spilled", False):
+                    raise ValueError(
+                        "The result was dropped from the cache, and must be recomputed."
+                    )
                 raise ValueError("Not computed yet.")
 
         def do_query():
@@ -163,9 +273,17 @@ class ModelResult(Query):
                 try:
                     with con.begin():
                         logger.debug("Using pandas to store.")
-                        self._df.to_sql(name, con, schema=schema, index=False)
+                        self._df.to_sql(
+                            name, con, schema=schema, index=False, chunksize=100000
+                        )
                         if not as_view and schema == "cache":
-                            self._db_store_cache_metadata()
+                            # Spilled results can't be recomputed from their
+                            # inputs, so must outlive them in the cache
+                            self._db_store_cache_metadata(
+                                record_dependencies=not self.__dict__.get(
+                                    "_spilled", False
+                                )
+                            )
                 except AttributeError:
                     logger.debug(
                         "No dataframe to store, presumably because this"
@@ -9,9 +9,12 @@ defines methods that returns the query as a string and as a pandas dataframe.
 
 """
 import csv
+import os
 import pickle
 import logging
 import weakref
+from contextlib import ExitStack
+from pathlib import Path
 from typing import List
 
 import psycopg2
@@ -34,6 +37,58 @@ logger = logging.getLogger("flowmachine").getChild(__name__)
 # and removes this restriction.
 MAX_POSTGRES_NAME_LENGTH = 63
 
+# Functions called with the id of each query whose cache is invalidated
+_cache_invalidation_hooks = []
+
+
+def on_cache_invalidation(hook):
+    """
+    Register a function to be called with the query id of every query whose
+    cache is invalidated, including those invalidated because something they
+    depend on was. Use this to clear results held outside of the cache
+    tables. Can be used as a decorator.
+
+    Parameters
+    ----------
+    hook : function
+        Function taking a query id
+
+    Returns
+    -------
+    function
+        The hook
+    """
+    _cache_invalidation_hooks.append(hook)
+    return hook
+
+
+def _canonical(item):
+    """
+    A string form of a query parameter which is the same for equal
+    parameters, for use in hashing. Queries are represented by their hash,
+    and the order of items in sets and of dict keys is ignored. Lists and
+    tuples keep their order, because it is often meaningful (e.g. hours).
+
+    Parameters
+    ----------
+    item : object
+        Parameter to serialise
+
+    Returns
+    -------
+    str
+    """
+    if isinstance(item, Query):
+        return item.md5
+    elif isinstance(item, dict):
+        items = (f"{_canonical(k)}: {_canonical(v)}" for k, v in item.items())
+        return "{" + ", ".join(sorted(items)) + "}"
+    elif isinstance(item, (set, frozenset)):
+        return "{" + ", ".join(sorted(_canonical(x) for x in item)) + "}"
+    elif isinstance(item, (list, tuple)):
+        return "[" + ", ".join(_canonical(x) for x in item) + "]"
+    return repr(item)
+
 
 class Query(metaclass=ABCMeta):
     """
@@ -50,6 +105,20 @@ class Query(metaclass=ABCMeta):
     """
 
     _QueryPool = weakref.WeakValueDictionary()
+    # Number of dependent cache tables dropped per statement when invalidating
+    drop_batch_size = 100
+    # Cache tables are reproducible, so they can optionally skip the write-ahead
+    # log and be placed in a dedicated tablespace
+    cache_unlogged = False
+    cache_tablespace = None
+    # Where results are cached by store(), either "postgres" or "parquet".
+    # Parquet caches can only be read back as dataframes, so are best suited
+    # to results which no other query uses.
+    cache_backend = "postgres"
+    parquet_cache_dir = None
+    # Set to True for queries which are worth storing whenever a query
+    # built from them is stored, so they can be reused
+    store_with_dependents = False
 
     def __init__(self, cache=True):
         obj = Query._QueryPool.get(self.md5)
@@ -78,26 +147,42 @@ class Query(metaclass=ABCMeta):
         """
         try:
             return self._md5
-        except:
-            state = self.__getstate__()
-            hashes = sorted([x.md5 for x in self.dependencies])
-            for key, item in sorted(state.items()):
-                try:
-                    if isinstance(item, list) or isinstance(item, tuple):
-                        item = sorted(item)
-                    elif isinstance(item, dict):
-                        item = sorted(item.items())
-
-                    try:
-                        hashes.append(str(item))
-                    except TypeError:
-                        pass
-                except:
-                    pass
-            hashes.append(self.__class__.__name__)
-            hashes.sort()
-            self._md5 = md5(str(hashes).encode()).hexdigest()
-            return self._md5
+        except AttributeError:
+            pass
+        # Hash subqueries before the queries which depend on them, using a
+        # stack rather than recursion so that deep trees of queries don't
+        # hit the recursion limit. Each query is only hashed once.
+        stack = [self]
+        while stack:
+            query = stack[-1]
+            if "_md5" in query.__dict__:
+                stack.pop()
+                continue
+            unhashed = [d for d in query.dependencies if "_md5" not in d.__dict__]
+            if unhashed:
+                stack.extend(unhashed)
+            else:
+                stack.pop()
+                query._md5 = query._hash()
+        return self._md5
+
+    def _hash(self):
+        """
+        Hash this query's class, parameters and the hashes of its
+        dependencies, which must already have been computed.
+
+        Returns
+        -------
+        str
+            md5 hash string
+        """
+        hashes = sorted(x.md5 for x in self.dependencies)
+        hashes += sorted(
+            "{}={}".format(key, _canonical(item))
+            for key, item in self.__getstate__().items()
+        )
+        hashes.append(self.__class__.__name__)
+        return md5(str(hashes).encode()).hexdigest()
 
     @abstractmethod
     def _make_query(self):
@@ -186,9 +271,10 @@ class Query(metaclass=ABCMeta):
         try:
             table_name = self.table_name
             schema, name = table_name.split(".")
-            with rlock(self.redis, self.md5):
-                if self.connection.has_table(schema=schema, name=name):
-                    return "SELECT * FROM {}".format(table_name)
+            # No lock is needed to read: a table being stored only becomes visible
+            # when the store commits, until then the query is built from scratch.
+            if self.connection.has_table(schema=schema, name=name):
+                return "SELECT * FROM {}".format(table_name)
         except NotImplementedError:
             pass
         return self._make_query()
@@ -210,20 +296,22 @@ class Query(metaclass=ABCMeta):
 
         """
 
+        def read():
+            if self._parquet_stored:
+                return pd.read_parquet(self._parquet_path)
+            qur = self.get_query()
+            with self.connection.engine.begin():
+                return pd.read_sql_query(qur, con=self.connection.engine)
+
         def do_get():
             if self._cache:
                 try:
                     return self._df.copy()
                 except AttributeError:
-                    qur = self.get_query()
-                    with self.connection.engine.begin():
-                        self._df = pd.read_sql_query(qur, con=self.connection.engine)
-
+                    self._df = read()
                     return self._df.copy()
             else:
-                qur = self.get_query()
-                with self.connection.engine.begin():
-                    return pd.read_sql_query(qur, con=self.connection.engine)
+                return read()
 
         df_future = self.tp.submit(do_get)
         return df_future
@@ -432,8 +520,14 @@ class Query(metaclass=ABCMeta):
         table_type = ""
         if as_view:
             table_type += "VIEW "
+        elif schema == "cache" and self.cache_unlogged:
+            table_type += "UNLOGGED TABLE "
         else:
             table_type += "TABLE "
+        if schema == "cache" and not as_view and self.cache_tablespace is not None:
+            tablespace = " TABLESPACE {}".format(self.cache_tablespace)
+        else:
+            tablespace = ""
 
         if schema is not None:
             full_name = "{}.{}".format(schema, name)
@@ -448,13 +542,21 @@ class Query(metaclass=ABCMeta):
         Q = "CREATE "
         Q += table_type
         Q += full_name
+        Q += tablespace
         Q += " AS ({})".format(self._make_query() if force else self.get_query())
         queries.append(Q)
         if not as_view:  # Views can't be indexed
             for ix in self.index_cols:
+                using = ""
+                if isinstance(ix, tuple):
+                    method, ix = ix
+                    using = " USING {}".format(method)
                 queries.append(
-                    "CREATE INDEX ON {tbl} ({ixen})".format(
-                        tbl=full_name, ixen=",".join(ix) if isinstance(ix, list) else ix
+                    "CREATE INDEX ON {tbl}{using} ({ixen}){tablespace}".format(
+                        tbl=full_name,
+                        using=using,
+                        ixen=",".join(ix) if isinstance(ix, list) else ix,
+                        tablespace=tablespace,
                     )
                 )
         return queries
@@ -498,29 +600,75 @@ class Query(metaclass=ABCMeta):
             ).format(name, len(name), MAX_POSTGRES_NAME_LENGTH)
             raise NameTooLongError(err_msg)
 
-        def do_query():
-            logger.debug("Getting storage lock.")
-            with rlock(self.redis, self.md5):
-                logger.debug("Obtained storage lock.")
-                Qs = self._make_sql(name, schema=schema, as_view=as_view, force=force)
-                logger.debug("Made SQL.")
-                con = self.connection.engine
-                if force and not as_view:
-                    self.invalidate_db_cache(name, schema=schema)
-                with con.begin():
-                    sql = """CREATE SCHEMA IF NOT EXISTS {}""".format(schema)
-                    con.execute(sql)
-                    for Q in Qs:
-                        con.execute(Q)
-                    logger.debug("Executed queries.")
-                    if not as_view and schema == "cache":
-                        self._db_store_cache_metadata()
-            logger.debug("Released storage lock.")
-            return self
-
-        store_future = self.tp.submit(do_query)
+        store_future = self.tp.submit(
+            self._to_sql, name, schema=schema, as_view=as_view, force=force
+        )
         return store_future
 
+    def _to_sql(self, name, schema=None, as_view=False, force=False):
+        """
+        Store the result of the calculation back into the database, blocking
+        until the store has completed. Used by to_sql_async, and by queries
+        which need to store others from their own worker threads.
+
+        Parameters
+        ----------
+        name : str
+            name of the table
+        schema : str, default None
+            Name of an existing schema. If none will use the postgres default,
+            see postgres docs for more info.
+        as_view : bool, default False
+            Set to True to store as a view rather than a table.
+        force : bool, default False
+            Will overwrite an existing table if the name already exists
+
+        Returns
+        -------
+        Query
+            This query
+        """
+        if not as_view:
+            self._store_shared_dependencies()
+        logger.debug("Getting storage lock.")
+        with rlock(self.redis, self.md5):
+            logger.debug("Obtained storage lock.")
+            Qs = self._make_sql(name, schema=schema, as_view=as_view, force=force)
+            logger.debug("Made SQL.")
+            con = self.connection.engine
+            if force and not as_view:
+                self.invalidate_db_cache(name, schema=schema)
+            with con.begin():
+                sql = """CREATE SCHEMA IF NOT EXISTS {}""".format(schema)
+                con.execute(sql)
+                for Q in Qs:
+                    con.execute(Q)
+                logger.debug("Executed queries.")
+                if not as_view and schema == "cache":
+                    self._db_store_cache_metadata()
+        logger.debug("Released storage lock.")
+        return self
+
+    def _store_shared_dependencies(self):
+        """
+        Store any queries this one is built from which have
+        `store_with_dependents` set, and are not already stored. Called
+        before storing this query, in the calling thread.
+        """
+        seen = set()
+        to_visit = list(self.dependencies)
+        while to_visit:
+            query = to_visit.pop()
+            if query.md5 in seen:
+                continue
+            seen.add(query.md5)
+            if query.store_with_dependents:
+                if not query.is_stored:
+                    schema, name = query.table_name.split(".")
+                    query._to_sql(name, schema=schema)
+            else:
+                to_visit.extend(query.dependencies)
+
     def to_sql(self, name=None, schema=None, as_view=False, force=False):
         """
         Store the result of the calculation back into the database.
@@ -609,6 +757,8 @@ class Query(metaclass=ABCMeta):
             True if the table is stored, and False otherwise.
         """
 
+        if self.cache_backend == "parquet":
+            return self._parquet_stored
         try:
             schema, name = self.table_name.split(".")
             with self.connection.engine.begin():
@@ -643,16 +793,115 @@ class Query(metaclass=ABCMeta):
         except NotImplementedError:
             raise ValueError("Cannot store an object of this type with these params")
 
+        if self.cache_backend == "parquet":
+            return self.tp.submit(self._to_parquet, force=force)
+        elif self.cache_backend != "postgres":
+            raise ValueError(
+                "Unknown cache backend '{}', expected 'postgres' or 'parquet'.".format(
+                    self.cache_backend
+                )
+            )
+
         schema, name = table_name.split(".")
 
         store_future = self.to_sql_async(name, schema=schema, force=force)
         return store_future
 
-    def _db_store_cache_metadata(self):
+    @property
+    def _parquet_path(self):
+        """
+        Path of the file this query's result is cached in when using
+        the parquet cache backend.
+
+        Returns
+        -------
+        pathlib.Path
+        """
+        if self.parquet_cache_dir is None:
+            raise ValueError("No directory has been set for the parquet cache.")
+        return Path(self.parquet_cache_dir) / "x{}.parquet".format(self.md5)
+
+    @property
+    def _parquet_stored(self):
+        """
+        Returns
+        -------
+        bool
+            True if this query's result is cached in the parquet cache.
+        """
+        return (
+            self.cache_backend == "parquet"
+            and self.parquet_cache_dir is not None
+            and self._parquet_path.exists()
+        )
+
+    def _to_parquet(self, force=False):
+        """
+        Store the result of this query in the parquet cache, blocking until
+        the store has completed. Used by store for queries using the parquet
+        cache backend.
+
+        Parameters
+        ----------
+        force : bool, default False
+            Will overwrite an existing file if one exists
+
+        Returns
+        -------
+        Query
+            This query
+        """
+        self._store_shared_dependencies()
+        with rlock(self.redis, self.md5):
+            path = self._parquet_path
+            if path.exists():
+                if not force:
+                    logger.info("Parquet cache file already exists")
+                    return self
+                self.invalidate_db_cache()
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with self.connection.engine.begin():
+                df = pd.read_sql_query(
+                    self._make_query() if force else self.get_query(),
+                    con=self.connection.engine,
+                )
+            # Write to a temporary file first so that readers never see a partial file
+            partial_path = path.with_suffix(".partial")
+            df.to_parquet(partial_path, index=False)
+            os.replace(partial_path, path)
+            logger.debug("Wrote parquet cache for {} to {}.".format(self.md5, path))
+            self._db_store_cache_metadata(backend="parquet")
+        return self
+
+    def _unlink_parquet(self, query_id):
+        """
+        Remove the parquet cache file of a query, if there is one.
+
+        Parameters
+        ----------
+        query_id : str
+            md5 of the query
+        """
+        if self.parquet_cache_dir is None:
+            return
+        path = Path(self.parquet_cache_dir) / "x{}.parquet".format(query_id)
+        if path.exists():
+            path.unlink()
+            logger.debug("Removed parquet cache for {}.".format(query_id))
+
+    def _db_store_cache_metadata(self, backend="postgres", record_dependencies=True):
         """
         Helper function for store, updates flowmachine metadata table to
         log that this query is stored, but does not actually store
         the query.
+
+        Parameters
+        ----------
+        backend : {"postgres", "parquet"}, default "postgres"
+            Where the query is stored
+        record_dependencies : bool, default True
+            Set to False to not record the stored queries this one depends
+            on, so that it is not invalidated along with them
         """
 
         from ..__init__ import __version__
@@ -674,8 +923,10 @@ class Query(metaclass=ABCMeta):
             )
             with con.begin():
                 con.execute(
-                    "INSERT INTO cache.cached values (%s, %s, %s, NOW(), %s, %s, %s, %s)"
-                    + " ON CONFLICT (query_id) DO UPDATE SET ts = NOW();",
+                    "INSERT INTO cache.cached"
+                    + " (query_id, version, query, ts, class, schema, tablename, obj, backend)"
+                    + " VALUES (%s, %s, %s, NOW(), %s, %s, %s, %s, %s)"
+                    + " ON CONFLICT (query_id) DO UPDATE SET ts = NOW(), backend = EXCLUDED.backend;",
                     (
                         self.md5,
                         __version__,
@@ -683,15 +934,22 @@ class Query(metaclass=ABCMeta):
                         self.__class__.__name__,
                         *self.table_name.split("."),
                         psycopg2.Binary(self_storage),
+                        backend,
                     ),
                 )
                 logger.debug("{} added to cache.".format(self.table_name))
-                if not in_cache:
-                    for dep in self._get_deps(root=True):
-                        con.execute(
-                            "INSERT INTO cache.dependencies values (%s, %s) ON CONFLICT DO NOTHING",
-                            (self.md5, dep.md5),
-                        )
+                deps = (
+                    list(self._get_deps(root=True))
+                    if record_dependencies and not in_cache
+                    else []
+                )
+                if deps:
+                    con.execute(
+                        "INSERT INTO cache.dependencies values {} ON CONFLICT DO NOTHING".format(
+                            ", ".join(["(%s, %s)"] * len(deps))
+                        ),
+                        tuple(md5 for dep in deps for md5 in (self.md5, dep.md5)),
+                    )
         except NotImplementedError:
             logger.debug("Table has no standard name.")
 
@@ -717,15 +975,8 @@ class Query(metaclass=ABCMeta):
         for x in self.__dict__.values():
             if isinstance(x, Query):
                 dependencies.add(x)
-        lists = [
-            x
-            for x in self.__dict__.values()
-            if isinstance(x, list) or isinstance(x, tuple)
-        ]
-        for l in lists:
-            for x in l:
-                if isinstance(x, Query):
-                    dependencies.add(x)
+            elif isinstance(x, (list, tuple)):
+                dependencies.update(q for q in x if isinstance(q, Query))
 
         return dependencies
 
@@ -770,41 +1021,101 @@ class Query(metaclass=ABCMeta):
             Set to false to remove only this table from cache
         drop : bool
             Set to false to remove the cache record without dropping the table
+
+        Notes
+        -----
+        Functions registered with `on_cache_invalidation` are called with the
+        query id of this query and of every dependent whose record is removed.
         """
         with rlock(self.redis, self.md5):
             con = self.connection.engine
+            invalidated = [self.md5]
             try:
-                deps = self.connection.fetch(
-                    """SELECT obj FROM cache.cached LEFT JOIN cache.dependencies
-                    ON cache.cached.query_id=cache.dependencies.query_id
-                    WHERE depends_on='{}'""".format(
-                        self.md5
-                    )
-                )
-                with con.begin():
-                    con.execute(
-                        "DELETE FROM cache.cached WHERE query_id=%s", (self.md5,)
+                table_schema, table_name = self.table_name.split(".")
+                # Find and remove the cache records of this query, and
+                # everything which depends on it, in a single statement
+                if cascade:
+                    sql = """
+                    WITH RECURSIVE dependents(query_id) AS (
+                        SELECT %s::character(32)
+                      UNION
+                        SELECT dependencies.query_id
+                        FROM cache.dependencies
+                        JOIN dependents ON dependencies.depends_on = dependents.query_id
                     )
+                    DELETE FROM cache.cached USING dependents
+                    WHERE cached.query_id = dependents.query_id
+                    RETURNING cached.query_id, cached.schema, cached.tablename, cached.backend
+                    """
+                else:
+                    logger.debug("Not cascading to dependents.")
+                    sql = """
+                    DELETE FROM cache.cached WHERE query_id = %s
+                    RETURNING query_id, schema, tablename, backend
+                    """
+                with con.begin() as trans:
+                    removed = trans.execute(sql, (self.md5,)).fetchall()
                     logger.debug("Deleted cache record for {}.".format(self.table_name))
                     if drop:
-                        con.execute("DROP TABLE IF EXISTS {}".format(self.table_name))
+                        trans.execute("DROP TABLE IF EXISTS {}".format(self.table_name))
                         logger.debug(
                             "Dropped cache for for {}.".format(self.table_name)
                         )
+                self.connection.catalog.invalidate(table_name, table_schema)
 
-                if cascade:
-                    for rec in deps:
-                        dep = pickle.loads(rec[0])
-                        logger.debug(
-                            "Cascading to {} from cache record for {}.".format(
-                                dep.table_name, self.table_name
-                            )
+                invalidated.extend(
+                    query_id for query_id, _, _, _ in removed if query_id != self.md5
+                )
+
+                # Only cached tables and files of dependents are dropped, the
+                # records of tables elsewhere are just removed. They are sorted
+                # by query id, so every cascade takes their locks in the same
+                # order and overlapping cascades can't deadlock.
+                dependents = sorted(
+                    (query_id, dep_schema, dep_name, backend)
+                    for query_id, dep_schema, dep_name, backend in removed
+                    if query_id != self.md5 and dep_schema == "cache"
+                )
+                for batch_start in range(0, len(dependents), self.drop_batch_size):
+                    batch = dependents[batch_start : batch_start + self.drop_batch_size]
+                    logger.debug(
+                        "Cascading to {} dependents of {}.".format(
+                            len(batch), self.table_name
                         )
-                        dep.invalidate_db_cache()
-                else:
-                    logger.debug("Not cascading to dependents.")
+                    )
+                    # Hold the dependents' locks so that none of them is being
+                    # stored while it is dropped
+                    with ExitStack() as locks:
+                        for query_id, _, _, _ in batch:
+                            locks.enter_context(rlock(self.redis, query_id))
+                        tables = [
+                            f"{sc}.{tn}"
+                            for _, sc, tn, backend in batch
+                            if backend == "postgres"
+                        ]
+                        with con.begin() as trans:
+                            # A dependent may have been stored again between
+                            # removing its record and taking its lock
+                            trans.execute(
+                                "DELETE FROM cache.cached WHERE query_id IN %s",
+                                (tuple(query_id for query_id, _, _, _ in batch),),
+                            )
+                            if tables:
+                                trans.execute(
+                                    "DROP TABLE IF EXISTS {}".format(", ".join(tables))
+                                )
+                        for query_id, dep_schema, dep_name, backend in batch:
+                            if backend == "parquet":
+                                self._unlink_parquet(query_id)
+                            else:
+                                self.connection.catalog.invalidate(dep_name, dep_schema)
             except NotImplementedError:
                 logger.info("Table has no standard name.")
+            for query_id in invalidated:
+                for hook in _cache_invalidation_hooks:
+                    hook(query_id)
+            if drop:
+                self._unlink_parquet(self.md5)
             if schema is not None:
                 full_name = "{}.{}".format(schema, name)
             else:
@@ -812,11 +1123,16 @@ class Query(metaclass=ABCMeta):
             logger.debug("Dropping {}".format(full_name))
             with con.begin():
                 con.execute("DROP TABLE IF EXISTS {}".format(full_name))
+            if name is not None:
+                self.connection.catalog.invalidate(name, schema)
 
     @property
     def index_cols(self):
         """
         A list of columns to use as indexes when storing this query.
+        Each entry is a column, a list of columns for a multicolumn index,
+        or a tuple of an index method and either of those (e.g.
+        ``("gist", ["location_id", "validity"])``).
 
 
         Returns
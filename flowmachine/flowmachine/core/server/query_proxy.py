@@ -5,6 +5,7 @@ from json import dumps, loads, JSONDecodeError
 
 from flowmachine.core import Query, Table
 from flowmachine.features import daily_location, HomeLocation, Flows
+from flowmachine.utils.utils import redis_pipeline
 
 logger = logging.getLogger("flowmachine").getChild(__name__)
 
@@ -46,6 +47,19 @@ class RedisInterface:
     def set(self, key, value):
         return self._redis.set(key, value)
 
+    def set_many(self, mapping):
+        """
+        Set several keys in a single round trip to redis.
+
+        Parameters
+        ----------
+        mapping : dict
+            Values to set, keyed by the key to set them under
+        """
+        with redis_pipeline(self._redis) as pipe:
+            for key, value in mapping.items():
+                pipe.set(key, value)
+
     def keys(self):
         return self._redis.keys()
 
@@ -300,8 +314,9 @@ class QueryProxy:
             )
 
     def _create_redis_lookup(self, query_id):
-        self.redis_interface.set(self._query_descr, query_id)
-        self.redis_interface.set(query_id, self._query_descr)
+        self.redis_interface.set_many(
+            {self._query_descr: query_id, query_id: self._query_descr}
+        )
 
     def run_query_async(self):
         """
@@ -381,3 +396,39 @@ class QueryProxy:
             raise MissingQueryError(
                 query_id, msg=f"Query with id '{query_id}' does not exist"
             )
+
+    def get_tile(self, z, x, y):
+        """
+        For a query which has been completed, return one tile of its output
+        rendered as a Mapbox vector tile.
+
+        Parameters
+        ----------
+        z, x, y : int
+            Zoom level, column and row of the tile in the XYZ tiling scheme
+
+        Returns
+        -------
+        bytes
+
+        """
+        query_id = self._get_query_id_from_redis()
+        if self.redis_interface.has_lock(query_id):
+            raise QueryProxyError(f"Query with id '{query_id}' is still running.")
+        if not cache_table_exists(query_id):
+            raise MissingQueryError(
+                query_id, msg=f"Query with id '{query_id}' does not exist"
+            )
+        q = self.func_construct_query_object(self.query_kind, self.params)
+        try:
+            q = q.aggregate()
+        except AttributeError:
+            pass  # As in run_query_async, flows are returned unaggregated
+        if q.md5 != query_id or not hasattr(q, "to_mvt"):
+            raise QueryProxyError(
+                f"Query with id '{query_id}' cannot be rendered as vector tiles."
+            )
+        try:
+            return q.to_mvt(z, x, y)
+        except ValueError as e:
+            raise QueryProxyError(f"{e}")
@@ -9,6 +9,7 @@ import asyncio
 import logging
 import os
 import zmq
+from base64 import b64encode
 from zmq.asyncio import Context
 from flowmachine.core import connect
 from .query_proxy import QueryProxy, MissingQueryError, QueryProxyError
@@ -60,6 +61,17 @@ async def get_reply_for_message(  # pragma: no cover
             sql = query_proxy.get_sql()
             reply = {"status": "done", "sql": sql}
 
+        elif "get_tile" == action:
+            logger.debug(f"Trying to get query tile. Message: {zmq_msg.msg_str}")
+            query_id = zmq_msg.action_params["query_id"]
+            query_proxy = QueryProxy.from_query_id(query_id)
+            tile = query_proxy.get_tile(
+                zmq_msg.action_params["z"],
+                zmq_msg.action_params["x"],
+                zmq_msg.action_params["y"],
+            )
+            reply = {"status": "done", "tile": b64encode(tile).decode()}
+
         elif "get_params" == action:
             logger.debug(f"Trying to get query parameters. Message: {zmq_msg.msg_str}")
             query_id = zmq_msg.action_params["query_id"]
@@ -79,18 +79,10 @@ class Table(Query):
         self.fqn = "{}.{}".format(schema, name) if schema else name
         if "." not in self.fqn:
             raise ValueError("{} is not a valid table.".format(self.fqn))
-        if not self.is_stored:
-            raise ValueError("{} is not a known table.".format(self.fqn))
-
         # Get actual columns of this table from the database
-        db_columns = list(
-            zip(
-                *self.connection.fetch(
-                    f"""SELECT column_name from INFORMATION_SCHEMA.COLUMNS
-             WHERE table_name = '{self.name}' AND table_schema='{self.schema}'"""
-                )
-            )
-        )[0]
+        db_columns = self.connection.catalog.columns(self.name, self.schema)
+        if not db_columns:
+            raise ValueError("{} is not a known table.".format(self.fqn))
         if (
             columns is None or columns == []
         ):  # No columns specified, setting them from the database
@@ -114,7 +106,9 @@ class Table(Query):
         # Recorded provided columns to ensure that md5 differs with different columns
         self.columns = columns
         super().__init__()
-        self._db_store_cache_metadata()
+        if not self.connection.catalog.is_recorded(self.md5, self.name, self.schema):
+            self._db_store_cache_metadata()
+            self.connection.catalog.mark_recorded(self.md5, self.name, self.schema)
 
     @property
     def column_names(self) -> List[str]:
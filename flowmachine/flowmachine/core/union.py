@@ -39,3 +39,42 @@ class Union(Query):
         return """({}) UNION {} ({})""".format(
             self.top.get_query(), "ALL" if self.all else "", self.bottom.get_query()
         )
+
+
+class UnionAll(Query):
+    """
+    Represents concatenating any number of tables on top of each other,
+    as a single postgres UNION ALL. Prefer this to chaining `Query.union`
+    when combining many queries, which nests a Union for each one.
+
+    Parameters
+    ----------
+    queries : flowmachine.Query object
+        Tables to concatenate, in order
+
+    Examples
+    --------
+    >>> dls = [daily_location(d, level='cell') for d in ('2016-01-01', '2016-01-02', '2016-01-03')]
+    >>> all_days = UnionAll(*dls)
+    >>> df = all_days.get_dataframe()
+    """
+
+    def __init__(self, *queries):
+        """
+
+
+        """
+
+        if not queries:
+            raise ValueError("UnionAll needs at least one query.")
+        self.queries = list(queries)
+
+        super().__init__()
+
+    @property
+    def column_names(self) -> List[str]:
+        return list(self.queries[0].column_names)
+
+    def _make_query(self):
+
+        return "\nUNION ALL\n".join(f"({q.get_query()})" for q in self.queries)
@@ -78,6 +78,7 @@ ut = [
     "UniqueSubscribers",
     "EventsTablesUnion",
     "EventTableSubset",
+    "PartitionedAggregate",
 ]
 
 sub_modules = ["location", "subscriber", "network", "utilities", "raster", "spatial"]
@@ -6,6 +6,10 @@
 Classes that deal with mapping cells (or towers or sites)
 to a spatial level, mostly be performing a spatial join.
 Examples of this include CellToAdmin or CellToGrid.
+
+Mappings depend on the version of the infrastructure table they were built
+from, so a mapping can be stored once and reused by every JoinToLocation to
+the same spatial level until the cells or sites change.
 """
 from typing import List
 
@@ -13,7 +17,25 @@ from ...core import Query
 from .grid import Grid
 
 
-class CellToPolygon(Query):
+class _CellMapping(Query):
+    """
+    Base class for queries which map every cell (or site) and version to a
+    spatial region, and so are worth storing for reuse. Mappings are stored
+    whenever a query joining to them is stored.
+    """
+
+    store_with_dependents = True
+
+    @property
+    def index_cols(self):
+        """
+        Mappings are joined to on location_id and containment of the date of
+        the event in the validity range, so have a GiST index on both.
+        """
+        return [("gist", ["location_id", "validity"])]
+
+
+class CellToPolygon(_CellMapping):
     """
     Class that maps a cell with a lat-lon to a geographical
     region.
@@ -41,6 +63,9 @@ class CellToPolygon(Query):
         self.geom_col = geom_col
         self.location_info_table_fqn = self.connection.location_table
         self.location_info_table = self.connection.location_table.split(".")[-1]
+        self.infrastructure_version = self.connection.infrastructure_version(
+            self.location_info_table_fqn
+        )
 
         super().__init__()
 
@@ -65,6 +90,7 @@ class CellToPolygon(Query):
             "version",
             "date_of_first_service",
             "date_of_last_service",
+            "validity",
         ] + self.column_name
 
     def _make_query(self):
@@ -85,6 +111,7 @@ class CellToPolygon(Query):
                 locinfo.version,
                 locinfo.date_of_first_service,
                 locinfo.date_of_last_service,
+                locinfo.validity,
                 {columns}
             FROM
                 {self.location_info_table_fqn} AS locinfo
@@ -101,6 +128,7 @@ class CellToPolygon(Query):
                 locinfo.version,
                 locinfo.date_of_first_service,
                 locinfo.date_of_last_service,
+                locinfo.validity,
                 {columns}
             FROM
                 {self.location_info_table_fqn} AS locinfo
@@ -115,7 +143,7 @@ class CellToPolygon(Query):
         return tower_admins
 
 
-class CellToAdmin(Query):
+class CellToAdmin(_CellMapping):
     """
     Maps all cells (aka sites) to a admin region. This is a thin wrapper to
     the more general class CellToPolygon, which assumes that you have
@@ -191,7 +219,7 @@ class CellToAdmin(Query):
         return sql
 
 
-class CellToGrid(Query):
+class CellToGrid(_CellMapping):
     """
     Query representing a mapping between all the sites in the database
     and a grid of arbitrary size.
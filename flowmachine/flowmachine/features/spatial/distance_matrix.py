@@ -7,6 +7,8 @@ Utility methods for calculating a distance
 matrix from a given point collection.
 
 """
+import numpy as np
+
 from flowmachine.utils.utils import get_columns_for_level
 from ...core.query import Query
 from ...core.mixins import GraphMixin
@@ -49,6 +51,21 @@ class DistanceMatrix(GraphMixin, Query):
         is an useful option if one is computing
         other geographic properties out of the
 
+    max_distance : float, optional
+        If given, only include pairs of locations at most this many Km
+        apart.
+
+    k_nearest : int, optional
+        If given, only include the k nearest other locations to each
+        location. Can be combined with max_distance.
+
+    Notes
+    -----
+    The complete matrix grows with the square of the number of locations.
+    For large numbers of cells, set max_distance or k_nearest so that
+    only nearby pairs are computed, using the spatial index on
+    locations, and use to_scipy_sparse to work with the result.
+
     Examples
     --------
     >>> DistanceMatrix().get_dataframe()
@@ -61,26 +78,41 @@ class DistanceMatrix(GraphMixin, Query):
 
     """
 
-    def __init__(self, level="versioned-cell", date=None, return_geometry=False):
+    def __init__(
+        self,
+        level="versioned-cell",
+        date=None,
+        return_geometry=False,
+        max_distance=None,
+        k_nearest=None,
+    ):
 
         if level not in {"versioned-site", "versioned-cell"}:
             raise ValueError("Only point locations are supported at this time.")
+        if max_distance is not None and max_distance < 0:
+            raise ValueError("max_distance must not be negative.")
+        if k_nearest is not None and k_nearest < 1:
+            raise ValueError("k_nearest must be at least 1.")
         self.level = level
         self.date = date
         self.return_geometry = return_geometry
+        self.max_distance = max_distance
+        self.k_nearest = k_nearest
 
         super().__init__()
 
+    @property
+    def _id_columns(self):
+        """
+        The columns which identify a location, without the coordinates.
+        """
+        return [c for c in get_columns_for_level(self.level) if c not in ("lon", "lat")]
+
     def _make_query(self):
-        cols = get_columns_for_level(self.level)
-        sql_location_table = "SELECT * FROM infrastructure." + (
+        cols = self._id_columns
+        location_table = "infrastructure." + (
             "sites" if self.level == "versioned-site" else "cells"
         )
-        try:
-            cols.remove("lat")
-            cols.remove("lon")
-        except ValueError:
-            pass  # Nothing to remove
 
         from_cols = ", ".join(
             "A.{c_id_safe} AS {c}_from".format(
@@ -103,6 +135,40 @@ class DistanceMatrix(GraphMixin, Query):
                 B.geom_point AS geom_destination
             """
 
+        within = ""
+        if self.max_distance is not None:
+            within = "ST_DWithin(A.geom_point::geography, B.geom_point::geography, {})".format(
+                self.max_distance * 1000
+            )
+        if self.k_nearest is not None:
+            # Uses the index on geom_point::geography to find the nearest
+            # locations to each one
+            id_cols = ["id" if c.endswith("id") else c for c in cols]
+            conditions = [
+                "({}) <> ({})".format(
+                    ", ".join("A.{}".format(c) for c in id_cols),
+                    ", ".join("B.{}".format(c) for c in id_cols),
+                )
+            ]
+            if within:
+                conditions.append(within)
+            join_statement = """
+            CROSS JOIN LATERAL (
+                SELECT * FROM {location_table} AS B
+                WHERE {conditions}
+                ORDER BY A.geom_point::geography <-> B.geom_point::geography
+                LIMIT {k}
+            ) AS B
+            """.format(
+                location_table=location_table,
+                conditions=" AND ".join(conditions),
+                k=self.k_nearest,
+            )
+        elif within:
+            join_statement = "INNER JOIN {} AS B ON {}".format(location_table, within)
+        else:
+            join_statement = "CROSS JOIN {} AS B".format(location_table)
+
         sql = """
 
             SELECT
@@ -117,15 +183,98 @@ class DistanceMatrix(GraphMixin, Query):
                     B.geom_point::geography
                 ) / 1000 AS distance
                 {return_geometry_statement}
-            FROM ({location_table_statement}) AS A
-            CROSS JOIN ({location_table_statement}) AS B
+            FROM {location_table} AS A
+            {join_statement}
             ORDER BY distance DESC
             
         """.format(
-            location_table_statement=sql_location_table,
+            location_table=location_table,
+            join_statement=join_statement,
             froms=from_cols,
             tos=to_cols,
             return_geometry_statement=return_geometry_statement,
         )
 
         return sql
+
+    def _distance_arrays(self):
+        """
+        Fetch the distances as arrays of origin and destination positions.
+
+        Returns
+        -------
+        locations : list of tuple
+            Identifiers of the locations, in the order used for positions
+        origins, destinations : numpy.ndarray
+            Positions of the origin and destination of each pair
+        distances : numpy.ndarray
+            Distance in Km between each pair
+        """
+        cols = self._id_columns
+        rows = self.connection.fetch(
+            "SELECT {froms}, {tos}, distance FROM ({qur}) AS dm".format(
+                froms=", ".join("{}_from".format(c) for c in cols),
+                tos=", ".join("{}_to".format(c) for c in cols),
+                qur=self.get_query(),
+            )
+        )
+        n_cols = len(cols)
+        positions = {}
+        origins = np.empty(len(rows), dtype=np.int64)
+        destinations = np.empty(len(rows), dtype=np.int64)
+        distances = np.empty(len(rows), dtype=float)
+        for ix, row in enumerate(rows):
+            origins[ix] = positions.setdefault(row[:n_cols], len(positions))
+            destinations[ix] = positions.setdefault(
+                row[n_cols : 2 * n_cols], len(positions)
+            )
+            distances[ix] = row[-1]
+        return list(positions), origins, destinations, distances
+
+    def to_numpy(self):
+        """
+        Get the distances as a dense square array.
+
+        Returns
+        -------
+        locations : list of tuple
+            Identifiers of the locations corresponding to the rows and
+            columns of the array
+        numpy.ndarray
+            Distances in Km between each pair of locations, inf where the
+            distance was not computed because of max_distance or k_nearest
+
+        Notes
+        -----
+        The array has one entry for every pair of locations. Use
+        to_scipy_sparse for large numbers of locations with max_distance
+        or k_nearest set.
+        """
+        locations, origins, destinations, distances = self._distance_arrays()
+        dense = np.full((len(locations), len(locations)), np.inf)
+        dense[origins, destinations] = distances
+        return locations, dense
+
+    def to_scipy_sparse(self):
+        """
+        Get the distances as a sparse matrix, which holds only the pairs of
+        locations whose distance was computed. Requires scipy.
+
+        Returns
+        -------
+        locations : list of tuple
+            Identifiers of the locations corresponding to the rows and
+            columns of the matrix
+        scipy.sparse.csr_matrix
+            Distances in Km between pairs of locations. Distances of zero are
+            stored explicitly, so that they can be told apart from pairs
+            which were not computed.
+        """
+        from scipy.sparse import coo_matrix
+
+        locations, origins, destinations, distances = self._distance_arrays()
+        matrix = coo_matrix(
+            (distances, (origins, destinations)),
+            shape=(len(locations), len(locations)),
+        ).tocsr()
+        return locations, matrix
@@ -69,12 +69,11 @@ class VersionedInfrastructure(Query):
             SELECT
                 *
             FROM infrastructure.{table}
-            WHERE date_of_first_service <= '{date}'::date AND
-                  (CASE
-                      WHEN date_of_last_service IS NOT NULL
-                      THEN date_of_last_service > '{date}'::date
-                      ELSE TRUE
-                   END)
+            WHERE date_of_first_service IS NOT NULL AND
+                  CASE
+                      WHEN date_of_last_service < date_of_first_service THEN 'empty'::daterange
+                      ELSE daterange(date_of_first_service, date_of_last_service)
+                  END @> '{date}'::date
         """.format(
             table=self.table, date=self.date
         )
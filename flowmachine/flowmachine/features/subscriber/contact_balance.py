@@ -13,7 +13,7 @@ subscriber's total event count.
 import logging
 
 from .metaclasses import SubscriberFeature
-from ..utilities.sets import EventsTablesUnion
+from ..utilities.sets import EventsTablesUnion, decode_subscribers
 from ...core.mixins.graph_mixin import GraphMixin
 
 logger = logging.getLogger("flowmachine").getChild(__name__)
@@ -49,6 +49,9 @@ class ContactBalance(GraphMixin, SubscriberFeature):
     direction : {'in', 'out', 'both'}, default 'both'
         Event direction to include in computation. This
         can be outgoing ('out'), incoming ('in'), or both ('both').
+    encode_subscribers : bool, default False
+        Set to True to compute the balance using integer subscriber keys,
+        which are decoded in the result.
 
 
     Examples
@@ -72,6 +75,7 @@ class ContactBalance(GraphMixin, SubscriberFeature):
         subscriber_identifier="msisdn",
         direction="both",
         exclude_self_calls=True,
+        encode_subscribers=False,
         **kwargs,
     ):
         """
@@ -90,6 +94,7 @@ class ContactBalance(GraphMixin, SubscriberFeature):
         self.subscriber_identifier = subscriber_identifier
         self.direction = direction
         self.exclude_self_calls = exclude_self_calls
+        self.encode_subscribers = encode_subscribers
 
         if self.direction not in ("both", "in", "out"):
             raise ValueError("Unidentified direction: {}".format(self.direction))
@@ -101,6 +106,7 @@ class ContactBalance(GraphMixin, SubscriberFeature):
             columns=cols,
             tables=self.table,
             subscriber_identifier=self.subscriber_identifier,
+            encode_subscribers=self.encode_subscribers,
             **kwargs,
         ).get_query()
         self._cols = ["subscriber", "msisdn_counterpart", "events", "proportion"]
@@ -157,7 +163,9 @@ class ContactBalance(GraphMixin, SubscriberFeature):
         GROUP BY U.subscriber, 
                  U.msisdn_counterpart,
                  T.events
-        ORDER BY proportion DESC
         """
 
-        return sql
+        if self.encode_subscribers:
+            sql = decode_subscribers(sql, self._cols)
+
+        return f"{sql} ORDER BY proportion DESC"
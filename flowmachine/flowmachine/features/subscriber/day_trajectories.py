@@ -12,10 +12,10 @@ of events see feature subscriber_locations.
 """
 
 import datetime
-from functools import reduce
 from typing import List
 
 from flowmachine.utils.utils import get_columns_for_level
+from ...core.union import UnionAll
 from ..utilities.multilocation import MultiLocation
 
 
@@ -53,9 +53,7 @@ class DayTrajectories(MultiLocation):
         # This query represents the concatenated locations of the
         # subscribers. Similar to the first step when calculating
         # HomeLocations. See home_locations.py
-        all_locs = reduce(
-            lambda x, y: x.union(y), (self._append_date(dl) for dl in self._all_dls)
-        )
+        all_locs = UnionAll(*(self._append_date(dl) for dl in self._all_dls))
 
         sql = """
         SELECT 
@@ -11,7 +11,7 @@ The modal daily location of a subscriber.
 
 """
 
-from functools import reduce
+from ...core.union import UnionAll
 
 from ..utilities.multilocation import MultiLocation
 
@@ -33,9 +33,7 @@ class HomeLocation(MultiLocation):
 
         # This query represents the concatenated locations of the
         # subscribers
-        all_locs = reduce(
-            lambda x, y: x.union(y), (self._append_date(dl) for dl in self._all_dls)
-        )
+        all_locs = UnionAll(*(self._append_date(dl) for dl in self._all_dls))
 
         times_visited = """
         SELECT all_locs.subscriber, {rc}, count(*) AS total, max(all_locs.date) as date
@@ -11,7 +11,10 @@ at during a specified time period.
 
 """
 from ..utilities.subscriber_locations import BaseLocation
-from ..utilities.subscriber_locations import subscriber_locations
+from ..utilities.subscriber_locations import (
+    subscriber_locations,
+    _SubscriberCellVisits,
+)
 from ...utils.utils import get_columns_for_level
 
 
@@ -119,6 +122,10 @@ class LastLocation(BaseLocation):
             column_name=self.column_name,
             **kwargs
         )
+        if self.level == "cell":
+            # Counts of sightings are enough at the cell level, which can be
+            # read from the subscriber location summary where there is one
+            self.cell_visits = _SubscriberCellVisits(self.subscriber_locs)
         super().__init__()
 
     def _make_query(self):
@@ -126,16 +133,21 @@ class LastLocation(BaseLocation):
         Default query method implemented in the
         metaclass Query().
         """
+        if self.level == "cell":
+            return """
+            SELECT DISTINCT ON (cell_visits.subscriber) cell_visits.subscriber, location_id
+            FROM ({cell_visits}) AS cell_visits
+            ORDER BY cell_visits.subscriber, last_seen DESC
+            """.format(
+                cell_visits=self.cell_visits.get_query()
+            )
+
         relevant_columns = ",".join(get_columns_for_level(self.level, self.column_name))
 
         sql = """
-        SELECT final_time.subscriber, {rc}
-        FROM
-             (SELECT subscriber_locs.subscriber, time, {rc},
-             row_number() OVER (PARTITION BY subscriber_locs.subscriber ORDER BY time DESC)
-                 AS rank
-             FROM ({subscriber_locs}) AS subscriber_locs) AS final_time
-        WHERE rank = 1
+        SELECT DISTINCT ON (subscriber_locs.subscriber) subscriber_locs.subscriber, {rc}
+        FROM ({subscriber_locs}) AS subscriber_locs
+        ORDER BY subscriber_locs.subscriber, time DESC
         """.format(
             subscriber_locs=self.subscriber_locs.get_query(), rc=relevant_columns
         )
@@ -43,6 +43,24 @@ class SubscriberFeature(Query):
         """
         return JoinedSpatialAggregate(self, locations, method=method)
 
+    def _fused_aggregates(self):
+        """
+        Describe this feature as aggregates over the events of an
+        EventsTablesUnion grouped by subscriber, so that FeatureCollection
+        can compute it in the same pass as other features reading the same
+        events. Features which can't be computed this way return None.
+
+        Returns
+        -------
+        tuple or None
+            A tuple of the EventsTablesUnion, a condition on the events
+            (or None for all events), and a dict mapping each output column
+            to an aggregate expression. The expressions contain a `{filter}`
+            placeholder after each aggregate call, which is replaced with the
+            FILTER clause applying the condition.
+        """
+        return None
+
     def __getitem__(self, item):
 
         return self.subset(col="subscriber", subset=item)
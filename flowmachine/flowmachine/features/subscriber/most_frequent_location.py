@@ -9,7 +9,11 @@ the most frequently.
 
 
 """
-from ..utilities.subscriber_locations import BaseLocation, subscriber_locations
+from ..utilities.subscriber_locations import (
+    BaseLocation,
+    subscriber_locations,
+    _SubscriberCellVisits,
+)
 from ...utils.utils import get_columns_for_level
 
 
@@ -121,6 +125,10 @@ class MostFrequentLocation(BaseLocation):
             column_name=self.column_name,
             **kwargs
         )
+        if self.level == "cell":
+            # Counts of sightings are enough at the cell level, which can be
+            # read from the subscriber location summary where there is one
+            self.cell_visits = _SubscriberCellVisits(self.subscriber_locs)
         super().__init__()
 
     def _make_query(self):
@@ -128,35 +136,39 @@ class MostFrequentLocation(BaseLocation):
         Default query method implemented in the
         metaclass Query().
         """
-        subscriber_query = "{} ORDER BY time".format(self.subscriber_locs.get_query())
-
         relevant_columns = ", ".join(
             get_columns_for_level(self.level, self.column_name)
         )
 
         # Create a table which has the total times each subscriber visited
         # each location
-        times_visited = """
-        SELECT 
-            subscriber_locs.subscriber, 
-            {rc}, 
-            count(*) AS total
-        FROM ({subscriber_locs}) AS subscriber_locs
-        GROUP BY subscriber_locs.subscriber, {rc}
-        """.format(
-            subscriber_locs=subscriber_query, rc=relevant_columns
-        )
-
+        if self.level == "cell":
+            times_visited = """
+            SELECT subscriber, location_id, sum(visits) AS total
+            FROM ({cell_visits}) AS cell_visits
+            GROUP BY subscriber, location_id
+            """.format(
+                cell_visits=self.cell_visits.get_query()
+            )
+        else:
+            times_visited = """
+            SELECT 
+                subscriber_locs.subscriber, 
+                {rc}, 
+                count(*) AS total
+            FROM ({subscriber_locs}) AS subscriber_locs
+            GROUP BY subscriber_locs.subscriber, {rc}
+            """.format(
+                subscriber_locs=self.subscriber_locs.get_query(), rc=relevant_columns
+            )
+
+        # Only the per-location totals need sorting to pick the most visited
         sql = """
-        SELECT 
-            ranked.subscriber, 
+        SELECT DISTINCT ON (times_visited.subscriber)
+            times_visited.subscriber, 
             {rc}
-        FROM
-             (SELECT times_visited.subscriber, {rc},
-             row_number() OVER (PARTITION BY times_visited.subscriber
-              ORDER BY total DESC) AS rank
-             FROM ({times_visited}) AS times_visited) AS ranked
-        WHERE rank = 1
+        FROM ({times_visited}) AS times_visited
+        ORDER BY times_visited.subscriber, total DESC
         """.format(
             times_visited=times_visited, rc=relevant_columns
         )
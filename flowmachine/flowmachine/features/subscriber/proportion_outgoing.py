@@ -86,10 +86,23 @@ class ProportionOutgoing(SubscriberFeature):
             tables=self.table,
             columns=column_list,
             subscriber_identifier=self.subscriber_identifier,
-            **kwargs
+            **kwargs,
         )
         super().__init__()
 
+    def _fused_aggregates(self):
+        proportion = (
+            "sum(outgoing::integer){filter}::float / count(subscriber){filter}::float"
+        )
+        return (
+            self.unioned_query,
+            None,
+            {
+                "proportion_outgoing": proportion,
+                "proportion_incoming": f"1 - ({proportion})",
+            },
+        )
+
     def _make_query(self):
 
         sql = """
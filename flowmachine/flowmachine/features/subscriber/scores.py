@@ -11,6 +11,7 @@ on a scoring dictionary.
 import re
 import datetime as dt
 from _md5 import md5
+from math import gcd
 from typing import List
 
 from ..utilities.sets import EventTableSubset, EventsTablesUnion
@@ -19,6 +20,37 @@ from ...core import JoinToLocation
 from ...utils.utils import get_columns_for_level
 
 
+def _seconds_since_midnight(time):
+    """
+    Convert the boundary of an hour score window to a number of seconds
+    since midnight.
+
+    Parameters
+    ----------
+    time : int, str or datetime.time
+        An hour (where 24 is the end of the day), a time string of the form
+        `09:30` or `09:30:00`, or a time.
+
+    Returns
+    -------
+    int
+    """
+    if isinstance(time, int):
+        return time * 3600
+    if isinstance(time, str):
+        if len(time) == 5:
+            time = time + ":00"
+        time = dt.datetime.strptime(time, "%H:%M:%S").time()
+    return time.hour * 3600 + time.minute * 60 + time.second
+
+
+def _sql_score(score):
+    """
+    Render a score as an SQL float literal, or NULL if there is no score.
+    """
+    return "NULL::float" if score is None else f"{float(score)!r}::float"
+
+
 class EventScore(Query):
     """
     Represents an event score class.
@@ -40,7 +72,8 @@ class EventScore(Query):
       not. Each value of the tuple can be an integer representing an hour, a
       string representing a given time (eg `09:30`) or a `datetime.time`
       instance. If the first value of the tuple is higher than the second one,
-      it indicates a window running across mid-night.
+      it indicates a window running across mid-night. Windows must start and
+      end on a whole minute.
     work_day : dict
       A dictionary whose keys is a tuple that indicates the day of the week
       window which the scores, which is represented by the dictionary value,
@@ -144,88 +177,88 @@ class EventScore(Query):
         ).date_subsets
         self.schema = "event_score"
         self.kwargs = kwargs
+        self._score_slots()  # Check the windows can be split into slots
 
         super().__init__()
 
-    def _make_query(self):
-
-        interpolate_hour = "CASE "
-
-        for window, score in self.score_hour.items():
-            start, stop = window
-            if type(start) == int:
-                if start == 24:
-                    start = "23:59:59"
-                else:
-                    start = str(start) + ":00:00"
-            if type(stop) == int:
-                if stop == 24:
-                    stop = "23:59:59"
-                else:
-                    stop = str(stop) + ":00:00"
-            if type(start) == str:
-                if len(start) == 5:
-                    start = start + ":00"
-                start = dt.datetime.strptime(start, "%H:%M:%S").time()
-            if type(stop) == str:
-                if len(stop) == 5:
-                    stop = stop + ":00"
-                stop = dt.datetime.strptime(stop, "%H:%M:%S").time()
-
-            if stop > start:
-                interpolate_hour += f"""
-                WHEN datetime::time >= '{start.strftime("%H:%M:%S")}'::time AND
-                     datetime::time < '{stop.strftime("%H:%M:%S")}'::time THEN {score}
-                """
-
-            elif start > stop:
-                interpolate_hour += f"""
-                WHEN datetime::time >= '{start.strftime("%H:%M:%S")}'::time OR
-                     datetime::time < '{stop.strftime("%H:%M:%S")}'::time THEN {score}
-                """
-
-            else:
-                interpolate_hour += f"""
-                WHEN datetime::time = '{start.strftime("%H:%M:%S")}'::time THEN {score}
-                """
-
-        interpolate_hour += " END"
-
-        interpolate_dow = "CASE "
-
-        for window, score in self.score_dow.items():
-            start, stop = window
-
-            if stop > start:
-                interpolate_dow += f"""
-                WHEN EXTRACT(DOW from datetime) >= {start} AND
-                     EXTRACT(DOW from datetime) < {stop} THEN {score}
-                """
-
-            elif start > stop:
-                interpolate_dow += f"""
-                WHEN EXTRACT(DOW from datetime) >= {start} OR
-                     EXTRACT(DOW FROM datetime) < {stop} THEN {score}
-                """
+    def _score_slots(self):
+        """
+        Split the week into equal slots, no longer than an hour, whose
+        boundaries include every boundary of the scoring windows, and score
+        each slot.
+
+        Returns
+        -------
+        int
+            Length of a slot in seconds
+        list of tuple
+            (slot number, hour score, day of week score) for every slot in
+            the week, where slot 0 starts at midnight on Sunday. Scores are None
+            where no scoring window covers the slot.
+        """
+        hour_windows = [
+            (_seconds_since_midnight(start), _seconds_since_midnight(stop), score)
+            for (start, stop), score in self.score_hour.items()
+        ]
+        slot_seconds = 3600
+        for start, stop, score in hour_windows:
+            slot_seconds = gcd(gcd(slot_seconds, start), stop)
+        if slot_seconds < 60:
+            raise ValueError("Hour score windows must start and end on a whole minute.")
+        slots_per_day = 86400 // slot_seconds
+
+        slots = []
+        for dow in range(7):
+            score_dow = next(
+                (
+                    score
+                    for (start, stop), score in self.score_dow.items()
+                    if (start <= dow < stop)
+                    or (start > stop and (dow >= start or dow < stop))
+                    or (start == stop == dow)
+                ),
+                None,
+            )
+            for slot in range(slots_per_day):
+                time = slot * slot_seconds
+                score_hour = next(
+                    (
+                        score
+                        for start, stop, score in hour_windows
+                        if (start <= time < stop)
+                        or (start > stop and (time >= start or time < stop))
+                    ),
+                    None,
+                )
+                slots.append((dow * slots_per_day + slot, score_hour, score_dow))
+        return slot_seconds, slots
 
-            else:
-                interpolate_dow += f"""
-                WHEN EXTRACT(DOW from datetime) = {start} THEN {score}
-                """
+    def _make_query(self):
 
-        interpolate_dow += " END"
+        slot_seconds, slots = self._score_slots()
+        slots_per_day = 86400 // slot_seconds
+        lookup = ",\n".join(
+            f"({slot}, {_sql_score(score_hour)}, {_sql_score(score_dow)})"
+            for slot, score_hour, score_dow in slots
+        )
 
         sub_queries = []
         for sd in self.sds:
             query = f"""
             SELECT subscriber, location_id, datetime,
-                   {interpolate_hour} AS score_hour,
-                   {interpolate_dow} AS score_dow
+                   EXTRACT(DOW FROM datetime)::integer * {slots_per_day}
+                   + floor(EXTRACT(EPOCH FROM datetime::time) / {slot_seconds})::integer AS slot
             FROM ({sd.get_query()}) AS subset_dates
             """
             sub_queries.append(query)
 
-        query = "\nUNION ALL\n".join(f"({sq})" for sq in sub_queries)
+        events = "\nUNION ALL\n".join(f"({sq})" for sq in sub_queries)
+        query = f"""
+            SELECT subscriber, location_id, datetime, score_hour, score_dow
+            FROM ({events}) AS events
+            INNER JOIN (VALUES {lookup}) AS slot_scores(slot, score_hour, score_dow)
+            USING (slot)
+        """
         query = JoinToLocation(
             query,
             level=self.level,
@@ -105,6 +105,16 @@ class SubscriberCallDurations(SubscriberFeature):
     def column_names(self) -> List[str]:
         return ["subscriber", f"duration_{self.statistic}"]
 
+    def _fused_aggregates(self):
+        where = None
+        if self.direction != "both":
+            where = "{}outgoing".format("" if self.direction == "out" else "NOT ")
+        return (
+            self.unioned_query,
+            where,
+            {f"duration_{self.statistic}": f"{self.statistic}(duration){{filter}}"},
+        )
+
     def _make_query(self):
         where_clause = ""
         if self.direction != "both":
@@ -10,7 +10,7 @@ have done over a certain time period.
 
 """
 from .metaclasses import SubscriberFeature
-from ..utilities.sets import EventTableSubset, EventsTablesUnion
+from ..utilities.sets import EventTableSubset, EventsTablesUnion, decode_subscribers
 
 
 class SubscriberDegree(SubscriberFeature):
@@ -32,6 +32,9 @@ class SubscriberDegree(SubscriberFeature):
         If provided, string or list of string which are msisdn or imeis to limit
         results to; or, a query or table which has a column with a name matching
         subscriber_identifier (typically, msisdn), to limit results to.
+    encode_subscribers : bool, default False
+        Set to True to count contacts using integer subscriber keys, which
+        are decoded in the result.
     kwargs
         Passed to flowmachine.EventTableUnion
 
@@ -59,7 +62,13 @@ class SubscriberDegree(SubscriberFeature):
     """
 
     def __init__(
-        self, start, stop, table="all", subscriber_identifier="msisdn", **kwargs
+        self,
+        start,
+        stop,
+        table="all",
+        subscriber_identifier="msisdn",
+        encode_subscribers=False,
+        **kwargs,
     ):
         """
 
@@ -69,6 +78,7 @@ class SubscriberDegree(SubscriberFeature):
         self.start = start
         self.stop = stop
         self.subscriber_identifier = subscriber_identifier
+        self.encode_subscribers = encode_subscribers
         try:
             self.hours = kwargs["hours"]
         except KeyError:
@@ -80,7 +90,8 @@ class SubscriberDegree(SubscriberFeature):
             tables=self.table,
             columns=column_list,
             subscriber_identifier=self.subscriber_identifier,
-            **kwargs
+            encode_subscribers=self.encode_subscribers,
+            **kwargs,
         )
         self._cols = ["subscriber", "degree"]
         super().__init__()
@@ -98,6 +109,9 @@ class SubscriberDegree(SubscriberFeature):
             unioned_query=self.unioned_query.get_query()
         )
 
+        if self.encode_subscribers:
+            sql = decode_subscribers(sql, self._cols)
+
         return sql
 
 
@@ -121,6 +135,9 @@ class SubscriberInDegree(SubscriberDegree):
             unioned_query=self.unioned_query.get_query()
         )
 
+        if self.encode_subscribers:
+            sql = decode_subscribers(sql, self._cols)
+
         return sql
 
 
@@ -144,4 +161,7 @@ class SubscriberOutDegree(SubscriberDegree):
             unioned_query=self.unioned_query.get_query()
         )
 
+        if self.encode_subscribers:
+            sql = decode_subscribers(sql, self._cols)
+
         return sql
@@ -13,14 +13,192 @@ problem in hand.
 
 
 """
+import os
 import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from typing import List
 
+import numpy as np
+import pandas as pd
+
 from ...core.query import Query
+from ...utils.utils import rlock
 from ...core.mixins import GeoDataMixin
 from .call_days import CallDays
 
 
+# WGS84 spheroid, as used by postgis for distances between geographies
+_WGS84_A = 6378137.0
+_WGS84_F = 1 / 298.257223563
+_WGS84_B = _WGS84_A * (1 - _WGS84_F)
+
+
+def _spheroid_distance(lon1, lat1, lon2, lat2):
+    """
+    Distance in metres between points on the WGS84 spheroid, using Vincenty's
+    inverse formula vectorised over numpy arrays. NaN coordinates give a NaN
+    distance.
+
+    Parameters
+    ----------
+    lon1, lat1 : numpy.ndarray or float
+        Longitudes and latitudes, in degrees, of the first points
+    lon2, lat2 : numpy.ndarray or float
+        Longitudes and latitudes, in degrees, of the second points
+
+    Returns
+    -------
+    numpy.ndarray
+        Distances in metres
+    """
+    L = np.radians(np.asarray(lon2, dtype=float) - np.asarray(lon1, dtype=float))
+    U1 = np.arctan((1 - _WGS84_F) * np.tan(np.radians(lat1)))
+    U2 = np.arctan((1 - _WGS84_F) * np.tan(np.radians(lat2)))
+    sin_U1, cos_U1 = np.sin(U1), np.cos(U1)
+    sin_U2, cos_U2 = np.sin(U2), np.cos(U2)
+
+    lam = L
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for _ in range(200):
+            sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+            sin_sigma = np.sqrt(
+                (cos_U2 * sin_lam) ** 2
+                + (cos_U1 * sin_U2 - sin_U1 * cos_U2 * cos_lam) ** 2
+            )
+            cos_sigma = sin_U1 * sin_U2 + cos_U1 * cos_U2 * cos_lam
+            sigma = np.arctan2(sin_sigma, cos_sigma)
+            sin_alpha = np.where(
+                sin_sigma == 0, 0.0, cos_U1 * cos_U2 * sin_lam / sin_sigma
+            )
+            cos2_alpha = 1 - sin_alpha ** 2
+            # Points on the equator have no meaningful cos(2 sigma_m)
+            cos_2sigma_m = np.where(
+                cos2_alpha == 0, 0.0, cos_sigma - 2 * sin_U1 * sin_U2 / cos2_alpha
+            )
+            C = _WGS84_F / 16 * cos2_alpha * (4 + _WGS84_F * (4 - 3 * cos2_alpha))
+            lam_prev = lam
+            lam = L + (1 - C) * _WGS84_F * sin_alpha * (
+                sigma
+                + C
+                * sin_sigma
+                * (cos_2sigma_m + C * cos_sigma * (-1 + 2 * cos_2sigma_m ** 2))
+            )
+            if not np.any(np.abs(lam - lam_prev) > 1e-12):
+                break
+
+        u2 = cos2_alpha * (_WGS84_A ** 2 - _WGS84_B ** 2) / _WGS84_B ** 2
+        A = 1 + u2 / 16384 * (4096 + u2 * (-768 + u2 * (320 - 175 * u2)))
+        B = u2 / 1024 * (256 + u2 * (-128 + u2 * (74 - 47 * u2)))
+        delta_sigma = (
+            B
+            * sin_sigma
+            * (
+                cos_2sigma_m
+                + B
+                / 4
+                * (
+                    cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)
+                    - B
+                    / 6
+                    * cos_2sigma_m
+                    * (-3 + 4 * sin_sigma ** 2)
+                    * (-3 + 4 * cos_2sigma_m ** 2)
+                )
+            )
+        )
+    return _WGS84_B * A * (sigma - delta_sigma)
+
+
+def _hartigan_assign(site_ids, versions, weights, lons, lats, thresholds):
+    """
+    Hartigan clustering of one subscriber's call days, following the
+    hartigan_assign aggregate in flowdb.
+
+    Parameters
+    ----------
+    site_ids, versions : list
+        Site ids and versions of each call day row, ordered by call days
+        descending
+    weights : list of int
+        Number of call days at each site
+    lons, lats : list of float
+        Coordinates of each site, NaN if the site has no location
+    thresholds : list of float
+        Clustering radius in km for each row
+
+    Returns
+    -------
+    list of tuple
+        A (lon, lat, rank, calldays, site_ids, versions) tuple for each cluster,
+        in order of creation, with the site ids and versions of the cluster
+        joined by '::'.
+    """
+    c_lons, c_lats, c_weights, c_sites, c_versions = [], [], [], [], []
+    for site_id, version, weight, lon, lat, threshold in zip(
+        site_ids, versions, weights, lons, lats, thresholds
+    ):
+        matches = []
+        if c_lons:
+            distances = _spheroid_distance(c_lons, c_lats, lon, lat)
+            # A NaN distance or threshold never matches, as for NULL in SQL
+            matches = np.flatnonzero(distances < threshold * 1000)
+        if len(matches):
+            i = matches[0]
+            new_weight = c_weights[i] + weight
+            c_lons[i] = (c_lons[i] * c_weights[i] + lon * weight) / new_weight
+            c_lats[i] = (c_lats[i] * c_weights[i] + lat * weight) / new_weight
+            c_weights[i] = new_weight
+            c_sites[i] = f"{c_sites[i]}::{site_id}"
+            c_versions[i] = f"{c_versions[i]}::{version}"
+        else:
+            c_lons.append(lon)
+            c_lats.append(lat)
+            c_weights.append(weight)
+            c_sites.append(site_id)
+            c_versions.append(str(version))
+    return [
+        (lon, lat, rank, weight, site_ids, versions)
+        for rank, (lon, lat, weight, site_ids, versions) in enumerate(
+            zip(c_lons, c_lats, c_weights, c_sites, c_versions), 1
+        )
+    ]
+
+
+def _hartigan_assign_batch(subscribers):
+    """
+    Run _hartigan_assign for a batch of subscribers, in a worker process.
+
+    Parameters
+    ----------
+    subscribers : list of tuple
+        A (subscriber, rows) pair for each subscriber, where rows are the
+        (site_id, version, calldays, radius, lon, lat) rows of their call
+        days
+
+    Returns
+    -------
+    list of tuple
+        A (subscriber, lon, lat, rank, calldays, site_ids, versions) row
+        for each cluster
+    """
+    clusters = []
+    for subscriber, rows in subscribers:
+        site_ids, versions, weights, thresholds, lons, lats = zip(*rows)
+        clusters.extend(
+            (subscriber,) + cluster
+            for cluster in _hartigan_assign(
+                site_ids,
+                versions,
+                weights,
+                np.array(lons, dtype=float),
+                np.array(lats, dtype=float),
+                np.array(thresholds, dtype=float),
+            )
+        )
+    return clusters
+
+
 class BaseCluster(GeoDataMixin, Query):
     """ Base query for cluster methods, providing a geo augmented query method."""
 
@@ -182,6 +360,12 @@ class HartiganCluster(BaseCluster):
     call_threshold : float
         The minimum number of calls that a cluster must have. Any cluster
         with less than that amount of calls will be eliminated.
+    engine : {'sql', 'python'}, default 'sql'
+        Where to run the clustering. 'sql' uses the hartigan aggregate
+        in flowdb. 'python' reads the call days out in batches and clusters
+        them with numpy in a pool of worker processes, storing the clusters
+        in the cache before buffering them in the database, and is much
+        faster for large numbers of subscribers. Both give the same clusters.
 
     Examples
     --------
@@ -213,7 +397,7 @@ class HartiganCluster(BaseCluster):
 
     """
 
-    def __init__(self, calldays, radius, buffer=0, call_threshold=0):
+    def __init__(self, calldays, radius, buffer=0, call_threshold=0, engine="sql"):
         """
         """
 
@@ -225,9 +409,18 @@ class HartiganCluster(BaseCluster):
             raise TypeError(
                 "calldays must be a subclass of Query (e.g. CallDays, Table, CustomQuery"
             )
+        if engine not in ("sql", "python"):
+            raise ValueError(
+                f"Unrecognised engine '{engine}'. Must be one of 'sql' or 'python'."
+            )
+        self.engine = engine
+        if engine == "python":
+            self.assignments = _HartiganAssignments(calldays, radius)
         super().__init__()
 
     def _make_query(self):
+        if self.engine == "python":
+            return self._make_python_query()
 
         calldays = "({}) AS calldays".format(self.calldays.get_query())
 
@@ -248,6 +441,45 @@ class HartiganCluster(BaseCluster):
 
         return sql
 
+    def _make_python_query(self):
+        """
+        Buffer and filter the clusters found by _HartiganAssignments, as
+        the hartigan_buffer function does for the sql engine.
+        """
+        if not self.assignments.is_stored:
+            # The clusters can only be read from sql once they are stored
+            schema, name = self.assignments.table_name.split(".")
+            self.assignments._to_sql(name, schema=schema)
+        point = "ST_SetSRID(ST_MakePoint(assignments.lon, assignments.lat), 4326)::geography"
+        sites_join = ""
+        if self.buffer > 0:
+            # Clusters of a single site are the site's polygon, if it has one
+            cluster = f"""
+            CASE WHEN assignments.versions ~ '::' OR sites.geom_polygon IS NULL
+                 THEN ST_Buffer({point}, {self.buffer} * 1000)
+                 ELSE sites.geom_polygon::geography
+            END"""
+            sites_join = """
+            LEFT JOIN infrastructure.sites AS sites
+                ON sites.id = assignments.site_ids
+                AND sites.version::text = assignments.versions"""
+        else:
+            cluster = point
+
+        sql = f"""
+        SELECT assignments.subscriber,
+               {cluster} AS cluster,
+               assignments.rank,
+               assignments.calldays,
+               regexp_split_to_array(assignments.site_ids, '::') AS site_id,
+               regexp_split_to_array(assignments.versions, '::')::integer[] AS version
+        FROM ({self.assignments.get_query()}) AS assignments
+        {sites_join}
+        WHERE assignments.calldays >= {self.call_threshold}
+        """
+
+        return sql
+
     @property
     def column_names(self) -> List[str]:
         return ["subscriber", "cluster", "rank", "calldays", "site_id", "version"]
@@ -296,6 +528,129 @@ class HartiganCluster(BaseCluster):
         return _JoinedHartiganCluster(self, query)
 
 
+class _HartiganAssignments(Query):
+    """
+    Hartigan clusters of each subscriber's call days, computed outside the
+    database. This is a helper for HartiganCluster with engine='python'.
+
+    The call days are read through a server-side cursor in batches, and
+    each batch of subscribers is clustered in a pool of worker processes.
+    The clusters are stored in the cache as centroid coordinates, with the
+    site ids and versions of each cluster joined by '::'. The clusters are
+    stored, in the calling thread, the first time a HartiganCluster using
+    them is stored or needs its sql.
+
+    Parameters
+    ----------
+    calldays : flowmachine.core.Query
+        Call days per subscriber and versioned-site, ordered by subscriber
+        and descending call days, as produced by CallDays.
+    radius : float or str
+        The threshold value in km to be used for clustering towers, or
+        the name of a column in the call day table.
+    """
+
+    batch_size = 100000
+    store_with_dependents = True
+    max_workers = None
+
+    def __init__(self, calldays, radius):
+        self.calldays = calldays
+        self.radius = radius
+        super().__init__()
+
+    @property
+    def column_names(self) -> List[str]:
+        return ["subscriber", "lon", "lat", "rank", "calldays", "site_ids", "versions"]
+
+    def _make_query(self):
+        # The clusters only exist in the database once stored
+        return f"SELECT * FROM {self.table_name}"
+
+    def _to_sql(self, name, schema=None, as_view=False, force=False):
+        """
+        Cluster the call days and store the result in the database, blocking
+        until the store has completed. The clusters can't be stored as a view.
+        """
+        if as_view:
+            raise ValueError("Hartigan assignments cannot be stored as a view.")
+        with rlock(self.redis, self.md5):
+            if force:
+                self.invalidate_db_cache(name, schema=schema)
+            if not self.connection.has_table(name, schema=schema):
+                full_name = name if schema is None else f"{schema}.{name}"
+                with self.connection.engine.begin() as trans:
+                    trans.execute(
+                        f"""
+                        CREATE TABLE {full_name} (
+                            subscriber TEXT, lon DOUBLE PRECISION,
+                            lat DOUBLE PRECISION, rank BIGINT, calldays BIGINT,
+                            site_ids TEXT, versions TEXT
+                        )"""
+                    )
+                    # Write the clusters out as each batch is done, rather
+                    # than holding them all in memory
+                    for clusters in self._assign():
+                        pd.DataFrame(clusters, columns=self.column_names).to_sql(
+                            name, trans, schema=schema, index=False, if_exists="append"
+                        )
+                if schema == "cache":
+                    self._db_store_cache_metadata()
+        return self
+
+    def _assign(self):
+        """
+        Read the call days and cluster them in worker processes, keeping
+        a couple of batches per worker in flight.
+
+        Yields
+        ------
+        list of tuple
+            A (subscriber, lon, lat, rank, calldays, site_ids, versions) row
+            for each cluster in a batch of subscribers
+        """
+        if isinstance(self.radius, str):
+            radius = f"calldays.{self.radius}"
+        else:
+            radius = self.radius
+        # Number the rows so that each subscriber's call days are clustered
+        # in the same order the hartigan aggregate would see them when
+        # grouping by subscriber
+        sql = f"""
+        SELECT calldays.subscriber, calldays.site_id, calldays.version,
+               calldays.calldays::integer, ({radius})::double precision,
+               ST_X(sites.geom_point::geometry), ST_Y(sites.geom_point::geometry)
+        FROM (SELECT calldays.*, row_number() OVER () AS position
+              FROM ({self.calldays.get_query()}) AS calldays) AS calldays
+        LEFT JOIN infrastructure.sites AS sites
+            ON sites.id = calldays.site_id AND sites.version = calldays.version
+        ORDER BY calldays.subscriber, calldays.position
+        """
+        max_workers = self.max_workers or os.cpu_count() or 1
+        in_flight = deque()
+        subscriber, rows = None, []
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            for batch in self.connection.fetch_batches(sql, self.batch_size):
+                subscribers = []
+                for row in batch:
+                    if row[0] != subscriber:
+                        if rows:
+                            subscribers.append((subscriber, rows))
+                        subscriber, rows = row[0], []
+                    rows.append(row[1:])
+                # The last subscriber may carry on into the next batch
+                if subscribers:
+                    in_flight.append(pool.submit(_hartigan_assign_batch, subscribers))
+                if len(in_flight) > 2 * max_workers:
+                    yield in_flight.popleft().result()
+            if rows:
+                in_flight.append(
+                    pool.submit(_hartigan_assign_batch, [(subscriber, rows)])
+                )
+            while in_flight:
+                yield in_flight.popleft().result()
+
+
 class _JoinedHartiganCluster(BaseCluster):
     """
     Join the versioned-sites composing the Hartigan cluster table with other
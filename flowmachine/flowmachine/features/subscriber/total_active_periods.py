@@ -22,13 +22,12 @@ References
 """
 
 from .metaclasses import SubscriberFeature
+from ...core.union import UnionAll
 from ...utils.utils import parse_datestring, time_period_add
 from ..utilities.sets import UniqueSubscribers
 
 import datetime
 
-from functools import reduce
-
 
 class TotalActivePeriodsSubscriber(SubscriberFeature):
     """
@@ -133,7 +132,7 @@ class TotalActivePeriodsSubscriber(SubscriberFeature):
             UniqueSubscribers(start, stop, **kwargs)
             for start, stop in zip(self.starts, self.stops)
         ]
-        return reduce(lambda x, y: x.union(y), all_subscribers)
+        return UnionAll(*all_subscribers)
 
     def plot(self, **kwargs):
         """
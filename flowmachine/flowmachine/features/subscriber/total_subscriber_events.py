@@ -10,7 +10,7 @@ have done over a certain time period.
 
 """
 import flowmachine
-from ..utilities.sets import EventsTablesUnion
+from ..utilities.sets import EventsTablesUnion, PartitionedAggregate
 from .metaclasses import SubscriberFeature
 
 
@@ -41,6 +41,10 @@ class TotalSubscriberEvents(SubscriberFeature):
         If provided, string or list of string which are msisdn or imeis to limit
         results to; or, a query or table which has a column with a name matching
         subscriber_identifier (typically, msisdn), to limit results to.
+    parallel : bool, default False
+        Set to True to count the events in each event table and day
+        separately, in parallel, and then add the counts up. See
+        PartitionedAggregate.
 
     Notes
     -----
@@ -69,6 +73,7 @@ class TotalSubscriberEvents(SubscriberFeature):
         direction="both",
         event_type="ALL",
         subscriber_identifier="msisdn",
+        parallel=False,
         *args,
         **kwargs,
     ):
@@ -80,6 +85,7 @@ class TotalSubscriberEvents(SubscriberFeature):
         self.direction = direction
         self.event_type = event_type
         self.subscriber_identifier = subscriber_identifier
+        self.parallel = parallel
 
         if self.direction not in ["both", "out", "in"]:
             raise ValueError("Unrecognised direction {}".format(self.direction))
@@ -98,14 +104,56 @@ class TotalSubscriberEvents(SubscriberFeature):
             subscriber_identifier=self.subscriber_identifier,
             **kwargs,
         )
+        if self.parallel:
+            self.counts = PartitionedAggregate(
+                self.unioned,
+                group_by=["subscriber"],
+                aggregates={"total": ("count", "*")},
+                where=self._direction_condition(),
+            )
 
         super().__init__()
 
+    def _direction_condition(self):
+        """
+        Condition on the outgoing column selecting events in the requested
+        direction, or None for both directions.
+        """
+        if self.direction == "out":
+            return "outgoing"
+        elif self.direction == "in":
+            return "NOT outgoing"
+        return None
+
+    def _to_sql(self, name, schema=None, as_view=False, force=False):
+        """
+        Store the per-partition counts in parallel before the total, when
+        counting in parallel. See Query._to_sql.
+        """
+        if self.parallel and not as_view:
+            # Stored directly, as this may be running in one of the
+            # query threadpool's workers
+            counts_schema, counts_name = self.counts.table_name.split(".")
+            self.counts._to_sql(counts_name, schema=counts_schema)
+        return super()._to_sql(name, schema=schema, as_view=as_view, force=force)
+
+    def _fused_aggregates(self):
+        if self.parallel:
+            return None
+        return self.unioned, self._direction_condition(), {"total": "count(*){filter}"}
+
     def _make_query(self):
         """
         Default query method implemented in the
         metaclass Query().
         """
+        if self.parallel:
+            return f"""
+            SELECT subscriber, total
+            FROM ({self.counts.get_query()}) counts
+            ORDER BY total DESC
+            """
+
         if self.direction == "both":
             clause = ""
         elif self.direction == "out":
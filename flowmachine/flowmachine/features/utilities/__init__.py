@@ -14,5 +14,6 @@ from .sets import (
     EventTableSubset,
     UniqueSubscribers,
     EventsTablesUnion,
+    PartitionedAggregate,
     SubscriberLocationSubset,
 )
@@ -6,6 +6,8 @@
 Class definition for FeatureCollection, this is a group of
 joined features.
 """
+from typing import List
+
 from ...core import Query
 
 
@@ -24,6 +26,11 @@ class FeatureCollection(Query):
     dropna : bool
         Keeps rows in which a subscriber has some but not 
         all of the features. 
+    fuse : bool, default True
+        Compute subscriber features which aggregate the same events (same
+        dates, hours, tables and subscribers) in a single grouped pass over
+        those events, rather than scanning them once per feature and joining
+        the results. Other features are joined as usual.
 
     Examples
     --------
@@ -82,9 +89,23 @@ class FeatureCollection(Query):
 
     """
 
-    def __init__(self, metrics, dropna=True):
+    def __init__(self, metrics, dropna=True, fuse=True):
 
-        self.joined_metrics = self.__join_queries(metrics, dropna)
+        appends = [f"_{q.__class__.__name__}_{i}" for i, q in enumerate(metrics)]
+        if fuse:
+            parts = self.__fuse_queries(metrics, appends, dropna)
+        else:
+            parts = list(zip(metrics, appends))
+        self.joined_metrics = self.__join_queries(parts, dropna)
+        if len(parts) < len(metrics):
+            # Put the columns of fused features back in the order of the metrics
+            self.column_order = [metrics[0].column_names[0]] + [
+                f"{c}{append}".lower()
+                for q, append in zip(metrics, appends)
+                for c in q.column_names[1:]
+            ]
+        else:
+            self.column_order = None
 
         super().__init__()
 
@@ -97,31 +118,69 @@ class FeatureCollection(Query):
         metrics = [c(*args, **kwargs) for c in classes]
         return cls(metrics)
 
+    @staticmethod
+    def __fuse_queries(queries, appends, dropna):
+        """
+        Replace features which aggregate the same events with a single
+        query computing them together.
+
+        Returns
+        -------
+        list of tuple
+            (query, append) pairs to join, where fused queries have their
+            columns already appended to
+        """
+        keys, groups = [], {}
+        for q, append in zip(queries, appends):
+            fused_aggregates = getattr(q, "_fused_aggregates", None)
+            fused = None if fused_aggregates is None else fused_aggregates()
+            if fused is None or "*" in fused[0].columns:
+                keys.append(None)
+            else:
+                keys.append(fused[0]._scan_key())
+                groups.setdefault(keys[-1], []).append((append, fused))
+
+        parts = []
+        for q, append, key in zip(queries, appends, keys):
+            group = groups.get(key, [])
+            if len(group) < 2:
+                parts.append((q, append))
+            elif group[0][0] == append:
+                # Compute the whole group in place of its first feature
+                columns = []
+                for _, (unioned, _, _) in group:
+                    columns += [c for c in unioned.columns if c not in columns]
+                fused = _FusedSubscriberFeatures(
+                    group[0][1][0]._with_columns(columns),
+                    [
+                        (feature_append, where, aggregates)
+                        for feature_append, (_, where, aggregates) in group
+                    ],
+                    dropna,
+                )
+                parts.append((fused, ""))
+        return parts
+
     # Private method that joins multiple queries together
     # and returns a joined query.
     @staticmethod
-    def __join_queries(queries, dropna):
+    def __join_queries(parts, dropna):
 
+        (running_join, left_append), *rest = parts
+        if not rest:
+            return running_join
         # We want to handle the first case as a special case, as we
         # need to give the left object a name on the first join, but
         # not in any subsequent joins.
-        col = queries[0].column_names[0]
-        left_append = "_" + queries[0].__class__.__name__ + "_0"
-        right_append = "_" + queries[1].__class__.__name__ + "_1"
         how = "inner" if dropna else "full outer"
-        running_join = queries[0].join(
-            queries[1],
-            on_left=col,
-            left_append=left_append,
-            right_append=right_append,
-            how=how,
-        )
-
-        for i, q in enumerate(queries[2:]):
+        for i, (q, append) in enumerate(rest):
             col = q.column_names[0]
-            append = "_" + q.__class__.__name__ + "_{}".format(i + 2)
             running_join = running_join.join(
-                q, on_left=col, right_append=append, how=how
+                q,
+                on_left=col,
+                left_append=left_append if i == 0 else "",
+                right_append=append,
+                how=how,
             )
             # Trigger memoization
             _ = q.md5
@@ -131,4 +190,69 @@ class FeatureCollection(Query):
         return running_join
 
     def _make_query(self):
-        return self.joined_metrics.get_query()
+        if self.column_order is None:
+            return self.joined_metrics.get_query()
+        return f"""
+        SELECT {", ".join(self.column_order)}
+        FROM ({self.joined_metrics.get_query()}) AS features
+        """
+
+
+class _FusedSubscriberFeatures(Query):
+    """
+    Subscriber features which aggregate the same events, computed in a
+    single grouped pass over them. Helper for FeatureCollection.
+
+    Parameters
+    ----------
+    unioned : flowmachine.features.EventsTablesUnion
+        The events, with all the columns any of the features need
+    features : list of tuple
+        A tuple for each feature of the text to append to its column names,
+        the condition on the events, and its aggregates, as returned by
+        `SubscriberFeature._fused_aggregates`
+    dropna : bool
+        Only keep subscribers who have a value for every feature, otherwise
+        keep those with a value for any of them.
+    """
+
+    def __init__(self, unioned, features, dropna):
+        self.unioned = unioned
+        self.features = features
+        self.dropna = dropna
+        super().__init__()
+
+    @property
+    def column_names(self) -> List[str]:
+        return ["subscriber"] + [
+            f"{column}{append}".lower()
+            for append, _, aggregates in self.features
+            for column in aggregates
+        ]
+
+    def _make_query(self):
+        aggregates = []
+        has_events = []
+        for append, where, feature_aggregates in self.features:
+            if where is None:
+                condition, filter_clause = None, ""
+            else:
+                # A feature with no matching events would have no row
+                condition = f"count(*) FILTER (WHERE {where}) > 0"
+                filter_clause = f" FILTER (WHERE {where})"
+                has_events.append(condition)
+            for column, expression in feature_aggregates.items():
+                expression = expression.format(filter=filter_clause)
+                if condition is not None:
+                    expression = f"CASE WHEN {condition} THEN {expression} END"
+                aggregates.append(f"{expression} AS {column}{append.lower()}")
+
+        having = ""
+        if has_events and (self.dropna or len(has_events) == len(self.features)):
+            having = "HAVING " + (" AND " if self.dropna else " OR ").join(has_events)
+        return f"""
+        SELECT subscriber, {", ".join(aggregates)}
+        FROM ({self.unioned.get_query()}) AS events
+        GROUP BY subscriber
+        {having}
+        """
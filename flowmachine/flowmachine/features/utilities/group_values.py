@@ -7,10 +7,24 @@
 Utility class that allows the subscriber to iterate through arbitrary groups of fields
 and apply a python function to the results.
 """
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import pandas as pd
+
 from ...core.query import Query
 from .sets import EventTableSubset
 
 
+def _map_batch(fn, total_groups, batch):
+    """
+    Apply fn to the values of each row in a batch, in a worker process.
+    """
+    return [(row[:total_groups], fn(*row[total_groups:])) for row in batch]
+
+
 class GroupValues(Query):
     """
     Query representing groups of a certain columns
@@ -43,6 +57,7 @@ class GroupValues(Query):
     - In the case when the subscriber passes more than one group or more than one values the results will be an iterator of the following form:
         - (group1, group2, array(value1), array(value2))
     - This class is mostly used through the method `ColumnMap` which maps a subscriber defined python function to the output of the iterator.
+    - `ParallelColumnMap` does the same across a pool of worker processes.
 
     """
 
@@ -86,10 +101,19 @@ class GroupValues(Query):
 
         return sql
 
+    def _ordered_query(self):
+        """
+        The query, ordered by group so that results come back in the same
+        order even when it has been stored.
+        """
+        return "SELECT * FROM ({}) AS grouped ORDER BY {}".format(
+            self.get_query(), ",".join(self.groups)
+        )
+
     def ColumnMap(self, fn):
         """
         Maps a function to each of the returned arrays, and
-        returns an iterator over the results.
+        returns an iterator over the results, ordered by group.
         
         Examples
         --------
@@ -106,7 +130,72 @@ class GroupValues(Query):
         ...
         """
 
+        with self.connection.engine.begin() as trans:
+            results = trans.execute(self._ordered_query())
         return (
-            (results[: self.total_groups], fn(*results[self.total_groups :]))
-            for results in self
+            (row[: self.total_groups], fn(*row[self.total_groups :])) for row in results
         )
+
+    def ParallelColumnMap(
+        self, fn, max_workers=None, batch_size=1000, as_dataframe=False
+    ):
+        """
+        Maps a function to each of the returned arrays using a pool of worker
+        processes, and returns an iterator over the results ordered by group,
+        as `ColumnMap` does, or a dataframe of them.
+
+        Groups are fetched through a server-side cursor in batches, and each
+        batch is mapped in one of the workers, so only a few batches are held
+        in memory at once.
+
+        Parameters
+        ----------
+        fn : function
+            Function to apply to the value arrays of each group. Must be
+            picklable, so defined at the top level of a module, not a lambda
+            or a nested function.
+        max_workers : int, optional
+            Number of worker processes, defaults to the number of processors
+        batch_size : int, default 1000
+            Number of groups to fetch and send to a worker at a time
+        as_dataframe : bool, default False
+            Set to True to return a dataframe with a column for each group,
+            and the result of fn in a column named after it.
+
+        Returns
+        -------
+        generator or pandas.DataFrame
+            (groups, result) tuples, or a dataframe if as_dataframe is True
+
+        Examples
+        --------
+        >>> gv = GroupValues('msisdn_from', 'datetime')
+        >>> gv.ParallelColumnMap(highest_min, as_dataframe=True).head()
+              msisdn_from  highest_min
+        0  BKMy1nYEZpnoEA7G           58
+        1  DzpZJ2EaVQo2X5vM           56
+        ...
+        """
+        results = self._parallel_column_map(fn, max_workers, batch_size)
+        if not as_dataframe:
+            return results
+        return pd.DataFrame(
+            [groups + (result,) for groups, result in results],
+            columns=self.groups + [getattr(fn, "__name__", "value")],
+        )
+
+    def _parallel_column_map(self, fn, max_workers, batch_size):
+        map_batch = partial(_map_batch, fn, self.total_groups)
+        max_workers = max_workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            # Keep a couple of batches per worker in flight, yielding the
+            # oldest first to keep the results in order
+            in_flight = deque()
+            for batch in self.connection.fetch_batches(
+                self._ordered_query(), batch_size
+            ):
+                in_flight.append(pool.submit(map_batch, batch))
+                if len(in_flight) > 2 * max_workers:
+                    yield from in_flight.popleft().result()
+            while in_flight:
+                yield from in_flight.popleft().result()
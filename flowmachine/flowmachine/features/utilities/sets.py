@@ -6,12 +6,14 @@
 Utility classes for subsetting CDRs.
 
 """
+import datetime
 import logging
 import warnings
+from concurrent.futures import ThreadPoolExecutor
 from typing import List
 
 from ...core import Query, Table
-from ...utils.utils import list_of_dates, get_columns_for_level
+from ...utils.utils import list_of_dates, get_columns_for_level, parse_datestring
 from ...core.utils import _makesafe
 from ...core.errors import MissingDateError
 
@@ -21,6 +23,46 @@ logger = logging.getLogger("flowmachine").getChild(__name__)
 valid_subscriber_identifiers = ("msisdn", "imei", "imsi")
 
 
+def decode_subscribers(
+    sql, columns, encoded_columns=("subscriber", "msisdn_counterpart")
+):
+    """
+    Replace the integer keys in a query over encoded subscribers with the
+    subscriber identifiers they represent.
+
+    Parameters
+    ----------
+    sql : str
+        Query whose encoded columns contain keys from events.subscriber_ids
+    columns : list of str
+        All the columns of the query, in order
+    encoded_columns : tuple of str, default ("subscriber", "msisdn_counterpart")
+        Names of the columns which are encoded
+
+    Returns
+    -------
+    str
+        SQL query with the same columns, with identifiers in place of keys.
+    """
+    selects = []
+    joins = []
+    for column in columns:
+        if column in encoded_columns:
+            selects.append(f"{column}_ids.identifier AS {column}")
+            joins.append(
+                f"""LEFT JOIN events.subscriber_ids AS {column}_ids
+                ON {column}_ids.subscriber_id = encoded.{column}"""
+            )
+        else:
+            selects.append(f"encoded.{column}")
+    joins = "\n".join(joins)
+    return f"""
+    SELECT {", ".join(selects)}
+    FROM ({sql}) AS encoded
+    {joins}
+    """
+
+
 class EventTableSubset(Query):
     """
     Represent the whole of a dataset subset over certain date ranges.
@@ -48,6 +90,10 @@ class EventTableSubset(Query):
         If provided, string or list of string which are msisdn or imeis to limit
         results to; or, a query or table which has a column with a name matching
         subscriber_identifier (typically, msisdn), to limit results to.
+    encode_subscribers : bool, default False
+        Set to True to return the integer keys from events.subscriber_ids in
+        place of the subscriber and msisdn_counterpart columns. Use
+        decode_subscribers to turn them back into identifiers.
 
     Notes
     -----
@@ -57,6 +103,13 @@ class EventTableSubset(Query):
 
     * Use 24 hr format!
 
+    * Subscribers can only be encoded once events.subscriber_ids has been
+      populated for the requested dates (see the `encode_subscribers`
+      function in flowdb), otherwise their keys will be null.
+
+    * If the table has daily subtables (e.g. `events.calls_20160101`), only
+      the subtables for the requested dates are queried.
+
     Examples
     --------
     >>> sd = EventTableSubset('2016-01-01 13:30:30',
@@ -74,6 +127,7 @@ class EventTableSubset(Query):
         subscriber_subset=None,
         columns=["*"],
         subscriber_identifier="msisdn",
+        encode_subscribers=False,
         **kwargs,  # Allows the class to discard any extra kwargs without erroring
     ):
 
@@ -82,6 +136,7 @@ class EventTableSubset(Query):
         self.hours = hours
         self.subscriber_subset = subscriber_subset
         self.subscriber_identifier = subscriber_identifier.lower()
+        self.encode_subscribers = encode_subscribers
         if columns == ["*"]:
             self.table = Table(table)
             columns = self.table.column_names
@@ -171,48 +226,213 @@ class EventTableSubset(Query):
                 stacklevel=2,
             )
 
-    def _make_query(self):
-
-        where_clause = ""
+    @property
+    def _partition_dates(self):
+        """
+        The dates of the daily subtables of this table which may contain
+        events between start and stop.
+
+        Returns
+        -------
+        list of datetime
+            Dates of the relevant partitions, empty if the table is not
+            partitioned by day.
+        """
+        dates = self.connection._known_dates(self.table.name, self.table.schema)
         if self.start is not None:
-            where_clause += f"WHERE (datetime >= '{self.start}'::timestamptz)"
+            start_date = parse_datestring(self.start.split()[0])
+            dates = [d for d in dates if d >= start_date]
         if self.stop is not None:
-            where_clause += "WHERE " if where_clause == "" else " AND "
-            where_clause += f"(datetime <= '{self.stop}'::timestamptz)"
+            stop_date = parse_datestring(self.stop.split()[0])
+            dates = [d for d in dates if d <= stop_date]
+        return dates
 
-        sql = f"""
-        SELECT {", ".join(self.columns)}
-        FROM {self.table.table_name}
-        {where_clause}
+    def _hour_ranges(self, date):
         """
+        Express the hours of interest on a single day as half-open
+        timestamp ranges, so that the condition can use an index on datetime.
+
+        Parameters
+        ----------
+        date : datetime
+            Midnight of the day to get ranges for
+
+        Returns
+        -------
+        str
+            SQL condition selecting only the hours of interest on that day
+        """
+        first_hour, last_hour = self.hours
+        if first_hour < last_hour:
+            ranges = [(first_hour, last_hour)]
+        # If hours are backwards, then this will be interpreted as
+        # spanning midnight
+        else:
+            ranges = [(0, last_hour), (first_hour, 24)]
+        conditions = []
+        for low, high in ranges:
+            low = date + datetime.timedelta(hours=low)
+            high = date + datetime.timedelta(hours=high)
+            conditions.append(
+                f"(datetime >= '{low:%Y-%m-%d %X}'::timestamptz AND datetime < '{high:%Y-%m-%d %X}'::timestamptz)"
+            )
+        return " OR ".join(conditions)
 
+    def _datetime_conditions(self, dates=None):
+        """
+        Conditions restricting datetime to the start, stop and hours of
+        this subset.
+
+        Parameters
+        ----------
+        dates : list of datetime, optional
+            The days being queried. If not given, the hours are filtered
+            by extracting the hour of each event instead of by timestamp
+            range.
+
+        Returns
+        -------
+        list of str
+        """
+        conditions = []
+        if self.start is not None:
+            conditions.append(f"datetime >= '{self.start}'::timestamptz")
+        if self.stop is not None:
+            conditions.append(f"datetime <= '{self.stop}'::timestamptz")
         if self.hours != "all":
-            if self.hours[0] < self.hours[1]:
-                sql += f" AND EXTRACT(hour FROM datetime) BETWEEN {self.hours[0]} and {self.hours[1] - 1}"
-            # If dates are backwards, then this will be interpreted as
-            # spanning midnight
+            if dates is not None:
+                conditions.append(
+                    " OR ".join(f"({self._hour_ranges(date)})" for date in dates)
+                )
+            elif self.hours[0] < self.hours[1]:
+                conditions.append(
+                    f"EXTRACT(hour FROM datetime) BETWEEN {self.hours[0]} and {self.hours[1] - 1}"
+                )
             else:
-                sql += f" AND EXTRACT(hour FROM datetime)  >= {self.hours[0]}"
-                sql += f" OR EXTRACT(hour FROM datetime)  < {self.hours[1]}"
+                conditions.append(
+                    f"EXTRACT(hour FROM datetime) >= {self.hours[0]} OR EXTRACT(hour FROM datetime) < {self.hours[1]}"
+                )
+        return conditions
+
+    def _encoded_columns(self):
+        """
+        The columns to select, and any joins to events.subscriber_ids needed
+        to encode the subscriber columns as integers.
+
+        Returns
+        -------
+        list of str, str
+        """
+        if not self.encode_subscribers:
+            return self.columns, ""
+        encodings = {
+            f"{self.subscriber_identifier} AS subscriber": (
+                "subscriber",
+                self.subscriber_identifier,
+                self.subscriber_identifier,
+            ),
+            "msisdn_counterpart": (
+                "msisdn_counterpart",
+                "msisdn_counterpart",
+                "msisdn",
+            ),
+        }
+        columns = []
+        joins = []
+        for column in self.columns:
+            try:
+                name, source, identifier_type = encodings[column]
+                columns.append(f"{name}_ids.subscriber_id AS {name}")
+                joins.append(
+                    f"""LEFT JOIN events.subscriber_ids AS {name}_ids
+                    ON {name}_ids.identifier_type = '{identifier_type}'
+                    AND {name}_ids.identifier = {source}"""
+                )
+            except KeyError:
+                columns.append(column)
+        return columns, "\n".join(joins)
 
+    def _partition_queries(self, dates=None):
+        """
+        Queries selecting the events of this subset from individual daily
+        subtables.
+
+        Parameters
+        ----------
+        dates : list of datetime, optional
+            Days whose subtables should be queried. If not given, a single
+            query against the parent table is returned instead.
+
+        Returns
+        -------
+        list of str
+            One SQL query per date, which together make up this subset.
+        """
+        subscriber_conditions = []
+        subs_table = None
         if self.subscriber_subset is not None:
             try:
                 subs_table = self.subscriber_subset.get_query()
-                cols = ", ".join(
-                    c if "AS subscriber" not in c else "subscriber"
-                    for c in self.columns
-                )
-                sql = f"SELECT {cols} FROM ({sql}) ss INNER JOIN ({subs_table}) subs USING (subscriber)"
+                if self.encode_subscribers:
+                    # Subset on the identifiers, before they are encoded
+                    subscriber_conditions.append(
+                        f"{self.subscriber_identifier} IN (SELECT subscriber FROM ({subs_table}) AS subs)"
+                    )
+                    subs_table = None
             except AttributeError:
-                where_clause = "WHERE " if where_clause == "" else " AND "
                 try:
                     assert not isinstance(self.subscriber_subset, str)
                     ss = tuple(self.subscriber_subset)
                 except (TypeError, AssertionError):
                     ss = (self.subscriber_subset,)
-                sql = f"{sql} {where_clause} {self.subscriber_identifier} IN {_makesafe(ss)}"
+                subscriber_conditions.append(
+                    f"{self.subscriber_identifier} IN {_makesafe(ss)}"
+                )
 
-        return sql
+        columns, joins = self._encoded_columns()
+
+        def select_from(table, conditions):
+            sql = f"""
+            SELECT {", ".join(columns)}
+            FROM {table}
+            {joins}
+            """
+            if conditions:
+                sql += "WHERE " + " AND ".join(f"({c})" for c in conditions)
+            if subs_table is not None:
+                cols = ", ".join(
+                    c if "AS subscriber" not in c else "subscriber"
+                    for c in self.columns
+                )
+                sql = f"SELECT {cols} FROM ({sql}) ss INNER JOIN ({subs_table}) subs USING (subscriber)"
+            return sql
+
+        if dates is not None:
+            # Go straight to the daily subtables, so that only the relevant
+            # partitions are planned and scanned
+            return [
+                select_from(
+                    f"{self.table.fqn}_{date:%Y%m%d}",
+                    self._datetime_conditions([date]) + subscriber_conditions,
+                )
+                for date in dates
+            ]
+        if self.start is not None and self.stop is not None:
+            dates = [
+                parse_datestring(date)
+                for date in list_of_dates(self.start.split()[0], self.stop.split()[0])
+            ]
+        return [
+            select_from(
+                self.table.fqn, self._datetime_conditions(dates) + subscriber_conditions
+            )
+        ]
+
+    def _make_query(self):
+
+        return "\nUNION ALL\n".join(
+            self._partition_queries(self._partition_dates or None)
+        )
 
     @property
     def table_name(self):
@@ -244,6 +464,9 @@ class EventsTablesUnion(Query):
         If provided, string or list of string which are msisdn or imeis to limit
         results to; or, a query or table which has a column with a name matching
         subscriber_identifier (typically, msisdn), to limit results to.
+    encode_subscribers : bool, default False
+        Set to True to return integer keys in place of the subscriber and
+        msisdn_counterpart columns. See EventTableSubset.
     kwargs :
         passed to flowmachine.SubsetDates
 
@@ -301,6 +524,55 @@ class EventsTablesUnion(Query):
             raise MissingDateError(self.start, self.stop)
         return date_subsets
 
+    def _scan_key(self):
+        """
+        Key identifying the events this union reads, regardless of the
+        columns it selects. Unions with the same key can be replaced by a
+        single union of all their columns.
+
+        Returns
+        -------
+        tuple
+        """
+        subset = self.date_subsets[0]
+        subscriber_subset = subset.subscriber_subset
+        if isinstance(subscriber_subset, Query):
+            subscriber_subset = subscriber_subset.md5
+        return (
+            self.start,
+            self.stop,
+            tuple(self.tables),
+            repr(subset.hours),
+            subset.subscriber_identifier,
+            subset.encode_subscribers,
+            repr(subscriber_subset),
+        )
+
+    def _with_columns(self, columns):
+        """
+        A union of the same events as this one, selecting other columns.
+
+        Parameters
+        ----------
+        columns : list of str
+            Columns to select
+
+        Returns
+        -------
+        EventsTablesUnion
+        """
+        subset = self.date_subsets[0]
+        return EventsTablesUnion(
+            self.start,
+            self.stop,
+            columns=columns,
+            tables=self.tables,
+            hours=subset.hours,
+            subscriber_subset=subset.subscriber_subset,
+            subscriber_identifier=subset.subscriber_identifier,
+            encode_subscribers=subset.encode_subscribers,
+        )
+
     def _make_query(self):
 
         # Get the list of tables, select the relevant columns and union
@@ -315,6 +587,185 @@ class EventsTablesUnion(Query):
         raise NotImplementedError
 
 
+class _PartitionAggregate(Query):
+    """
+    Aggregate over the events of a single daily subtable of an
+    EventTableSubset. Used by PartitionedAggregate.
+
+    Parameters
+    ----------
+    subset : EventTableSubset
+        Events to aggregate
+    partition : str or None
+        ISO date of the subtable to aggregate, or None to aggregate the
+        whole subset
+    group_by : list of str
+        Columns to group by
+    aggregates : dict
+        Mapping from output column to a tuple of aggregate function and the
+        expression it is applied to
+    where : str, optional
+        Additional condition on the events
+    """
+
+    def __init__(self, subset, partition, group_by, aggregates, where=None):
+        self.subset = subset
+        self.partition = partition
+        self.group_by = list(group_by)
+        self.aggregates = dict(aggregates)
+        self.where = where
+        super().__init__()
+
+    @property
+    def column_names(self) -> List[str]:
+        return self.group_by + list(self.aggregates.keys())
+
+    def _make_query(self):
+        dates = None if self.partition is None else [parse_datestring(self.partition)]
+        events = "\nUNION ALL\n".join(self.subset._partition_queries(dates))
+        aggregates = [
+            f"{function}({expression}) AS {column}"
+            for column, (function, expression) in self.aggregates.items()
+        ]
+        where = "" if self.where is None else f"WHERE {self.where}"
+        group_by = f"GROUP BY {', '.join(self.group_by)}" if self.group_by else ""
+        return f"""
+        SELECT {", ".join(self.group_by + aggregates)}
+        FROM ({events}) AS events
+        {where}
+        {group_by}
+        """
+
+
+class PartitionedAggregate(Query):
+    """
+    Computes a decomposable aggregate of an EventsTablesUnion by running a
+    separate statement for each event table and day, spread across the
+    connection pool. When this query is stored, the partial results are
+    stored in the cache first and then merged, so the work scales with the
+    number of available connections rather than with the parallel workers
+    postgres chooses to use.
+
+    Parameters
+    ----------
+    events : EventsTablesUnion
+        Events to aggregate
+    group_by : list of str
+        Columns to group by
+    aggregates : dict
+        Mapping from output column to a tuple of aggregate function and the
+        expression it is applied to, e.g. {"total": ("count", "*")}. The
+        function must be one of count, sum, min, max, bool_and or bool_or.
+    where : str, optional
+        Additional condition on the events, e.g. "outgoing"
+
+    Notes
+    -----
+    Storing this query computes and stores any partial aggregates which are
+    not already in the cache, running as many at once as there are
+    connections available to flowmachine. Getting the SQL for this query
+    has no side effects, and reads from whichever partials are already
+    stored.
+
+    Examples
+    --------
+    >>> events = EventsTablesUnion("2016-01-01", "2016-01-03", columns=["msisdn"])
+    >>> PartitionedAggregate(events, ["subscriber"], {"total": ("count", "*")}).head()
+            subscriber  total
+    0  038OVABN11Ak4W5P     11
+    ...
+    """
+
+    # How to combine the partial results of each aggregate function
+    _merges = {
+        "count": "SUM({})::bigint",
+        "sum": "SUM({})",
+        "min": "MIN({})",
+        "max": "MAX({})",
+        "bool_and": "bool_and({})",
+        "bool_or": "bool_or({})",
+    }
+
+    def __init__(self, events, group_by, aggregates, where=None):
+        for column, (function, expression) in aggregates.items():
+            if function.lower() not in self._merges:
+                raise ValueError(
+                    f"Cannot compute {function} for {column} by partition. Must be one of {', '.join(self._merges)}."
+                )
+        self.events = events
+        self.group_by = list(group_by)
+        self.aggregates = {
+            column: (function.lower(), expression)
+            for column, (function, expression) in aggregates.items()
+        }
+        self.where = where
+        self.partials = [
+            _PartitionAggregate(
+                subset,
+                None if date is None else f"{date:%Y-%m-%d}",
+                self.group_by,
+                self.aggregates,
+                where=where,
+            )
+            for subset in events.date_subsets
+            for date in (subset._partition_dates or [None])
+        ]
+        super().__init__()
+
+    @property
+    def column_names(self) -> List[str]:
+        return self.group_by + list(self.aggregates.keys())
+
+    def _store_partials(self):
+        """
+        Store any partial aggregates which are not already cached, running
+        one per available connection at a time.
+        """
+        to_store = [partial for partial in self.partials if not partial.is_stored]
+        if not to_store:
+            return
+        max_workers = min(self.connection.max_connections, len(to_store))
+        logger.debug(
+            f"Computing {len(to_store)} of {len(self.partials)} partitions with {max_workers} workers."
+        )
+
+        def store(partial):
+            schema, name = partial.table_name.split(".")
+            return partial._to_sql(name, schema=schema)
+
+        # Use a dedicated pool, because this may itself be running in one
+        # of the query threadpool's workers
+        with ThreadPoolExecutor(max_workers) as executor:
+            for partial in executor.map(store, to_store):
+                logger.debug(
+                    f"Stored partition {partial.partition} of {partial.subset}"
+                )
+
+    def _to_sql(self, name, schema=None, as_view=False, force=False):
+        """
+        Store the partial aggregates in parallel, and then the merged
+        result of them. See Query._to_sql.
+        """
+        if not as_view:
+            self._store_partials()
+        return super()._to_sql(name, schema=schema, as_view=as_view, force=force)
+
+    def _make_query(self):
+        partials = "\nUNION ALL\n".join(
+            partial.get_query() for partial in self.partials
+        )
+        merged = [
+            f"{self._merges[function].format(column)} AS {column}"
+            for column, (function, expression) in self.aggregates.items()
+        ]
+        group_by = f"GROUP BY {', '.join(self.group_by)}" if self.group_by else ""
+        return f"""
+        SELECT {", ".join(self.group_by + merged)}
+        FROM ({partials}) AS partials
+        {group_by}
+        """
+
+
 class UniqueSubscribers(Query):
     """
     Class representing the set of all unique subscribers in our interactions
@@ -344,6 +795,9 @@ class UniqueSubscribers(Query):
         If provided, string or list of string which are msisdn or imeis to limit
         results to; or, a query or table which has a column with a name matching
         subscriber_identifier (typically, msisdn), to limit results to.
+    encode_subscribers : bool, default False
+        Set to True to find distinct subscribers using their integer keys,
+        which are decoded in the result.
 
     Notes
     -----
@@ -374,6 +828,7 @@ class UniqueSubscribers(Query):
         hours="all",
         table="all",
         subscriber_identifier="msisdn",
+        encode_subscribers=False,
         **kwargs,
     ):
         """
@@ -386,6 +841,7 @@ class UniqueSubscribers(Query):
         self.hours = hours
         self.tables = table
         self.subscriber_identifier = subscriber_identifier
+        self.encode_subscribers = encode_subscribers
         cols = [self.subscriber_identifier]
         self.unioned = EventsTablesUnion(
             self.start,
@@ -393,6 +849,7 @@ class UniqueSubscribers(Query):
             columns=cols,
             tables=self.tables,
             subscriber_identifier=self.subscriber_identifier,
+            encode_subscribers=self.encode_subscribers,
             **kwargs,
         )
 
@@ -403,7 +860,10 @@ class UniqueSubscribers(Query):
         return self.unioned.column_names
 
     def _make_query(self):
-        return f"SELECT DISTINCT unioned.subscriber FROM ({self.unioned.get_query()}) unioned"
+        sql = f"SELECT DISTINCT unioned.subscriber FROM ({self.unioned.get_query()}) unioned"
+        if self.encode_subscribers:
+            sql = decode_subscribers(sql, ["subscriber"])
+        return sql
 
     def as_set(self):
         """
@@ -10,6 +10,7 @@ These are used for creating base objects that are
 later used for computing subscriber features.
 
 """
+import datetime
 import logging
 import warnings
 
@@ -18,9 +19,14 @@ from .spatial_aggregates import SpatialAggregate, JoinedSpatialAggregate
 
 from ...core.query import Query
 from ...core.join_to_location import JoinToLocation
+from ...core.utils import _makesafe
+from ...utils.utils import parse_datestring
 
 logger = logging.getLogger("flowmachine").getChild(__name__)
 
+# Time zone the days and hours of events.subscriber_location_summary are in
+SUMMARY_TIME_ZONE = "UTC"
+
 
 class _SubscriberCells(Query):
     # Passing table='all' means it will look at all tables with location
@@ -62,6 +68,12 @@ class _SubscriberCells(Query):
     def column_names(self) -> List[str]:
         return ["subscriber", "time", "location_id"]
 
+    @property
+    def index_cols(self):
+        # Lets the first or last location of each subscriber be read in
+        # order, rather than sorting every row
+        return [["location_id"], ["subscriber", "time"]]
+
     def _make_query(self):
 
         if self.ignore_nulls:
@@ -79,6 +91,155 @@ class _SubscriberCells(Query):
         return sql
 
 
+class _SubscriberCellVisits(Query):
+    """
+    The number of times each subscriber was seen at each cell on each day,
+    and the times they were first and last seen there. Days are in
+    UTC, the time zone the subscriber location summary is bucketed in.
+
+    This is read from events.subscriber_location_summary when it covers
+    every requested day of every table, and otherwise from the events.
+
+    Parameters
+    ----------
+    subscriber_cells : _SubscriberCells
+        The subscriber sightings to count.
+    """
+
+    def __init__(self, subscriber_cells):
+        self.subscriber_cells = subscriber_cells
+        super().__init__()
+
+    @property
+    def column_names(self) -> List[str]:
+        return [
+            "subscriber",
+            "date",
+            "location_id",
+            "visits",
+            "first_seen",
+            "last_seen",
+        ]
+
+    @property
+    def _summary_available(self):
+        """
+        True if this query can be answered from events.subscriber_location_summary,
+        i.e. the summary has been built for every day of every table involved,
+        subscribers are identified by msisdn, nulls are ignored, all hours are
+        included, and start and stop fall on the hour.
+        """
+        cells = self.subscriber_cells
+        if not cells.ignore_nulls or cells.subscriber_identifier.lower() != "msisdn":
+            return False
+        # Hours are filtered in the session's time zone, which need not match
+        # the summary's buckets
+        if cells.hours != "all":
+            return False
+        if cells.start is None or cells.stop is None:
+            return False
+        try:
+            start = parse_datestring(cells.start)
+            stop = parse_datestring(cells.stop)
+        except ValueError:
+            return False
+        if any(d.minute or d.second for d in (start, stop)):
+            return False
+        for subset in cells.unioned.date_subsets:
+            if subset.table.schema != "events" or subset.encode_subscribers:
+                return False
+            dates = [
+                date
+                for date in self.connection._known_dates(
+                    subset.table.name, subset.table.schema
+                )
+                if start < date + datetime.timedelta(days=1) and date < stop
+            ]
+            if not dates or not set(dates).issubset(
+                self.connection._summarised_dates(subset.table.name)
+            ):
+                return False
+        return True
+
+    def _make_summary_query(self):
+        """
+        Sum the buckets of events.subscriber_location_summary for each day,
+        rather than scanning the events tables.
+        """
+        cells = self.subscriber_cells
+        tables = tuple(subset.table.name for subset in cells.unioned.date_subsets)
+        subscriber_subset = cells.unioned.date_subsets[0].subscriber_subset
+        conditions = [
+            f"table_name IN {_makesafe(tables)}",
+            f"""date BETWEEN ('{cells.start}'::timestamptz AT TIME ZONE '{SUMMARY_TIME_ZONE}')::date
+                AND ('{cells.stop}'::timestamptz AT TIME ZONE '{SUMMARY_TIME_ZONE}')::date""",
+            f"first_event >= '{cells.start}'::timestamptz",
+            f"last_event < '{cells.stop}'::timestamptz",
+        ]
+        boundary_conditions = [
+            f"datetime = '{cells.stop}'::timestamptz",
+            "location_id IS NOT NULL AND location_id !=''",
+        ]
+        subs_table = None
+        if subscriber_subset is not None:
+            try:
+                subs_table = subscriber_subset.get_query()
+            except AttributeError:
+                try:
+                    assert not isinstance(subscriber_subset, str)
+                    ss = tuple(subscriber_subset)
+                except (TypeError, AssertionError):
+                    ss = (subscriber_subset,)
+                conditions.append(f"msisdn IN {_makesafe(ss)}")
+                boundary_conditions.append(f"msisdn IN {_makesafe(ss)}")
+
+        sql = f"""
+                SELECT
+                    msisdn AS subscriber, date, location_id,
+                    event_count, first_event, last_event
+                FROM events.subscriber_location_summary
+                WHERE {" AND ".join(f"({c})" for c in conditions)}
+                """
+        # The summary covers whole hours, so events at exactly the stop time
+        # (which are included when querying the events tables) are picked up
+        # directly.
+        for subset in cells.unioned.date_subsets:
+            sql += f"""
+                UNION ALL
+                SELECT
+                    msisdn AS subscriber,
+                    (datetime AT TIME ZONE '{SUMMARY_TIME_ZONE}')::date AS date,
+                    location_id, 1, datetime, datetime
+                FROM {subset.table.fqn}
+                WHERE {" AND ".join(f"({c})" for c in boundary_conditions)}
+                """
+        if subs_table is not None:
+            sql = f"""
+                SELECT buckets.*
+                FROM ({sql}) buckets INNER JOIN ({subs_table}) subs USING (subscriber)
+                """
+        return f"""
+                SELECT
+                    subscriber, date, location_id, sum(event_count)::bigint AS visits,
+                    min(first_event) AS first_seen, max(last_event) AS last_seen
+                FROM ({sql}) buckets
+                GROUP BY subscriber, date, location_id
+                """
+
+    def _make_query(self):
+        if self._summary_available:
+            return self._make_summary_query()
+        return f"""
+                SELECT
+                    subscriber,
+                    (time AT TIME ZONE '{SUMMARY_TIME_ZONE}')::date AS date,
+                    location_id, count(*) AS visits,
+                    min(time) AS first_seen, max(time) AS last_seen
+                FROM ({self.subscriber_cells.get_query()}) AS subscriber_cells
+                GROUP BY 1, 2, 3
+                """
+
+
 class BaseLocation(Query):
     """
     Base Class for all daily and home location methods.
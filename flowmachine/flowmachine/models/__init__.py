@@ -8,7 +8,7 @@ added here. Models are mathematical representations
 of data that make predictions from that data.
 
 """
-from .louvain import Louvain
+from .louvain import Louvain, CSRGraph
 from .pwo import PopulationWeightedOpportunities
 
-__all__ = ["Louvain", "PopulationWeightedOpportunities"]
+__all__ = ["Louvain", "CSRGraph", "PopulationWeightedOpportunities"]
@@ -30,17 +30,376 @@ References
 """
 import logging
 import community
+import numpy as np
 import pandas as pd
 import networkx as nx
 import warnings
 
+from hashlib import md5
 from math import inf
 
 from ..core.model import Model, model_result
+from ..core.mixins.graph_mixin import _edge_arrays
 
 logger = logging.getLogger("flowmachine").getChild(__name__)
 
 
+def _csr_arrays(rows, cols, weights, n_nodes):
+    """
+    Build compressed sparse row arrays from edge arrays, summing the weights
+    of repeated edges.
+
+    Parameters
+    ----------
+    rows, cols : numpy.ndarray
+        Integer positions of the start and end of each edge
+    weights : numpy.ndarray
+        Weight of each edge
+    n_nodes : int
+        Number of nodes
+
+    Returns
+    -------
+    indptr, indices, weights : numpy.ndarray
+        The neighbours of node i are indices[indptr[i]:indptr[i + 1]], with
+        edge weights weights[indptr[i]:indptr[i + 1]].
+    """
+    order = np.lexsort((cols, rows))
+    rows, cols, weights = rows[order], cols[order], weights[order]
+    if len(rows) > 0:
+        first = np.ones(len(rows), dtype=bool)
+        first[1:] = (rows[1:] != rows[:-1]) | (cols[1:] != cols[:-1])
+        starts = np.flatnonzero(first)
+        weights = np.add.reduceat(weights, starts)
+        rows, cols = rows[starts], cols[starts]
+    indptr = np.zeros(n_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n_nodes), out=indptr[1:])
+    return indptr, cols, weights
+
+
+class CSRGraph:
+    """
+    An undirected, weighted graph stored as compressed sparse row arrays,
+    for graphs too large to handle comfortably with networkx.
+
+    The adjacency is stored symmetrically: an edge between u and v appears
+    in the rows of both u and v, and a self-loop on u is stored once with
+    twice its weight, so that the sum of a row is the weighted degree of
+    its node. Repeated edges are combined by summing their weights.
+
+    Parameters
+    ----------
+    nodes : numpy.ndarray
+        Labels of the nodes
+    indptr, indices, weights : numpy.ndarray
+        Compressed sparse row arrays, as returned by `_csr_arrays`
+
+    See Also
+    --------
+    CSRGraph.from_edges, CSRGraph.from_query
+    """
+
+    def __init__(self, nodes, indptr, indices, weights):
+        self.nodes = np.asarray(nodes)
+        self.indptr = indptr
+        self.indices = indices
+        self.weights = weights
+
+    @classmethod
+    def from_edges(cls, sources, targets, weights=None, nodes=None):
+        """
+        Build a graph from arrays of edges.
+
+        Parameters
+        ----------
+        sources, targets : array-like
+            If nodes is given, the integer positions in nodes of the ends of
+            each edge. Otherwise, the node labels.
+        weights : array-like, optional
+            Weight of each edge, defaults to 1
+        nodes : array-like, optional
+            Labels of the nodes
+
+        Returns
+        -------
+        CSRGraph
+        """
+        if nodes is None:
+            nodes, codes = np.unique(
+                np.concatenate([np.asarray(sources), np.asarray(targets)]),
+                return_inverse=True,
+            )
+            sources, targets = np.split(codes, 2)
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        if weights is None:
+            weights = np.ones(len(sources), dtype=float)
+        weights = np.asarray(weights, dtype=float)
+        loops = sources == targets
+        weights = np.where(loops, 2 * weights, weights)
+        rows = np.concatenate([sources, targets[~loops]])
+        cols = np.concatenate([targets, sources[~loops]])
+        weights = np.concatenate([weights, weights[~loops]])
+        return cls(nodes, *_csr_arrays(rows, cols, weights, len(nodes)))
+
+    @classmethod
+    def from_query(
+        cls, query, source=None, target=None, weight=None, batch_size=100000
+    ):
+        """
+        Build a graph from the result of a query, reading it from the
+        database in batches rather than all at once.
+
+        Parameters
+        ----------
+        query : flowmachine.core.Query
+            Query with a row for each edge
+        source, target : str, optional
+            Columns to use for the ends of each edge. Defaults to the first
+            two columns. Both or neither should be provided.
+        weight : str, optional
+            Column to use for the edge weights. If not given, all edges
+            have weight 1.
+        batch_size : int, default 100000
+            Number of rows to read at a time
+
+        Returns
+        -------
+        CSRGraph
+        """
+        nodes, sources, targets, weights = _edge_arrays(
+            query, source=source, target=target, weight=weight, batch_size=batch_size
+        )
+        return cls.from_edges(sources, targets, weights, nodes=nodes)
+
+    def __repr__(self):
+        try:
+            digest = self._digest
+        except AttributeError:
+            digest = md5()
+            for arr in (self.indptr, self.indices, self.weights):
+                digest.update(np.ascontiguousarray(arr).tobytes())
+            digest.update(str(self.nodes.tolist()).encode())
+            digest = self._digest = digest.hexdigest()
+        return "CSRGraph(nodes={}, edges={}, digest={})".format(
+            self.number_of_nodes(), self.number_of_edges(), digest
+        )
+
+    def _rows(self):
+        """
+        Row index of each stored entry.
+        """
+        return np.repeat(
+            np.arange(self.number_of_nodes(), dtype=np.int64), np.diff(self.indptr)
+        )
+
+    def number_of_nodes(self):
+        return len(self.nodes)
+
+    def number_of_edges(self):
+        loops = np.count_nonzero(self._rows() == self.indices)
+        return (len(self.indices) - loops) // 2 + loops
+
+    def degree(self):
+        """
+        Number of edges at each node, counting self-loops twice as
+        networkx does.
+
+        Returns
+        -------
+        numpy.ndarray
+        """
+        rows = self._rows()
+        loops = np.bincount(
+            rows[rows == self.indices], minlength=self.number_of_nodes()
+        )
+        return np.diff(self.indptr) + loops
+
+    def subgraph(self, nodes):
+        """
+        The graph induced by a subset of the nodes.
+
+        Parameters
+        ----------
+        nodes : array-like
+            Labels of nodes to keep
+
+        Returns
+        -------
+        CSRGraph
+        """
+        keep = np.isin(self.nodes, np.asarray(list(nodes), dtype=self.nodes.dtype))
+        return self._subgraph_mask(keep)
+
+    def _subgraph_mask(self, keep):
+        """
+        The graph induced by the nodes where keep is True.
+
+        Parameters
+        ----------
+        keep : numpy.ndarray
+            Boolean array with an entry for each node
+
+        Returns
+        -------
+        CSRGraph
+        """
+        n_kept = np.count_nonzero(keep)
+        new_positions = np.full(self.number_of_nodes(), -1, dtype=np.int64)
+        new_positions[keep] = np.arange(n_kept)
+        rows = new_positions[self._rows()]
+        cols = new_positions[self.indices]
+        kept = (rows >= 0) & (cols >= 0)
+        return CSRGraph(
+            self.nodes[keep],
+            *_csr_arrays(rows[kept], cols[kept], self.weights[kept], n_kept),
+        )
+
+
+# Minimum increase in modularity for another pass or level, as used by
+# python-louvain
+_MIN_INCREASE = 0.0000001
+
+
+def _modularity(graph, communities, resolution, total_weight):
+    """
+    Modularity of a partition of a CSRGraph.
+
+    Parameters
+    ----------
+    graph : CSRGraph
+    communities : numpy.ndarray
+        Community of each node, numbered from zero
+    resolution : float
+    total_weight : float
+        Sum of the weighted degrees of the graph
+
+    Returns
+    -------
+    float
+    """
+    row_communities = communities[graph._rows()]
+    internal = row_communities == communities[graph.indices]
+    n_communities = communities.max() + 1 if len(communities) else 0
+    inside = np.bincount(
+        row_communities[internal],
+        weights=graph.weights[internal],
+        minlength=n_communities,
+    )
+    totals = np.bincount(
+        row_communities, weights=graph.weights, minlength=n_communities
+    )
+    return (inside / total_weight - resolution * (totals / total_weight) ** 2).sum()
+
+
+def _one_level(graph, resolution, total_weight, random_state):
+    """
+    Move each node of a CSRGraph to the neighbouring community which most
+    increases modularity, until no move improves it.
+
+    Parameters
+    ----------
+    graph : CSRGraph
+    resolution : float
+    total_weight : float
+        Sum of the weighted degrees of the graph
+    random_state : numpy.random.RandomState
+        Used to shuffle the order nodes are visited in
+
+    Returns
+    -------
+    numpy.ndarray
+        Community of each node, numbered from zero
+    """
+    n_nodes = graph.number_of_nodes()
+    degrees = np.bincount(graph._rows(), weights=graph.weights, minlength=n_nodes)
+    communities = np.arange(n_nodes)
+    totals = degrees.copy()
+    modularity = _modularity(graph, communities, resolution, total_weight)
+    while True:
+        moved = False
+        for node in random_state.permutation(n_nodes):
+            start, stop = graph.indptr[node], graph.indptr[node + 1]
+            neighbours = graph.indices[start:stop]
+            not_self = neighbours != node
+            own = communities[node]
+            share = degrees[node] / total_weight
+            totals[own] -= degrees[node]
+            best = own
+            if not_self.any():
+                candidates, inverse = np.unique(
+                    communities[neighbours[not_self]], return_inverse=True
+                )
+                links = np.bincount(
+                    inverse, weights=graph.weights[start:stop][not_self]
+                )
+                gains = links - resolution * totals[candidates] * share
+                own_ix = np.searchsorted(candidates, own)
+                if own_ix < len(candidates) and candidates[own_ix] == own:
+                    own_gain = gains[own_ix]
+                else:
+                    own_gain = -resolution * totals[own] * share
+                best_ix = np.argmax(gains)
+                if gains[best_ix] - own_gain > 0:
+                    best = candidates[best_ix]
+            totals[best] += degrees[node]
+            if best != own:
+                communities[node] = best
+                moved = True
+        new_modularity = _modularity(graph, communities, resolution, total_weight)
+        if not moved or new_modularity - modularity < _MIN_INCREASE:
+            break
+        modularity = new_modularity
+    return np.unique(communities, return_inverse=True)[1]
+
+
+def louvain_partition(graph, resolution=1.0, random_state=None):
+    """
+    Find communities in a CSRGraph using the Louvain method, without
+    building a networkx graph. Equivalent to python-louvain's
+    `community.best_partition`.
+
+    Parameters
+    ----------
+    graph : CSRGraph
+        Graph to partition
+    resolution : float, default 1.0
+        Resolution; smaller values give smaller communities
+    random_state : int, optional
+        Seed for the order nodes are visited in
+
+    Returns
+    -------
+    dict
+        Mapping from node label to community number
+    """
+    random_state = np.random.RandomState(random_state)
+    partition = np.arange(graph.number_of_nodes())
+    total_weight = graph.weights.sum()
+    if total_weight == 0:
+        return dict(zip(graph.nodes.tolist(), partition.tolist()))
+    modularity = None
+    current = graph
+    while True:
+        communities = _one_level(current, resolution, total_weight, random_state)
+        new_modularity = _modularity(current, communities, resolution, total_weight)
+        if modularity is not None and new_modularity - modularity < _MIN_INCREASE:
+            break
+        modularity = new_modularity
+        partition = communities[partition]
+        # Collapse each community into a single node
+        current = CSRGraph(
+            np.arange(communities.max() + 1),
+            *_csr_arrays(
+                communities[current._rows()],
+                communities[current.indices],
+                current.weights,
+                communities.max() + 1,
+            ),
+        )
+    return dict(zip(graph.nodes.tolist(), partition.tolist()))
+
+
 class Louvain(Model):
     """
     Class for running the Louvain community identifying
@@ -50,11 +409,14 @@ class Louvain(Model):
 
     Parameters
     ----------
-    graph : networkx.Graph() object
+    graph : networkx.Graph() or CSRGraph object
         This parameter specifies a networkx.Graph()
         object to use. This can be a `flowmachine` feature
         (e.g. ContactBalance()) after calling the
-        to_networkx() method.
+        to_networkx() method. For large graphs, use a
+        CSRGraph built with CSRGraph.from_query(), which
+        holds the graph in arrays and is partitioned
+        without networkx.
 
     Examples
     --------
@@ -66,6 +428,13 @@ class Louvain(Model):
             flowmachine.features.ContactBalance('2016-01-02', '2016-01-07').to_networkx(
                 directed_graph=False))
 
+    Or, for a large graph:
+
+    >>> l = Louvain(
+            CSRGraph.from_query(
+                flowmachine.features.ContactBalance('2016-01-02', '2016-01-07'),
+                weight='events'))
+
     Now let's run the algorithm:
 
     >>> l.run(weight_property='events', min_members=9)
@@ -84,8 +453,10 @@ class Louvain(Model):
 
         self.graph = graph
 
-        if not isinstance(graph, nx.Graph):
-            raise ValueError("Graph provided is not a networkx Graph() type.")
+        if not isinstance(graph, (nx.Graph, CSRGraph)):
+            raise ValueError(
+                "Graph provided is not a networkx Graph() or CSRGraph type."
+            )
 
     def __get_partitions(self, resolution, weight="weight", **kwargs):
         """
@@ -97,7 +468,8 @@ class Louvain(Model):
         ----------
         weight :
             Column to use that represents edge
-            weights.
+            weights. Not used for a CSRGraph, which
+            has its weights set when it is built.
 
         resolution :
             Resolution of Louvain graph. Passed down
@@ -113,9 +485,14 @@ class Louvain(Model):
         community identifier.
 
         """
-        self.partition = community.best_partition(
-            self.graph_louvain, weight=weight, resolution=resolution, **kwargs
-        )
+        if isinstance(self.graph_louvain, CSRGraph):
+            self.partition = louvain_partition(
+                self.graph_louvain, resolution=resolution, **kwargs
+            )
+        else:
+            self.partition = community.best_partition(
+                self.graph_louvain, weight=weight, resolution=resolution, **kwargs
+            )
 
         return pd.DataFrame(
             list(self.partition.items()), columns=["subscriber", "community"]
@@ -169,19 +546,25 @@ class Louvain(Model):
 
         """
 
-        node_degrees = nx.degree(self.graph)
-        number_input_nodes = nx.number_of_nodes(self.graph)
-        number_input_edges = nx.number_of_edges(self.graph)
+        number_input_nodes = self.graph.number_of_nodes()
+        number_input_edges = self.graph.number_of_edges()
 
         #
         #  Filters the graph based on the
         #  number of minimum contacts.
         #
-        minimum_acceptance_nodes = [
-            n for n, v in node_degrees if v >= min_contacts and v <= max_contacts
-        ]
+        if isinstance(self.graph, CSRGraph):
+            node_degrees = self.graph.degree()
+            self.graph_louvain = self.graph._subgraph_mask(
+                (node_degrees >= min_contacts) & (node_degrees <= max_contacts)
+            )
+        else:
+            node_degrees = nx.degree(self.graph)
+            minimum_acceptance_nodes = [
+                n for n, v in node_degrees if v >= min_contacts and v <= max_contacts
+            ]
 
-        self.graph_louvain = self.graph.subgraph(minimum_acceptance_nodes)
+            self.graph_louvain = self.graph.subgraph(minimum_acceptance_nodes)
 
         #
         #  Compute the Louvain partitions and
@@ -218,14 +601,14 @@ class Louvain(Model):
             "output": {
                 "communities": communities["community"].nunique(),
                 "total_members": len(communities),
-                "nodes": nx.number_of_nodes(self.graph_louvain),
-                "edges": nx.number_of_edges(self.graph_louvain),
+                "nodes": self.graph_louvain.number_of_nodes(),
+                "edges": self.graph_louvain.number_of_edges(),
                 "reduction_nodes": round(
-                    1 - (nx.number_of_nodes(self.graph_louvain) / number_input_nodes), 3
+                    1 - (self.graph_louvain.number_of_nodes() / number_input_nodes), 3
                 )
                 * 100,
                 "reduction_edges": round(
-                    1 - (nx.number_of_edges(self.graph_louvain) / number_input_edges), 3
+                    1 - (self.graph_louvain.number_of_edges() / number_input_edges), 3
                 )
                 * 100,
             },
@@ -27,6 +27,7 @@ References
 import logging
 import warnings
 
+import numpy as np
 import pandas as pd
 
 from flowmachine.features import daily_location
@@ -74,13 +75,22 @@ class _populationBuffer(Query):
         An aggregated subscriber locating object
     distance_matrix : flowmachine.features.spatial.distance_matrix.DistanceMatrix
         A distance matrix
+    method : {'intersects', 'cumulative'}, default 'intersects'
+        'intersects' builds a buffer polygon for every pair of locations, and
+        finds the populated locations inside it with a spatial join. This
+        requires a distance matrix with geometries. 'cumulative' sums the
+        population of the locations around each destination in order of
+        distance, in a single pass over the distance matrix.
     """
 
-    def __init__(self, level, population_object, distance_matrix):
+    def __init__(self, level, population_object, distance_matrix, method="intersects"):
 
+        if method not in {"cumulative", "intersects"}:
+            raise ValueError(f"Unrecognised buffer method {method}")
         self.level = level
         self.population_object = population_object
         self.distance_matrix = distance_matrix
+        self.method = method
 
         super().__init__()
 
@@ -114,12 +124,52 @@ class _populationBuffer(Query):
 
         return sql
 
+    def __get_cumulative_buffer(self):
+        """
+        Protected method for generating SQL that calculates
+        the population covered by the buffer around each
+        destination, by summing the populations of the
+        locations in order of their distance from it.
+
+        For each pair the sum includes every location no
+        further from the destination than the origin is,
+        including the origin and destination themselves.
+        """
+        cols = get_columns_for_level(self.level)
+
+        from_cols = ", ".join("D.{c}_from".format(c=c) for c in cols)
+        to_cols = ", ".join("D.{c}_to".format(c=c) for c in cols)
+        pop_join = " AND ".join("P.{c} = D.{c}_from".format(c=c) for c in cols)
+        sql = """
+            SELECT
+                {froms},
+                {tos},
+                D.distance,
+                sum(coalesce(P.total, 0)) OVER destination AS buffer_population,
+                count(P.total) OVER destination AS n_sites
+            FROM ({distance_matrix_table}) AS D
+            LEFT JOIN ({population_table}) AS P
+                ON {pop_join}
+            WINDOW destination AS (PARTITION BY {tos} ORDER BY D.distance)
+        """.format(
+            distance_matrix_table=self.distance_matrix.get_query(),
+            population_table=self.population_object.get_query(),
+            pop_join=pop_join,
+            froms=from_cols,
+            tos=to_cols,
+        )
+
+        return sql
+
     def _make_query(self):
         """
         Protected method that generates SQL
         that calculates the population that is
         covered by a buffer.
         """
+        if self.method == "cumulative":
+            return self.__get_cumulative_buffer()
+
         cols = get_columns_for_level(self.level)
 
         from_cols = ", ".join("B.{c}_from".format(c=c) for c in cols)
@@ -201,6 +251,16 @@ class PopulationWeightedOpportunities(Model):
     level : str
         {levels}
 
+    buffer_method : {'intersects', 'cumulative'}, default 'intersects'
+        How to find the population within the distance
+        between each origin and destination. 'intersects'
+        joins every location against a buffer polygon for
+        every pair. 'cumulative' sums populations in order
+        of distance from the destination in one pass over
+        the distance matrix, which is much faster, and
+        always counts the origin and destination themselves,
+        as in Yan et al. The two can give different results.
+
     **kwargs : arguments
         Used to pass custom arguments to the DistanceMatrix()
         and HomeLocation() objects.
@@ -244,7 +304,13 @@ class PopulationWeightedOpportunities(Model):
     """
 
     def __init__(
-        self, start, stop, method="home-location", level="versioned-site", **kwargs
+        self,
+        start,
+        stop,
+        method="home-location",
+        level="versioned-site",
+        buffer_method="intersects",
+        **kwargs,
     ):
 
         warnings.warn(
@@ -258,8 +324,12 @@ class PopulationWeightedOpportunities(Model):
         self.stop = stop
         self.method = method
         self.level = level
+        self.buffer_method = buffer_method
         self.distance_matrix = DistanceMatrix(
-            date=self.stop, level=level, return_geometry=True, **kwargs
+            date=self.stop,
+            level=level,
+            return_geometry=buffer_method == "intersects",
+            **kwargs,
         )
 
         if self.method == "home-location":
@@ -274,53 +344,96 @@ class PopulationWeightedOpportunities(Model):
             level=self.level,
             population_object=self.population_object,
             distance_matrix=self.distance_matrix,
+            method=self.buffer_method,
         )
 
-    def __get_population(self, df, i):
+    @staticmethod
+    def _location_codes(locations, df, columns):
         """
-        Protected getter method for getting
-        the location value of the self.population_df
-        DataFrame.
+        Find the position of each row of a dataframe in the list of locations.
 
         Parameters
         ----------
-        i : object
-            The index in the self.population_df DataFrame
-            containing the location identifier.
+        locations : pandas.MultiIndex
+            Index of all the locations
+        df : pandas.DataFrame
+            Dataframe with location columns
+        columns : list of str
+            The location columns of the dataframe, in the same order as the
+            levels of `locations`
 
         Returns
         -------
-        A float value with the population value
-        for location i.
-
+        numpy.ndarray
+            Integer positions in `locations`, -1 where the location is unknown
         """
-        return df.loc[tuple(i), "total"]
+        return locations.get_indexer(
+            pd.MultiIndex.from_arrays([df[c].values for c in columns])
+        )
 
-    def __get_buffer_population(self, df, i, j):
+    def _departures(self, locations, uniform_departure_rate, departure_rate_vector):
         """
-        Protected getter method for getting
-        the location value of the self.population_buffer
-        DataFrame.
+        Get the proportion of the population departing each location.
 
         Parameters
         ----------
-        i : str
-            Location identifier of the origin location
-            in the self.population_buffer DataFrame.
-        j : str
-            Location identifier of the destination location
-            in the self.population_buffer DataFrame.
+        locations : list of tuple
+            Location identifiers
+        uniform_departure_rate : float
+            Rate to use if no departure_rate_vector is given
+        departure_rate_vector : dict
+            Departure rates keyed by location identifier
 
         Returns
         -------
-        A float value with the population value for
-        a pair of origin (i) and destination (j)
-        locations.
-
+        numpy.ndarray
+            The departure rate for each location
+        """
+        if not departure_rate_vector:
+            return np.full(len(locations), uniform_departure_rate, dtype=float)
+        rates = []
+        for i in locations:
+            try:
+                rates.append(departure_rate_vector[i[0]])
+            except KeyError:
+                rates.append(departure_rate_vector.get(tuple(i[:1]), 0))
+        return np.array(rates, dtype=float)
+
+    @staticmethod
+    def _predict(buffer_population, origins, population, departures, beta):
         """
-        filtered = df.loc[tuple(i + j)]
+        Compute the predicted flows from a block of origins to every
+        destination.
 
-        return filtered["buffer_population"]
+        Parameters
+        ----------
+        buffer_population : numpy.ndarray
+            Buffer population between each origin in the block (rows) and
+            every location (columns)
+        origins : numpy.ndarray
+            Positions of the block's origins among all locations
+        population : numpy.ndarray
+            Population of every location
+        departures : numpy.ndarray
+            Number of people departing every location
+        beta : float
+            One over the total population
+
+        Returns
+        -------
+        prediction, probability : numpy.ndarray
+            Predicted flows and probabilities, with the same shape as
+            buffer_population. Flows from a location to itself are zero.
+        """
+        rows = np.arange(len(origins))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            weights = population[np.newaxis, :] * ((1 / buffer_population) - beta)
+            weights[rows, origins] = 0
+            sigma = weights.sum(axis=1)
+            probability = weights / sigma[:, np.newaxis]
+        prediction = departures[origins, np.newaxis] * probability
+        probability[departures[origins] == 0] = 0
+        return prediction, probability
 
     @model_result
     def run(
@@ -328,6 +441,7 @@ class PopulationWeightedOpportunities(Model):
         uniform_departure_rate=0.1,
         departure_rate_vector=None,
         ignore_missing=False,
+        chunk_size=None,
     ):
         """
         Runs model.
@@ -354,81 +468,112 @@ class PopulationWeightedOpportunities(Model):
             found in the departure_rate_vector dictionary
             will be computed using zero departures.
 
+        chunk_size : int, optional
+            If given, compute the flows from this many origins at a time,
+            to limit the memory used for large numbers of locations.
+            Otherwise, all origins are computed at once. Must be at least 1.
+
         Returns
         -------
         A pandas dataframe with a mobility matrix.
 
         """
+        if chunk_size is not None and chunk_size < 1:
+            raise ValueError(
+                "chunk_size must be a positive number of origins, not {}.".format(
+                    chunk_size
+                )
+            )
 
         if "population_buffer" not in self.__dict__.keys():
-            logger.warn(
+            logger.warning(
                 " Computing Population() and DistanceMatrix() "
                 + "objects. This can take a few minutes."
             )
 
-            population_df = self.population_object.get_dataframe()
-            population_buffer = self.population_buffer_object.get_dataframe()
-            ix = get_columns_for_level(self.level)
-            ix = ["{}_{}".format(c, d) for d in ("from", "to") for c in ix]
-            population_buffer.set_index(ix, inplace=True)
+        loc_cols = get_columns_for_level(self.level)
+        from_cols = ["{}_from".format(c) for c in loc_cols]
+        to_cols = ["{}_to".format(c) for c in loc_cols]
+        population_df = self.population_object.get_dataframe()
+        population_buffer = self.population_buffer_object.get_dataframe()
 
-            M = population_df["total"].sum()
-            N = len(population_df[get_columns_for_level(self.level)].drop_duplicates())
-            beta = 1 / M
-
-            locations = population_df[get_columns_for_level(self.level)].values.tolist()
-            population_df.set_index(get_columns_for_level(self.level), inplace=True)
+        location_df = population_df[loc_cols].reset_index(drop=True)
+        location_index = pd.MultiIndex.from_arrays(
+            [location_df[c].values for c in loc_cols]
+        )
+        locations = [tuple(l) for l in location_df.values.tolist()]
+        n_locations = len(locations)
+        population = population_df["total"].values.astype(float)
+        beta = 1 / population.sum()
 
         if not departure_rate_vector:
-            logger.warn(
+            logger.warning(
                 " Using an uniform departure "
                 + "rate of {} for ".format(uniform_departure_rate)
                 + "all locations."
             )
-        elif not ignore_missing and len(departure_rate_vector) != len(locations):
+        elif not ignore_missing and len(departure_rate_vector) != n_locations:
             raise ValueError(
                 "Locations missing from "
                 + "`departure_rate_vector`. Use "
                 + "ignore_missing=True if locations "
                 + "without rates should be ignored."
             )
+        departures = population * self._departures(
+            locations, uniform_departure_rate, departure_rate_vector
+        )
 
+        # Buffer populations as (origin, destination, population) triples,
+        # sorted by origin so each block of origins is a contiguous slice
+        buffer_from = self._location_codes(location_index, population_buffer, from_cols)
+        buffer_to = self._location_codes(location_index, population_buffer, to_cols)
+        known = (buffer_from >= 0) & (buffer_to >= 0)
+        order = np.argsort(buffer_from[known], kind="stable")
+        buffer_from = buffer_from[known][order]
+        buffer_to = buffer_to[known][order]
+        buffer_values = population_buffer["buffer_population"].values[known][order]
+
+        if chunk_size is None:
+            chunk_size = max(n_locations, 1)
         results = []
-        for i in locations:
-            sigma = 0
-            m_i = self.__get_population(population_df, i)
-
-            if departure_rate_vector:
-                try:
-                    T_i = m_i * departure_rate_vector[i[0]]
-                except KeyError:
-                    try:
-                        T_i = m_i * departure_rate_vector[tuple(i[:1])]
-                    except KeyError:
-                        T_i = 0
-            else:
-                T_i = m_i * uniform_departure_rate
-
-            for k in [l for l in locations if l != i]:
-                m_k = self.__get_population(population_df, k)
-                S_ik = self.__get_buffer_population(population_buffer, i, k)
-
-                sigma += m_k * ((1 / S_ik) - beta)
-
-            for j in [l for l in locations if l != i]:
-                m_j = self.__get_population(population_df, j)
-                S_ij = self.__get_buffer_population(population_buffer, i, j)
-
-                T_ij = (T_i * m_j * ((1 / S_ij) - beta)) / sigma
-
-                if T_i != 0:
-                    probability = T_ij / T_i
-                else:
-                    probability = 0
-
-                results.append(i + j + [T_ij, probability])
-        ix = get_columns_for_level(self.level)
-        ix = ["{}_{}".format(c, d) for d in ("from", "to") for c in ix]
-        ix += ["prediction", "probability"]
-        res = pd.DataFrame(results, columns=ix)
-        return res
+        for block_start in range(0, n_locations, chunk_size):
+            block_stop = min(block_start + chunk_size, n_locations)
+            origins = np.arange(block_start, block_stop)
+            lo, hi = np.searchsorted(buffer_from, [block_start, block_stop])
+            buffer_block = np.full((len(origins), n_locations), np.nan)
+            buffer_block[
+                buffer_from[lo:hi] - block_start, buffer_to[lo:hi]
+            ] = buffer_values[lo:hi]
+
+            # Every pair of distinct locations is needed
+            off_diagonal = np.ones_like(buffer_block, dtype=bool)
+            off_diagonal[np.arange(len(origins)), origins] = False
+            if np.isnan(buffer_block[off_diagonal]).any():
+                raise ValueError(
+                    "Buffer population missing for some pairs of locations."
+                )
+
+            prediction, probability = self._predict(
+                buffer_block, origins, population, departures, beta
+            )
+            origin_ix, destination_ix = np.nonzero(off_diagonal)
+            block = pd.concat(
+                [
+                    location_df.iloc[origins[origin_ix]]
+                    .rename(columns=dict(zip(loc_cols, from_cols)))
+                    .reset_index(drop=True),
+                    location_df.iloc[destination_ix]
+                    .rename(columns=dict(zip(loc_cols, to_cols)))
+                    .reset_index(drop=True),
+                ],
+                axis=1,
+            )
+            block["prediction"] = prediction[off_diagonal]
+            block["probability"] = probability[off_diagonal]
+            results.append(block)
+
+        if not results:
+            return pd.DataFrame(
+                columns=from_cols + to_cols + ["prediction", "probability"]
+            )
+        return pd.concat(results, ignore_index=True)
@@ -261,12 +261,52 @@ def rlock(redis_client, lock_id, holder_id=None):
     """
     if holder_id is None:
         holder_id = f"{get_ident()}".encode()
-    logger.debug(f"My lock holder id is {holder_id}")
-    logger.debug(
-        f"Getting lock. Currently held by {redis_lock.Lock(redis_client, lock_id, id=holder_id).get_owner_id()}"
-    )
+    if logger.isEnabledFor(logging.DEBUG):
+        # Looking up the owner costs a round trip to redis, so only do it when it will be logged
+        logger.debug(f"My lock holder id is {holder_id}")
+        logger.debug(
+            f"Getting lock. Currently held by {redis_lock.Lock(redis_client, lock_id, id=holder_id).get_owner_id()}"
+        )
     try:
         with redis_lock.Lock(redis_client, lock_id, id=holder_id):
             yield
     except AlreadyAcquired:
         yield
+
+
+@contextmanager
+def redis_pipeline(redis_client, transaction=False):
+    """
+    Buffer redis commands and send them in a single round trip when
+    the block exits.
+
+    Parameters
+    ----------
+    redis_client : redis.StrictRedis
+        Client for a redis
+    transaction : bool, default False
+        If True, the buffered commands are wrapped in MULTI/EXEC and
+        applied atomically
+
+    Yields
+    ------
+    redis.client.Pipeline
+        Pipeline to issue commands against. Commands return the pipeline,
+        and their results are not available inside the block.
+
+    Examples
+    --------
+    >>> with redis_pipeline(Query.redis) as pipe:
+    ...     pipe.set("a", 1)
+    ...     pipe.set("b", 2)
+
+    Notes
+    -----
+    Nothing is sent if the block raises.
+    """
+    pipe = redis_client.pipeline(transaction=transaction)
+    try:
+        yield pipe
+        pipe.execute()
+    finally:
+        pipe.reset()
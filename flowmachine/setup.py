@@ -85,7 +85,7 @@ setup(
     ],
     setup_requires=["pytest-runner"],
     tests_require=test_requirements,
-    extras_require={"test": test_requirements},
+    extras_require={"test": test_requirements, "parquet": ["pyarrow"]},
     include_package_data=True,
     zip_safe=False,
     platforms=["MacOS X", "Linux"],
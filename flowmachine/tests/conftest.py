@@ -124,6 +124,9 @@ def clean_env(monkeypatch):
     monkeypatch.delenv("POOL_OVERFLOW", raising=False)
     monkeypatch.delenv("REDIS_HOST", raising=False)
     monkeypatch.delenv("REDIS_PORT", raising=False)
+    monkeypatch.delenv("CACHE_UNLOGGED", raising=False)
+    monkeypatch.delenv("CACHE_TABLESPACE", raising=False)
+    monkeypatch.delenv("PARQUET_CACHE_DIR", raising=False)
 
 
 @pytest.fixture
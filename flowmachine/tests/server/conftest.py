@@ -64,6 +64,32 @@ class DummyRedis:
     def keys(self):
         return sorted(self._store.keys())
 
+    def pipeline(self, transaction=True):
+        return DummyPipeline(self)
+
+
+class DummyPipeline:
+    """
+    Drop-in replacement for a redis pipeline, which applies buffered
+    commands to a DummyRedis on execute.
+    """
+
+    def __init__(self, redis):
+        self._redis = redis
+        self._commands = []
+
+    def set(self, key, value):
+        self._commands.append((key, value))
+        return self
+
+    def execute(self):
+        for key, value in self._commands:
+            self._redis.set(key, value)
+        self.reset()
+
+    def reset(self):
+        self._commands = []
+
 
 @pytest.fixture(scope="function")
 def dummy_redis():
@@ -174,3 +174,34 @@ def test_get_sql(dummy_redis, monkeypatch):
     #
     sql = query_proxy.get_sql()
     assert "SELECT * FROM dummy_table" == sql
+
+
+def test_get_tile(dummy_redis, monkeypatch):
+    """
+    Running get_tile() returns the tile of the aggregated query, and errors if it is still running.
+    """
+    q = Mock()
+    q.aggregate().md5 = "dummy_query_id_aggregate"
+    q.aggregate().to_mvt.return_value = b"DUMMY_TILE"
+
+    def dummy_construct_query_object(query_kind, params):
+        return q
+
+    query_proxy = QueryProxy(
+        "dummy_query",
+        {"param": "some_value"},
+        redis=dummy_redis,
+        func_construct_query_object=dummy_construct_query_object,
+    )
+    monkeypatch.setattr(
+        "flowmachine.core.server.query_proxy.cache_table_exists", lambda query_id: True
+    )
+    query_proxy.run_query_async()
+
+    query_proxy.redis_interface.has_lock = lambda query_id: True
+    with pytest.raises(QueryProxyError, match="still running"):
+        query_proxy.get_tile(1, 0, 1)
+
+    query_proxy.redis_interface.has_lock = lambda query_id: False
+    assert b"DUMMY_TILE" == query_proxy.get_tile(1, 0, 1)
+    q.aggregate().to_mvt.assert_called_once_with(1, 0, 1)
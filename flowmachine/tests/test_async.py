@@ -4,7 +4,6 @@
 
 from concurrent.futures import Future
 from flowmachine.features.subscriber import *
-from threading import Thread
 import pandas as pd
 
 from flowmachine.utils.utils import rlock
@@ -54,45 +53,24 @@ def test_store_async():
     assert table_name in dl.get_query()
 
 
-def test_get_query_blocks_on_store():
+def test_get_query_does_not_wait_for_lock_on_stored_query():
     """
-    If a store is running get_query should block.
+    Getting the query for a stored query should not wait on its lock.
     """
     dl = daily_location("2016-01-01", level="cell")
     dl.store().result()
-    timer = []
+    with rlock(dl.redis, dl.md5, holder_id=b"another_holder"):
+        assert dl.get_query() == f"SELECT * FROM {dl.table_name}"
 
-    def unlock(timer):
-        with rlock(dl.redis, dl.md5):
-            for i in range(101):
-                timer.append(i)
 
-    timeout = Thread(target=unlock, args=(timer,))
-    timeout.start()
-    dl.get_query()
-    assert len(timer) == 101
-    timeout.join()
-
-
-def test_blocks_on_store_cascades():
+def test_get_query_does_not_wait_for_lock_on_stored_subquery():
     """
-    If a store is running on a query that is used
-    in a another query, that query should wait.
+    Getting the query for a query which uses a stored query
+    should not wait on the stored query's lock.
     """
     dl = daily_location("2016-01-01", level="cell")
     dl2 = daily_location("2016-01-02", level="cell")
-    store_future = dl.store()
-    store_future.result()
+    dl.store().result()
     hl = HomeLocation(dl, dl2)
-    timer = []
-
-    def unlock(timer):
-        with rlock(dl.redis, dl.md5):
-            for i in range(101):
-                timer.append(i)
-
-    timeout = Thread(target=unlock, args=(timer,))
-    timeout.start()
-    hl.get_query()
-    assert len(timer) == 101
-    timeout.join()
+    with rlock(dl.redis, dl.md5, holder_id=b"another_holder"):
+        assert f"SELECT * FROM {dl.table_name}" in hl.get_query()
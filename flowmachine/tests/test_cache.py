@@ -6,6 +6,7 @@
 Tests for query caching functions.
 """
 
+import pandas as pd
 import pytest
 
 from flowmachine.core.query import Query
@@ -266,6 +267,77 @@ def test_invalidate_cascade(flowmachine_connect):
     assert has_deps
 
 
+def test_invalidate_cache_cascades_through_chain(flowmachine_connect, monkeypatch):
+    """
+    Test that invalidating the bottom of a chain drops every cached
+    query above it, when dependents are dropped in several batches.
+
+    """
+    monkeypatch.setattr(Query, "drop_batch_size", 1)
+    dl1 = daily_location("2016-01-01")
+    dl1.store().result()
+    hl1 = HomeLocation(daily_location("2016-01-01"), daily_location("2016-01-02"))
+    hl1.store().result()
+    hl2 = HomeLocation(daily_location("2016-01-03"), daily_location("2016-01-04"))
+    hl2.store().result()
+    flow = Flows(hl1, hl2)
+    flow.store().result()
+    dl1.invalidate_db_cache()
+    assert not dl1.is_stored
+    assert not hl1.is_stored
+    assert not flow.is_stored
+    assert hl2.is_stored
+    in_cache = flowmachine_connect.fetch(
+        f"""SELECT query_id FROM cache.cached
+        WHERE query_id IN ('{dl1.md5}', '{hl1.md5}', '{flow.md5}')"""
+    )
+    assert not in_cache
+    has_deps = flowmachine_connect.fetch(
+        f"""SELECT * FROM cache.dependencies
+        WHERE query_id IN ('{hl1.md5}', '{flow.md5}')"""
+    )
+    assert not has_deps
+
+
+def test_invalidate_cache_locks_dependents_and_calls_hooks(
+    flowmachine_connect, monkeypatch
+):
+    """
+    Test that invalidating a query locks each cached dependent while dropping
+    it, and calls the invalidation hooks for it and all its dependents.
+    """
+    import flowmachine.core.query
+
+    invalidated = []
+    monkeypatch.setattr(
+        "flowmachine.core.query._cache_invalidation_hooks", [invalidated.append]
+    )
+    locked = []
+    real_rlock = flowmachine.core.query.rlock
+
+    def recording_rlock(redis_client, lock_id, *args, **kwargs):
+        locked.append(lock_id)
+        return real_rlock(redis_client, lock_id, *args, **kwargs)
+
+    monkeypatch.setattr("flowmachine.core.query.rlock", recording_rlock)
+
+    dl1 = daily_location("2016-01-01")
+    dl1.store().result()
+    hl1 = HomeLocation(daily_location("2016-01-01"), daily_location("2016-01-02"))
+    hl1.store().result()
+    flow = Flows(hl1, hl1)
+    flow.store().result()
+    del locked[:]
+    dl1.invalidate_db_cache()
+    assert {dl1.md5, hl1.md5, flow.md5} <= set(invalidated)
+    assert {hl1.md5, flow.md5} <= set(locked)
+    # Locks are taken in a consistent order, to avoid deadlocks
+    dependent_locks = [lock_id for lock_id in locked if lock_id in {hl1.md5, flow.md5}]
+    assert dependent_locks == sorted(dependent_locks)
+    assert not hl1.is_stored
+    assert not flow.is_stored
+
+
 def test_deps_cache_multi():
     """
     Test that correct dependencies are returned.
@@ -309,7 +381,8 @@ def test_deps_cache_broken_chain():
     hl2 = HomeLocation(daily_location("2016-01-03"), daily_location("2016-01-04"))
     flow = Flows(hl1, hl2)
     dep = dl1.md5
-    assert 7 == len(flow._get_deps())
+    # Includes the cell to admin mapping, which was stored along with dl1
+    assert 8 == len(flow._get_deps())
     assert dep in [x.md5 for x in flow._get_deps()]
 
 
@@ -357,3 +430,95 @@ def test_retrieve_all():
     assert dl1.md5 in from_cache
     assert hl1.md5 in from_cache
     assert flow.md5 in from_cache
+
+
+def test_store_unlogged_in_tablespace(flowmachine_connect, monkeypatch):
+    """
+    Test that cache tables can be created unlogged in a given tablespace.
+    """
+    monkeypatch.setattr(Query, "cache_unlogged", True)
+    monkeypatch.setattr(Query, "cache_tablespace", "pg_default")
+    dl1 = daily_location("2016-01-01")
+    create_sql = dl1._make_sql(f"x{dl1.md5}", schema="cache")
+    assert create_sql[0].startswith(
+        f"CREATE UNLOGGED TABLE cache.x{dl1.md5} TABLESPACE pg_default AS"
+    )
+    assert all(sql.endswith(" TABLESPACE pg_default") for sql in create_sql[1:])
+    dl1.store().result()
+    assert dl1.is_stored
+    assert (
+        "u"
+        == flowmachine_connect.fetch(
+            f"SELECT relpersistence FROM pg_class WHERE oid = '{dl1.table_name}'::regclass"
+        )[0][0]
+    )
+
+
+def test_unlogged_only_applies_to_cache(flowmachine_connect, monkeypatch):
+    """
+    Test that tables stored outside the cache schema are logged as usual.
+    """
+    monkeypatch.setattr(Query, "cache_unlogged", True)
+    monkeypatch.setattr(Query, "cache_tablespace", "pg_default")
+    dl1 = daily_location("2016-01-01")
+    create_sql = dl1._make_sql("test_table", schema="public")
+    assert create_sql[0].startswith("CREATE TABLE public.test_table AS")
+
+
+def test_store_parquet_cache(flowmachine_connect, monkeypatch, tmpdir):
+    """
+    Test that a query can be cached to, and retrieved from, a parquet file.
+    """
+    pytest.importorskip("pyarrow")
+    dl1 = daily_location("2016-01-01")
+    monkeypatch.setattr(Query, "parquet_cache_dir", str(tmpdir))
+    monkeypatch.setattr(type(dl1), "cache_backend", "parquet")
+    dl1.turn_off_caching()
+    dl1.store().result()
+    assert dl1.is_stored
+    assert (tmpdir / f"x{dl1.md5}.parquet").exists()
+    assert not flowmachine_connect.has_table(f"x{dl1.md5}", "cache")
+    with flowmachine_connect.engine.begin():
+        expected = pd.read_sql_query(dl1.get_query(), con=flowmachine_connect.engine)
+    pd.testing.assert_frame_equal(
+        expected.sort_values("subscriber").reset_index(drop=True),
+        dl1.get_dataframe().sort_values("subscriber").reset_index(drop=True),
+    )
+    dl1.invalidate_db_cache()
+    assert not dl1.is_stored
+
+
+def test_invalidate_cascades_to_parquet_cache(flowmachine_connect, monkeypatch, tmpdir):
+    """
+    Test that invalidating a query removes the parquet files of queries which depend on it.
+    """
+    pytest.importorskip("pyarrow")
+    monkeypatch.setattr(Query, "parquet_cache_dir", str(tmpdir))
+    monkeypatch.setattr(HomeLocation, "cache_backend", "parquet")
+    dl1 = daily_location("2016-01-01")
+    dl1.store().result()
+    hl1 = HomeLocation(daily_location("2016-01-01"), daily_location("2016-01-02"))
+    hl1.store().result()
+    assert (tmpdir / f"x{hl1.md5}.parquet").exists()
+    assert (
+        "parquet"
+        == flowmachine_connect.fetch(
+            f"SELECT backend FROM cache.cached WHERE query_id='{hl1.md5}'"
+        )[0][0]
+    )
+    assert flowmachine_connect.fetch(
+        f"SELECT * FROM cache.dependencies WHERE query_id='{hl1.md5}' AND depends_on='{dl1.md5}'"
+    )
+    dl1.invalidate_db_cache()
+    assert not (tmpdir / f"x{hl1.md5}.parquet").exists()
+    assert not hl1.is_stored
+
+
+def test_unknown_cache_backend(monkeypatch):
+    """
+    Test that storing a query with an unknown cache backend raises an error.
+    """
+    dl1 = daily_location("2016-01-01")
+    monkeypatch.setattr(type(dl1), "cache_backend", "NOT_A_BACKEND")
+    with pytest.raises(ValueError, match="Unknown cache backend"):
+        dl1.store()
@@ -207,3 +207,17 @@ def test_has_date_bad_estimate(flowmachine_connect, monkeypatch):
         "flowmachine.core.Table.estimated_rowcount", Mock(return_value=1)
     )
     assert not flowmachine_connect.has_date(datetime.date(2016, 9, 9), "calls")
+
+
+def test_known_dates_cached_for_all_tables(flowmachine_connect, monkeypatch):
+    """
+    Test that the dates of every events table are cached, so building sql doesn't query the catalogue again.
+    """
+    tables = ["calls", "sms", "mds", "topups", "forwards", "calls_encoded"]
+    expected = [flowmachine_connect._known_dates(table, "events") for table in tables]
+    monkeypatch.setattr(
+        flowmachine_connect, "fetch", Mock(side_effect=AssertionError("Not cached"))
+    )
+    assert [
+        flowmachine_connect._known_dates(table, "events") for table in tables
+    ] == expected
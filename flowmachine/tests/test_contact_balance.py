@@ -6,6 +6,7 @@
 Tests for the ContactsBalance() class.
 """
 
+import pandas as pd
 
 from flowmachine.features.subscriber import ContactBalance
 
@@ -31,3 +32,18 @@ def test_no_result_is_greater_than_one(get_dataframe):
     df = get_dataframe(ContactBalance("2016-01-01", "2016-01-07"))
     results = df[df["proportion"] > 1]
     assert len(results) == 0
+
+
+def test_encoded_subscribers_give_same_result(get_dataframe):
+    """
+    ContactBalance() computed on encoded subscribers matches the unencoded result.
+    """
+    sort_cols = ["subscriber", "msisdn_counterpart"]
+    df = get_dataframe(ContactBalance("2016-01-01", "2016-01-07"))
+    encoded_df = get_dataframe(
+        ContactBalance("2016-01-01", "2016-01-07", encode_subscribers=True)
+    )
+    pd.testing.assert_frame_equal(
+        df.sort_values(sort_cols).reset_index(drop=True),
+        encoded_df.sort_values(sort_cols).reset_index(drop=True),
+    )
@@ -4,7 +4,7 @@
 
 import pytest
 
-from flowmachine.features import EventsTablesUnion
+from flowmachine.features import EventsTablesUnion, PartitionedAggregate
 
 
 @pytest.mark.parametrize(
@@ -74,3 +74,51 @@ def test_get_list_of_tables(get_length):
         tables=["events.calls", "events.sms"],
     )
     assert get_length(etu) == 2500
+
+
+def test_partitioned_aggregate_matches_single_query():
+    """
+    Test that aggregating each partition separately gives the same result as aggregating all the events at once.
+    """
+    etu = EventsTablesUnion(
+        "2016-01-01", "2016-01-03", columns=["msisdn", "datetime", "outgoing"]
+    )
+    aggregates = {
+        "total": ("count", "*"),
+        "first": ("min", "datetime"),
+        "last": ("max", "datetime"),
+        "any_out": ("bool_or", "outgoing"),
+    }
+    partitioned = PartitionedAggregate(etu, ["subscriber"], aggregates)
+    assert len(partitioned.partials) == 6  # Two tables by three days
+    expected = etu.connection.fetch(
+        f"""
+        SELECT subscriber, count(*), min(datetime), max(datetime), bool_or(outgoing)
+        FROM ({etu.get_query()}) e GROUP BY subscriber ORDER BY subscriber
+        """
+    )
+    partitioned.store().result()
+    assert all(partial.is_stored for partial in partitioned.partials)
+    result = partitioned.get_dataframe().sort_values("subscriber")
+    assert result.columns.tolist() == partitioned.column_names
+    assert [tuple(row) for row in result.itertuples(index=False)] == expected
+
+
+def test_partitioned_aggregate_sql_has_no_side_effects():
+    """
+    Test that getting the SQL of a PartitionedAggregate does not store its partial aggregates.
+    """
+    etu = EventsTablesUnion("2016-01-01", "2016-01-03", columns=["msisdn"])
+    partitioned = PartitionedAggregate(etu, ["subscriber"], {"total": ("count", "*")})
+    partitioned.get_query()
+    partitioned.explain()
+    assert not any(partial.is_stored for partial in partitioned.partials)
+
+
+def test_partitioned_aggregate_rejects_non_decomposable():
+    """
+    Test that PartitionedAggregate raises an error for aggregates which can't be merged.
+    """
+    etu = EventsTablesUnion("2016-01-01", "2016-01-02", columns=["msisdn", "duration"])
+    with pytest.raises(ValueError):
+        PartitionedAggregate(etu, ["subscriber"], {"mean": ("avg", "duration")})
@@ -7,9 +7,19 @@ Tests for flowmachine.FeatureCollection
 """
 
 from unittest import TestCase
+
+import pandas as pd
+import pytest
+
 from flowmachine import FeatureCollection
 from flowmachine.core import CustomQuery
-from flowmachine.features import RadiusOfGyration, NocturnalCalls, SubscriberDegree
+from flowmachine.features import (
+    RadiusOfGyration,
+    NocturnalCalls,
+    SubscriberDegree,
+    TotalSubscriberEvents,
+    ProportionOutgoing,
+)
 
 
 def test_collects_metrics():
@@ -80,3 +90,25 @@ def test_dropna(get_length):
     # usully without dropna=False this query would only return
     # a single row. We check that this is not the case.
     assert get_length(fc) > 1
+
+
+@pytest.mark.parametrize("dropna", [True, False])
+def test_fused_features_match_joined(dropna, get_dataframe):
+    """
+    Test that features over the same events computed in one pass give the same
+    result as joining them.
+    """
+    start, stop = "2016-01-01", "2016-01-03"
+    metrics = [
+        TotalSubscriberEvents(start, stop, direction="in"),
+        RadiusOfGyration(start, stop),
+        ProportionOutgoing(start, stop),
+        TotalSubscriberEvents(start, stop, direction="out", hours=(4, 6)),
+    ]
+    fused = FeatureCollection(metrics, dropna=dropna)
+    joined = FeatureCollection(metrics, dropna=dropna, fuse=False)
+    assert fused.column_names == joined.column_names
+    pd.testing.assert_frame_equal(
+        get_dataframe(fused).sort_values("subscriber").reset_index(drop=True),
+        get_dataframe(joined).sort_values("subscriber").reset_index(drop=True),
+    )
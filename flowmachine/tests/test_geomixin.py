@@ -15,6 +15,11 @@ import pytest
 
 from flowmachine.core import Query
 from flowmachine.core.mixins import GeoDataMixin
+from flowmachine.core.mixins.geodata_mixin import (
+    _geojson_cache,
+    _mvt_cache,
+    _tile_bounds,
+)
 from flowmachine.features import daily_location, Flows
 from flowmachine.utils.utils import proj4string
 
@@ -172,7 +177,7 @@ def test_geojson_cache():
     """
     dl = daily_location("2016-01-01", "2016-01-02", level="lat-lon").aggregate()
     js = dl.to_geojson(crs=2770)  # OSGB36
-    assert js == dl._geojson[proj4string(dl.connection, 2770)]
+    assert js == _geojson_cache[(dl.md5, proj4string(dl.connection, 2770), None, None)]
 
 
 def test_geojson_cache_exluded_from_pickle():
@@ -182,13 +187,106 @@ def test_geojson_cache_exluded_from_pickle():
     assert "_geojson" not in dl.__getstate__()  # Check excluded from pickle
 
 
+def test_geojson_cache_hit_does_not_query(monkeypatch):
+    """
+    Test that cached geojson is returned without going back to the database.
+    """
+    dl = daily_location("2016-01-01", "2016-01-02", level="lat-lon").aggregate()
+    js = dl.to_geojson(crs=2770)  # OSGB36
+
+    def fail(*args, **kwargs):
+        raise AssertionError("Geojson was fetched again.")
+
+    monkeypatch.setattr(dl, "_get_geojson", fail)
+    assert js == dl.to_geojson(crs=2770)
+
+
+def test_geojson_cache_keyed_on_simplification():
+    """
+    Test that simplified and unsimplified geojson are cached separately.
+    """
+    dl = daily_location("2016-01-01", "2016-01-02", level="admin3").aggregate()
+    full = dl.to_geojson()
+    simplified = dl.to_geojson(simplify=0.01, precision=4)
+    proj = proj4string(dl.connection)
+    assert _geojson_cache[(dl.md5, proj, None, None)] == full
+    assert _geojson_cache[(dl.md5, proj, 0.01, 4)] == simplified
+    assert len(json.dumps(simplified)) < len(json.dumps(full))
+    assert [f["id"] for f in simplified["features"]] == [
+        f["id"] for f in full["features"]
+    ]
+
+
+def test_geojson_query_simplify_and_precision():
+    """
+    Test that simplification and precision are applied in the geojson query.
+    """
+    dl = daily_location("2016-01-01", "2016-01-02", level="admin3").aggregate()
+    sql = dl._geo_json_query(simplify=0.5, precision=3)
+    assert "ST_SimplifyPreserveTopology(geom::geometry, 0.5)" in sql
+    assert "ST_AsGeoJSON(ST_SimplifyPreserveTopology(geom::geometry, 0.5), 3)" in sql
+    assert "ST_SimplifyPreserveTopology" not in dl._geo_json_query()
+
+
 def test_geojson_caching_off():
     """Test that switching off caching clears the cache, and doesn't add to it."""
     dl = daily_location("2016-01-01", "2016-01-02", level="lat-lon").aggregate()
     js = dl.to_geojson(crs=2770)  # OSGB36
+    key = (dl.md5, proj4string(dl.connection, 2770), None, None)
     dl.turn_off_caching()  # Check caching for geojson switches off
     with pytest.raises(KeyError):
-        dl._geojson[proj4string(dl.connection, 2770)]
+        _geojson_cache[key]
     js = dl.to_geojson(crs=2770)  # OSGB36
     with pytest.raises(KeyError):
-        dl._geojson[proj4string(dl.connection, 2770)]
+        _geojson_cache[key]
+
+
+def test_invalidating_cache_evicts_rendered(flowmachine_connect):
+    """
+    Test that invalidating a query, or one it depends on, removes its cached geojson and tiles.
+    """
+    dl = daily_location("2016-01-01", "2016-01-02", level="admin3")
+    agg = dl.aggregate()
+    agg.to_geojson()
+    agg.to_mvt(0, 0, 0)
+    dl.store().result()
+    agg.store().result()
+    key = (agg.md5, proj4string(agg.connection), None, None)
+    assert key in _geojson_cache
+    dl.invalidate_db_cache()
+    assert key not in _geojson_cache
+    assert (agg.md5, 0, 0, 0, 4096, 256, None) not in _mvt_cache
+
+
+def test_tile_bounds():
+    """
+    Test that tile bounds are calculated in web mercator, and nonexistent tiles are rejected.
+    """
+    assert _tile_bounds(0, 0, 0) == (
+        -20037508.342789244,
+        -20037508.342789244,
+        20037508.342789244,
+        20037508.342789244,
+    )
+    assert _tile_bounds(1, 1, 0) == (0.0, 0.0, 20037508.342789244, 20037508.342789244)
+    with pytest.raises(ValueError):
+        _tile_bounds(1, 2, 0)
+
+
+def test_mvt():
+    """
+    Test that a vector tile is returned and cached.
+    """
+    dl = daily_location("2016-01-01", "2016-01-02", level="admin3").aggregate()
+    tile = dl.to_mvt(0, 0, 0)
+    assert isinstance(tile, bytes)
+    assert len(tile) > 0
+    assert _mvt_cache[(dl.md5, 0, 0, 0, 4096, 256, None)] == tile
+
+
+def test_mvt_empty_tile():
+    """
+    Test that a tile with no features in it is empty.
+    """
+    dl = daily_location("2016-01-01", "2016-01-02", level="admin3").aggregate()
+    assert dl.to_mvt(2, 0, 0) == b""  # Arctic ocean, a long way from Nepal
@@ -71,3 +71,32 @@ def test_can_apply_function_to_multiple_values():
     for groups, answer in cm:
         assert len(groups) == 1
         assert isinstance(answer, int)
+
+
+def highest_min(date_list):
+    """
+    Takes a list of dates and returns the highest min.
+    """
+    return max([x.minute for x in date_list])
+
+
+def test_parallel_map_matches_map():
+    """
+    Mapping a function in worker processes gives the same results, in the same order.
+    """
+    gv = GroupValues("subscriber", "datetime", "2016-01-01", "2016-01-03")
+    assert list(gv.ParallelColumnMap(highest_min, max_workers=2, batch_size=10)) == [
+        (tuple(groups), answer) for groups, answer in gv.ColumnMap(highest_min)
+    ]
+
+
+def test_parallel_map_as_dataframe():
+    """
+    Mapping a function in worker processes can return a dataframe.
+    """
+    gv = GroupValues(
+        ["subscriber", "msisdn_counterpart"], "datetime", "2016-01-01", "2016-01-03"
+    )
+    df = gv.ParallelColumnMap(highest_min, as_dataframe=True)
+    assert df.columns.tolist() == ["subscriber", "msisdn_counterpart", "highest_min"]
+    assert len(df) == len(gv)
@@ -145,3 +145,17 @@ def test_connect_defaults(mocked_connections, monkeypatch):
         9000, "analyst", "foo", "localhost", "flowdb", 5, 1
     )
     core_init_StrictRedis_mock.assert_called_with(host="localhost", port=6379)
+
+
+def test_cache_options_set_env(monkeypatch):
+    """Test that cache storage options can be set via env."""
+    monkeypatch.setattr(Query, "cache_unlogged", False)
+    monkeypatch.setattr(Query, "cache_tablespace", None)
+    monkeypatch.setattr(Query, "parquet_cache_dir", None)
+    monkeypatch.setenv("CACHE_UNLOGGED", "True")
+    monkeypatch.setenv("CACHE_TABLESPACE", "DUMMY_ENV_TABLESPACE")
+    monkeypatch.setenv("PARQUET_CACHE_DIR", "DUMMY_ENV_PARQUET_CACHE_DIR")
+    connect()
+    assert Query.cache_unlogged
+    assert "DUMMY_ENV_TABLESPACE" == Query.cache_tablespace
+    assert "DUMMY_ENV_PARQUET_CACHE_DIR" == Query.parquet_cache_dir
@@ -124,3 +124,25 @@ def test_join_to_grid(get_dataframe, get_length):
     ul = subscriber_locations("2016-01-05", "2016-01-07", level="cell")
     df = get_dataframe(JoinToLocation(ul, level="grid", size=50))
     assert len(df) == get_length(ul)
+
+
+def test_join_to_admin_stores_mapping_with_join():
+    """
+    Test that storing a JoinToLocation also stores the cell to admin mapping, and later joins use the stored table.
+    """
+    ul = subscriber_locations("2016-01-05", "2016-01-07", level="cell")
+    joined = JoinToLocation(ul, level="admin3")
+    joined.store().result()
+    assert joined.right_query.is_stored
+    sql = JoinToLocation(ul, level="admin3").right_query.get_query()
+    assert sql == f"SELECT * FROM {joined.right_query.table_name}"
+
+
+def test_join_to_admin_get_query_does_not_store_mapping():
+    """
+    Test that getting the sql for a JoinToLocation doesn't store the mapping.
+    """
+    ul = subscriber_locations("2016-01-05", "2016-01-07", level="cell")
+    joined = JoinToLocation(ul, level="admin3")
+    joined.get_query()
+    assert not joined.right_query.is_stored
@@ -7,9 +7,12 @@ Tests for the Louvain() class.
 """
 
 
+import community
+import networkx as nx
 import pytest
 
-from flowmachine.models import Louvain
+from flowmachine.models import Louvain, CSRGraph
+from flowmachine.models.louvain import louvain_partition
 from flowmachine.features import ContactBalance
 
 
@@ -58,3 +61,44 @@ def test_louvain_takes_reduction_parameters():
         set_df.loc["APj9roe8jKOwEDZl"]["community"]
         == set_df.loc["4dqenN2oQZExwEK2"]["community"]
     )
+
+
+def test_csr_graph_matches_networkx():
+    """
+    CSRGraph has the same nodes, edges and degrees as the equivalent networkx graph.
+    """
+    g = nx.planted_partition_graph(4, 20, 0.4, 0.02, seed=1)
+    g.add_edge(0, 0)
+    sources, targets = zip(*g.edges)
+    csr = CSRGraph.from_edges(sources, targets)
+    assert csr.number_of_nodes() == g.number_of_nodes()
+    assert csr.number_of_edges() == g.number_of_edges()
+    degrees = dict(g.degree())
+    assert all(degrees[n] == d for n, d in zip(csr.nodes, csr.degree()))
+    assert (
+        csr.subgraph(range(30)).number_of_edges()
+        == g.subgraph(range(30)).number_of_edges()
+    )
+
+
+def test_louvain_partition_matches_python_louvain():
+    """
+    louvain_partition finds a partition as good as python-louvain's.
+    """
+    g = nx.planted_partition_graph(6, 30, 0.3, 0.01, seed=2)
+    sources, targets = zip(*g.edges)
+    partition = louvain_partition(CSRGraph.from_edges(sources, targets), random_state=1)
+    assert community.modularity(partition, g) == pytest.approx(
+        community.modularity(community.best_partition(g, random_state=1), g)
+    )
+
+
+def test_louvain_runs_on_csr_graph():
+    """
+    Louvain().run() works with a CSRGraph read from a query.
+    """
+    test_graph = ContactBalance("2016-01-01", "2016-01-07")
+    l = Louvain(CSRGraph.from_query(test_graph, weight="events", batch_size=100))
+    set_df = l.run(min_members=1).get_dataframe().set_index("subscriber")
+    assert len(set(set_df.community)) != 1
+    assert set(set_df.index) <= set(test_graph.get_dataframe().subscriber)
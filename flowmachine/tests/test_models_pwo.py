@@ -8,6 +8,7 @@ Tests for the PopulationWeightedOpportunities() class.
 
 from unittest import TestCase
 
+import pandas as pd
 import pytest
 
 from flowmachine.models import PopulationWeightedOpportunities
@@ -154,6 +155,60 @@ def test_model_result_stored_len():
     assert l == len(mr)
 
 
+def test_model_result_iterates_tuples():
+    """Test that iterating a model result gives the same rows in memory and stored."""
+    p = PopulationWeightedOpportunities("2016-01-01", "2016-01-02")
+    mr = p.run(departure_rate_vector={"0xqNDj": 0.9}, ignore_missing=True)
+    in_memory = list(mr)
+    assert all(isinstance(row, tuple) for row in in_memory)
+    mr.store().result()
+    del mr._df
+    assert sorted(in_memory) == sorted(tuple(row) for row in mr)
+
+
+def test_model_result_spills_large_results(monkeypatch):
+    """Test that results bigger than the spill threshold are stored and dropped from memory."""
+    monkeypatch.setattr("flowmachine.core.model_result.ModelResult.spill_threshold", 0)
+    p = PopulationWeightedOpportunities("2016-01-01", "2016-01-02")
+    mr = p.run(departure_rate_vector={"0xqNDj": 0.9}, ignore_missing=True)
+    assert mr.is_stored
+    assert not hasattr(mr, "_df")
+    assert mr.column_names[0] == "site_id_from"
+
+
+def test_spilled_model_result_outlives_inputs(monkeypatch):
+    """Test that a spilled result can still be read after its inputs are invalidated, and isn't held in memory."""
+    monkeypatch.setattr("flowmachine.core.model_result.ModelResult.spill_threshold", 0)
+    p = PopulationWeightedOpportunities("2016-01-01", "2016-01-02")
+    p.population_object.store().result()
+    mr = p.run(departure_rate_vector={"0xqNDj": 0.9}, ignore_missing=True)
+    cols = ["site_id_from", "site_id_to"]
+    expected = mr.get_dataframe().sort_values(cols).reset_index(drop=True)
+    assert not hasattr(mr, "_df")
+    p.population_object.invalidate_db_cache()
+    assert mr.is_stored
+    pd.testing.assert_frame_equal(
+        expected, mr.get_dataframe().sort_values(cols).reset_index(drop=True)
+    )
+    assert not hasattr(mr, "_df")
+
+
+def test_model_result_get_columns():
+    """Test that columns of a stored model result can be loaded on their own."""
+    p = PopulationWeightedOpportunities("2016-01-01", "2016-01-02")
+    mr = p.run(departure_rate_vector={"0xqNDj": 0.9}, ignore_missing=True)
+    expected = mr.get_dataframe()[["prediction", "site_id_to"]]
+    mr.store().result()
+    del mr._df
+    assert mr.get_columns(["prediction"]).columns.tolist() == ["prediction"]
+    pd.testing.assert_frame_equal(
+        mr.get_columns(["prediction", "site_id_to"])
+        .sort_values(["site_id_to", "prediction"])
+        .reset_index(drop=True),
+        expected.sort_values(["site_id_to", "prediction"]).reset_index(drop=True),
+    )
+
+
 def test_get_stored():
     """Test that get_stored works for ModelResults."""
     p = PopulationWeightedOpportunities("2016-01-01", "2016-01-02")
@@ -167,3 +222,39 @@ def test_model_result_string_rep():
     p = PopulationWeightedOpportunities("2016-01-01", "2016-01-02")
     mr = p.run(departure_rate_vector={"0xqNDj": 0.9}, ignore_missing=True)
     assert "PopulationWeightedOpportunities" in str(mr)
+
+
+def test_run_rejects_bad_chunk_size():
+    """
+    PopulationWeightedOpportunities().run() raises a clear error for chunk sizes below 1.
+    """
+    p = PopulationWeightedOpportunities("2016-01-01", "2016-01-02")
+    with pytest.raises(ValueError, match="chunk_size must be a positive"):
+        p.run(chunk_size=0)
+
+
+@pytest.mark.usefixtures("skip_datecheck")
+def test_chunked_run_gives_same_result(get_dataframe):
+    """
+    PopulationWeightedOpportunities().run() gives the same result when computed in chunks.
+    """
+    p = PopulationWeightedOpportunities("2016-01-01", "2016-01-07")
+    expected = get_dataframe(p.run())
+    chunked = get_dataframe(p.run(chunk_size=7))
+    pd.testing.assert_frame_equal(expected, chunked)
+
+
+@pytest.mark.usefixtures("skip_datecheck")
+def test_cumulative_buffer_population(get_dataframe):
+    """
+    The cumulative buffer population grows with distance from the destination, up to the total population.
+    """
+    p = PopulationWeightedOpportunities(
+        "2016-01-01", "2016-01-07", buffer_method="cumulative"
+    )
+    total = get_dataframe(p.population_object).total.sum()
+    buffers = get_dataframe(p.population_buffer_object)
+    to_cols = [c for c in buffers.columns if c.endswith("_to")]
+    assert (buffers.groupby(to_cols).buffer_population.max() == total).all()
+    by_distance = buffers.sort_values(to_cols + ["distance"])
+    assert (by_distance.groupby(to_cols).buffer_population.diff().dropna() >= 0).all()
@@ -66,3 +66,26 @@ class FlowGraphTestCase(TestCase):
 
         with self.assertRaises(ValueError):
             self.flow.to_networkx(target="name_from")
+
+    def test_edge_arrays(self):
+        """
+        to_edge_arrays() returns the same edges as to_networkx().
+        """
+        graph = self.flow.to_networkx()
+        nodes, sources, targets, weights = self.flow.to_edge_arrays(weight="count")
+        self.assertEqual(len(sources), graph.number_of_edges())
+        self.assertEqual(set(nodes), set(graph.nodes))
+        for s, t, w in zip(sources, targets, weights):
+            self.assertEqual(graph[nodes[s]][nodes[t]]["count"], w)
+
+    def test_scipy_sparse(self):
+        """
+        to_scipy_sparse() returns an adjacency matrix with the edge weights.
+        """
+        graph = self.flow.to_networkx()
+        nodes, matrix = self.flow.to_scipy_sparse(weight="count")
+        self.assertEqual(matrix.shape, (len(nodes), len(nodes)))
+        self.assertEqual(matrix.nnz, graph.number_of_edges())
+        self.assertEqual(
+            matrix.sum(), sum(d["count"] for _, _, d in graph.edges(data=True))
+        )
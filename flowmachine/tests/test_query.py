@@ -11,7 +11,7 @@ import pytest
 from unittest import TestCase
 
 from flowmachine.core import CustomQuery, GeoTable
-from flowmachine.core.query import Query
+from flowmachine.core.query import Query, _canonical
 from flowmachine.core.table import Table
 from flowmachine.features import daily_location
 import pickle
@@ -102,3 +102,36 @@ def test_limited_head():
     """Test that we can call head on a query with a limit clause."""
     dl = daily_location("2016-01-01")
     dl.random_sample(2).head()
+
+
+def test_canonical_parameters():
+    """
+    Test that parameters are serialised the same way regardless of the ordering of sets and dict keys.
+    """
+    assert _canonical({"b": {2, 1}, "a": ("x", 1)}) == _canonical(
+        {"a": ("x", 1), "b": {1, 2}}
+    )
+    assert _canonical(["1"]) != _canonical([1])
+
+
+def test_canonical_parameters_keep_sequence_order():
+    """
+    Test that the order of lists and tuples changes how parameters are serialised.
+    """
+    assert _canonical((4, 17)) != _canonical((17, 4))
+    assert _canonical(["x", 1]) != _canonical([1, "x"])
+
+
+def test_md5_of_deep_query_tree():
+    """
+    Test that hashing a deep tree of queries doesn't recurse, and gives the same hash each time.
+    """
+    q = CustomQuery("SELECT 1 AS x")
+    queries = [q]
+    for i in range(2000):
+        q = q.union(CustomQuery(f"SELECT {i} AS x"))
+        queries.append(q)
+    expected = q.md5
+    for query in queries:
+        del query._md5
+    assert q.md5 == expected
@@ -203,6 +203,19 @@ class test_subset_dates(TestCase):
         explain_string = sd.explain()
         self.assertNotIn("calls_20160103", explain_string)
 
+    def test_queries_partitions_directly(self):
+        """
+        EventTableSubset() selects from the relevant daily subtables with hours as timestamp ranges.
+        """
+        sd = EventTableSubset("2016-01-02", "2016-01-03 12:00:00", hours=(20, 5))
+        sql = sd.get_query()
+        self.assertIn("FROM events.calls_20160102", sql)
+        self.assertIn("FROM events.calls_20160103", sql)
+        self.assertNotIn("calls_20160101", sql)
+        self.assertNotIn("calls_20160104", sql)
+        self.assertNotIn("EXTRACT", sql)
+        self.assertIn("datetime >= '2016-01-02 20:00:00'::timestamptz", sql)
+
 
 class test_caching(TestCase):
     """
@@ -284,6 +297,13 @@ class test_unique_subscribers(TestCase):
 
         self.assertTrue(self.UU.get_dataframe()["subscriber"].is_unique)
 
+    def test_encoded_subscribers_give_same_result(self):
+        """
+        UniqueSubscribers() with encoded subscribers returns the same subscribers.
+        """
+        encoded = UniqueSubscribers("2016-01-01", "2016-01-02", encode_subscribers=True)
+        self.assertEqual(self.UU.as_set(), encoded.as_set())
+
 
 class test_last_location(TestCase):
     """
@@ -4,8 +4,11 @@
 
 from unittest import TestCase
 
+import pytest
+
 from flowmachine.core import Table
 from flowmachine.core.custom_query import CustomQuery
+from flowmachine.core.union import UnionAll
 
 
 def test_union_column_names():
@@ -35,3 +38,28 @@ class test_query_union(TestCase):
         union_df = union.get_dataframe()
         single_id = union_df[union_df.id == "5wNJA-PdRJ4-jxEdG-yOXpZ"]
         assert len(single_id) == 2
+
+
+def test_union_all_column_names():
+    """Test that UnionAll's column_names property is accurate"""
+    union = UnionAll(
+        Table("events.calls_20160101"),
+        Table("events.calls_20160102"),
+        Table("events.calls_20160103"),
+    )
+    assert union.head(0).columns.tolist() == union.column_names
+
+
+def test_union_all_matches_chained_union(get_length):
+    """Test that UnionAll gives the same rows as chaining Query.union"""
+    tables = [Table(f"events.calls_2016010{i}") for i in range(1, 5)]
+    chained = tables[0].union(tables[1]).union(tables[2]).union(tables[3])
+    union = UnionAll(*tables)
+    assert get_length(union) == get_length(chained)
+    assert union.dependencies == set(tables)
+
+
+def test_union_all_needs_queries():
+    """Test that UnionAll raises an error if given no queries"""
+    with pytest.raises(ValueError):
+        UnionAll()
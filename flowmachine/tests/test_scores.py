@@ -42,6 +42,47 @@ def test_labelled_event_score_column_names(exemplar_level_param):
     assert labelled.head(0).columns.tolist() == labelled.column_names
 
 
+def test_event_score_hour_of_week_slots():
+    """
+    Test that the default scoring windows give one lookup slot per hour of the week.
+    """
+    es = EventScore(start="2016-01-01", stop="2016-01-05", level="versioned-site")
+    slot_seconds, slots = es._score_slots()
+    assert slot_seconds == 3600
+    assert len(slots) == 168
+    assert slots[24 + 10] == (34, 1, 1)  # Monday, 10am
+    assert slots[6 * 24 + 21] == (165, -1, -1)  # Saturday, 9pm
+
+
+def test_event_score_half_hour_slots():
+    """
+    Test that windows starting on the half hour give half hour lookup slots.
+    """
+    es = EventScore(
+        start="2016-01-01",
+        stop="2016-01-05",
+        score_hour={("09:30", 17): 1, (17, "09:30"): 0},
+        level="versioned-site",
+    )
+    slot_seconds, slots = es._score_slots()
+    assert slot_seconds == 1800
+    assert len(slots) == 336
+    assert [score_hour for _, score_hour, _ in slots[18:20]] == [0, 1]
+
+
+def test_event_score_rejects_sub_minute_windows():
+    """
+    Test that windows which don't start on a whole minute are rejected.
+    """
+    with pytest.raises(ValueError):
+        EventScore(
+            start="2016-01-01",
+            stop="2016-01-05",
+            score_hour={("09:30:15", 17): 1},
+            level="versioned-site",
+        )
+
+
 class TestEventScore(TestCase):
     def setUp(self):
         self.es = EventScore(
@@ -46,3 +46,47 @@ class DistanceMatrixTestCase(TestCase):
         DistanceMatrix() has the correct length.
         """
         self.assertEqual(len(self.df), self.n_sites ** 2)
+
+    def test_max_distance(self):
+        """
+        DistanceMatrix() with max_distance only includes pairs within that distance.
+        """
+        df = DistanceMatrix(level="versioned-site", max_distance=200).get_dataframe()
+        expected = self.df[self.df.distance <= 200]
+        self.assertEqual(len(df), len(expected))
+        self.assertTrue((df.distance <= 200).all())
+
+    def test_k_nearest(self):
+        """
+        DistanceMatrix() with k_nearest includes the nearest other locations to each location.
+        """
+        df = DistanceMatrix(level="versioned-site", k_nearest=3).get_dataframe()
+        self.assertEqual(len(df), self.n_sites * 3)
+        nearest = (
+            self.df[self.df.distance > 0]
+            .sort_values("distance")
+            .groupby(["site_id_from", "version_from"])
+            .head(3)
+        )
+        self.assertAlmostEqual(df.distance.sum(), nearest.distance.sum())
+
+    def test_to_numpy(self):
+        """
+        DistanceMatrix().to_numpy() returns a square array of the distances.
+        """
+        locations, distances = self.c.to_numpy()
+        self.assertEqual(distances.shape, (self.n_sites, self.n_sites))
+        row = self.df.iloc[0]
+        i = locations.index((row.site_id_from, row.version_from))
+        j = locations.index((row.site_id_to, row.version_to))
+        self.assertAlmostEqual(distances[i, j], row.distance)
+
+    def test_to_scipy_sparse(self):
+        """
+        DistanceMatrix().to_scipy_sparse() only holds the computed distances.
+        """
+        locations, distances = DistanceMatrix(
+            level="versioned-site", k_nearest=3
+        ).to_scipy_sparse()
+        self.assertEqual(distances.shape, (len(locations), len(locations)))
+        self.assertEqual(distances.nnz, self.n_sites * 3)
@@ -46,6 +46,22 @@ def test_cell_to_x_mapping_column_names(mapper, args):
     assert instance.head(0).columns.tolist() == instance.column_names
 
 
+def test_cell_mapping_versioned_by_infrastructure(monkeypatch):
+    """Test that cell mappings are specific to the version of the infrastructure table."""
+    mapping = CellToAdmin(level="admin3")
+    monkeypatch.setattr(
+        mapping.connection.__class__,
+        "infrastructure_version",
+        lambda self, table: "DIFFERENT_VERSION",
+    )
+    assert CellToAdmin(level="admin3").md5 != mapping.md5
+
+
+def test_cell_mapping_indexed_on_validity():
+    """Test that cell mappings are indexed on location and validity period."""
+    assert CellToGrid(size=5).index_cols == [("gist", ["location_id", "validity"])]
+
+
 def make_fake_table(con):
     """
     Makes a copy of the admin3 table, but with different
@@ -97,6 +113,7 @@ class TestCellPolygonMapping(TestCase):
             "version",
             "date_of_first_service",
             "date_of_last_service",
+            "validity",
             "naame",
         ]
         df = self.mapping.get_dataframe()
@@ -118,6 +135,7 @@ class TestCellAdminMapping(TestCase):
             "version",
             "date_of_first_service",
             "date_of_last_service",
+            "validity",
             "name",
         ]
         self.assertEqual(mapping.column_names, expected_cols)
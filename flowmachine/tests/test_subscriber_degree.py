@@ -76,3 +76,13 @@ class test_SubscriberDegree(TestCase):
 
         self.assertNotIn("2Dq97XmPqvL6noGk", df1.subscriber.values)
         self.assertEquals(df2.ix["2Dq97XmPqvL6noGk"]["degree"], 1)
+
+    def test_encoded_subscribers_give_same_result(self):
+        """
+        SubscriberDegree() computed on encoded subscribers matches the unencoded result.
+        """
+        encoded = SubscriberDegree("2016-01-01", "2016-01-04", encode_subscribers=True)
+        encoded_df = encoded.get_dataframe().set_index("subscriber").sort_index()
+        pd.testing.assert_frame_equal(
+            self.df.set_index("subscriber").sort_index(), encoded_df
+        )
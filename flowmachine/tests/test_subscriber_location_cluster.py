@@ -24,6 +24,10 @@ from flowmachine.features import (
     SubscriberLocationCluster,
     EventScore,
 )
+from flowmachine.features.subscriber.subscriber_location_cluster import (
+    _hartigan_assign,
+    _spheroid_distance,
+)
 
 
 @pytest.mark.usefixtures("skip_datecheck")
@@ -50,6 +54,40 @@ def test_hartigan_type_error():
         HartiganCluster("fudge", 50)
 
 
+def test_hartigan_engine_error():
+    """Test that Hartigan errors if given an unknown engine"""
+    cd = CallDays("2016-01-01", "2016-01-04", level="versioned-site")
+    with pytest.raises(ValueError):
+        HartiganCluster(cd, 50, engine="fudge")
+
+
+def test_spheroid_distance():
+    """Test that distances match postgis' spheroid distances."""
+    # SELECT ST_Distance('POINT(0 0)'::geography, 'POINT(1 0)'::geography)
+    assert _spheroid_distance(0, 0, 1, 0) == pytest.approx(111319.490793274)
+    assert _spheroid_distance(82.6, 29.8, 82.6, 29.8) == 0
+    assert np.isnan(_spheroid_distance(np.nan, np.nan, 82.6, 29.8))
+
+
+def test_hartigan_assign():
+    """Test that the python Hartigan clustering merges sites within the radius."""
+    clusters = _hartigan_assign(
+        ["a", "b", "c", "d"],
+        [0, 0, 1, 0],
+        [3, 1, 2, 1],
+        np.array([82.6, 82.601, 85.0, np.nan]),
+        np.array([29.8, 29.8, 29.0, np.nan]),
+        np.array([1.0, 1.0, 1.0, 1.0]),
+    )
+    assert [cluster[2:] for cluster in clusters] == [
+        (1, 4, "a::b", "0::0"),
+        (2, 2, "c", "1"),
+        (3, 1, "d", "0"),
+    ]
+    assert clusters[0][0] == pytest.approx((82.6 * 3 + 82.601) / 4)
+    assert clusters[0][1] == pytest.approx(29.8)
+
+
 @pytest.mark.usefixtures("skip_datecheck")
 def test_joined_hartigan_type_error():
     """Test that joining hartigan to something which isn't query like raises a type error."""
@@ -226,6 +264,53 @@ class TestHartiganCluster(TestCase):
             ),
         )
 
+    def test_python_engine_matches_sql_engine(self):
+        """
+        Test that clustering with the python engine gives the same clusters as the sql engine.
+        """
+        for kwargs in ({}, dict(call_threshold=2), dict(buffer=2, call_threshold=2)):
+            sql_df = (
+                HartiganCluster(self.cd, 50, **kwargs)
+                .to_geopandas()
+                .sort_values(["subscriber", "rank"])
+                .reset_index(drop=True)
+            )
+            python_df = (
+                HartiganCluster(self.cd, 50, engine="python", **kwargs)
+                .to_geopandas()
+                .sort_values(["subscriber", "rank"])
+                .reset_index(drop=True)
+            )
+            pd.testing.assert_frame_equal(
+                sql_df.drop(columns=["geometry", "centroid"]),
+                python_df.drop(columns=["geometry", "centroid"]),
+            )
+            self.assertTrue(
+                sql_df.geometry.geom_equals_exact(python_df.geometry, 1e-9).all()
+            )
+
+    def test_python_engine_small_batches(self):
+        """
+        Test that the python engine gives the same clusters when writing them out in many small batches.
+        """
+        hartigan = HartiganCluster(self.cd, 50, engine="python")
+        hartigan.assignments.batch_size = 10
+        hartigan.assignments.max_workers = 1
+        python_df = (
+            hartigan.get_dataframe()
+            .sort_values(["subscriber", "rank"])
+            .reset_index(drop=True)
+        )
+        sql_df = (
+            self.hartigan.get_dataframe()
+            .sort_values(["subscriber", "rank"])
+            .reset_index(drop=True)
+        )
+        pd.testing.assert_frame_equal(
+            sql_df[["subscriber", "rank", "calldays", "site_id", "version"]],
+            python_df[["subscriber", "rank", "calldays", "site_id", "version"]],
+        )
+
     def test_join_returns_the_same_clusters(self):
         """
         Test whether joining to another table for which the start and stop time are the same yields the same clusters.
@@ -3,7 +3,13 @@
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
 
-from flowmachine.features.utilities.subscriber_locations import subscriber_locations
+import pandas as pd
+
+from flowmachine.features import MostFrequentLocation, LastLocation
+from flowmachine.features.utilities.subscriber_locations import (
+    subscriber_locations,
+    _SubscriberCellVisits,
+)
 
 
 def test_can_get_pcods(get_dataframe):
@@ -20,3 +26,103 @@ def test_can_get_pcods(get_dataframe):
     )
     df = get_dataframe(subscriber_pcod)
     assert df.admin3pcod[0].startswith("524")
+
+
+def test_subscriber_locations_reads_events(flowmachine_connect):
+    """
+    subscriber_locations() reads event times from the events tables, not the location summary.
+    """
+    sl = subscriber_locations("2016-01-01", "2016-01-02", table="events.calls")
+    assert "events.subscriber_location_summary" not in sl.get_query()
+
+
+def test_cell_visits_match_events(get_dataframe, monkeypatch):
+    """
+    Counting subscriber sightings from the location summary gives the same result as counting events.
+    """
+    sl = subscriber_locations("2016-01-01", "2016-01-03", table="events.calls")
+    visits = _SubscriberCellVisits(sl)
+    assert "events.subscriber_location_summary" in visits.get_query()
+    from_summary = get_dataframe(visits)
+    monkeypatch.setattr(visits.connection, "_summarised_dates", lambda table: [])
+    assert "events.subscriber_location_summary" not in visits.get_query()
+    from_events = get_dataframe(visits)
+
+    key = ["subscriber", "date", "location_id"]
+    assert len(from_summary) > 0
+    pd.testing.assert_frame_equal(
+        from_summary.sort_values(key).reset_index(drop=True),
+        from_events.sort_values(key).reset_index(drop=True),
+    )
+
+
+def test_location_summary_not_used_for_partial_hours(flowmachine_connect):
+    """
+    Subscriber sightings are counted from the events tables if start or stop are not on the hour.
+    """
+    sl = subscriber_locations(
+        "2016-01-01 13:30:30", "2016-01-02 16:25:00", table="events.calls"
+    )
+    assert (
+        "events.subscriber_location_summary"
+        not in _SubscriberCellVisits(sl).get_query()
+    )
+
+
+def test_cell_level_last_location_matches_events(get_dataframe, monkeypatch):
+    """
+    LastLocation at the cell level gives the same result with or without the location summary.
+    """
+    ll = LastLocation("2016-01-01", "2016-01-03", level="cell")
+    assert "events.subscriber_location_summary" in ll.get_query()
+    from_summary = get_dataframe(ll)
+    monkeypatch.setattr(ll.connection, "_summarised_dates", lambda table: [])
+    assert "events.subscriber_location_summary" not in ll.get_query()
+    from_events = get_dataframe(ll)
+    assert len(from_summary) > 0
+    pd.testing.assert_frame_equal(
+        from_summary.sort_values("subscriber").reset_index(drop=True),
+        from_events.sort_values("subscriber").reset_index(drop=True),
+    )
+
+
+def test_most_frequent_location_is_most_visited(get_dataframe):
+    """
+    MostFrequentLocation picks a location each subscriber visited most often.
+    """
+    mfl = MostFrequentLocation("2016-01-01", "2016-01-02", level="admin3")
+    visits = (
+        get_dataframe(mfl.subscriber_locs)
+        .groupby(["subscriber", "name"])
+        .size()
+        .rename("total")
+        .reset_index()
+    )
+    most_visits = visits.groupby("subscriber").total.max()
+    df = get_dataframe(mfl).merge(visits, on=["subscriber", "name"])
+    assert len(df) == len(most_visits)
+    assert (df.set_index("subscriber").total == most_visits[df.subscriber]).all()
+
+
+def test_last_location_is_latest(get_dataframe):
+    """
+    LastLocation picks the location of each subscriber's latest event.
+    """
+    ll = LastLocation("2016-01-01", "2016-01-02", level="admin3")
+    locs = get_dataframe(ll.subscriber_locs)
+    latest = locs[locs.time == locs.groupby("subscriber").time.transform("max")]
+    df = get_dataframe(ll)
+    assert len(df) == locs.subscriber.nunique()
+    assert set(zip(df.subscriber, df.name)) <= set(zip(latest.subscriber, latest.name))
+
+
+def test_subscriber_locations_indexed_for_last_location():
+    """
+    Stored subscriber locations are indexed on subscriber and time, to support picking the latest.
+    """
+    assert ["subscriber", "time"] in subscriber_locations(
+        "2016-01-01", "2016-01-02", level="admin3"
+    ).index_cols
+    assert ["subscriber", "time"] in subscriber_locations(
+        "2016-01-01", "2016-01-02", level="cell"
+    ).index_cols
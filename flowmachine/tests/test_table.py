@@ -1,4 +1,5 @@
 import pickle
+from unittest.mock import Mock
 
 import pytest
 
@@ -99,3 +100,43 @@ def test_pickling():
     )
     assert ss.get_query() == pickle.loads(pickle.dumps(ss)).get_query()
     assert ss.md5 == pickle.loads(pickle.dumps(ss)).md5
+
+
+def test_table_columns_from_catalog(flowmachine_connect, monkeypatch):
+    """
+    Test that tables which have been seen before are created without querying the database for their columns.
+    """
+    Table("events.calls")
+    fetch = Mock(wraps=flowmachine_connect.fetch)
+    monkeypatch.setattr(flowmachine_connect, "fetch", fetch)
+    t = Table("events.calls", columns=["id", "msisdn"])
+    assert t.parent_table.columns == flowmachine_connect.catalog.columns(
+        "calls", "events"
+    )
+    assert not any("information_schema" in call[0][0] for call in fetch.call_args_list)
+
+
+def test_catalog_invalidation(flowmachine_connect):
+    """
+    Test that invalidating the catalog removes only the requested tables.
+    """
+    Table("events.calls")
+    Table("geography.admin3")
+    catalog = flowmachine_connect.catalog
+    catalog.invalidate("calls", "events")
+    assert ("events", "calls") not in catalog._columns
+    assert ("geography", "admin3") in catalog._columns
+    catalog.invalidate(schema="geography")
+    assert ("geography", "admin3") not in catalog._columns
+    assert catalog.has_table("calls", "events")
+    assert not catalog.has_table("NOSUCHTABLE", "events")
+
+
+def test_table_recorded_again_after_invalidation():
+    """
+    Test that a table is added back to the cache metadata after its record is invalidated.
+    """
+    t = Table("events.calls")
+    t.invalidate_db_cache()
+    t = Table("events.calls")
+    assert t.connection.fetch(f"SELECT * FROM cache.cached WHERE query_id='{t.md5}'")
@@ -72,3 +72,15 @@ class test_TotalSubscriberEvents(TestCase):
             .set_index("subscriber")
         )
         self.assertEqual(df.ix["038OVABN11Ak4W5P"][0], 3)
+
+    def test_parallel_gives_same_result(self):
+        """
+        TotalSubscriberEvents() gives the same counts when computed in parallel.
+        """
+        tse = TotalSubscriberEvents("2016-01-01", "2016-01-04", parallel=True)
+        tse.store().result()
+        self.assertTrue(all(partial.is_stored for partial in tse.counts.partials))
+        df = tse.get_dataframe().set_index("subscriber")
+        pd.testing.assert_series_equal(
+            df.total.sort_index(), self.df.set_index("subscriber").total.sort_index()
+        )
@@ -18,6 +18,7 @@ from flowmachine.utils.utils import (
     proj4string,
     get_columns_for_level,
     getsecret,
+    redis_pipeline,
 )
 
 from flowmachine.utils import time_period_add
@@ -161,3 +162,27 @@ def test_get_secrets_default(monkeypatch):
     the_secret_name = "SECRET"
     secret = getsecret(the_secret_name, the_secret)
     assert the_secret == secret
+
+
+def test_redis_pipeline_executes_on_exit():
+    """Test that commands sent through a redis pipeline are executed together when the block exits."""
+    redis_client = unittest.mock.Mock()
+    pipe = redis_client.pipeline.return_value
+    with redis_pipeline(redis_client) as p:
+        p.set("a", 1)
+        p.set("b", 2)
+        pipe.execute.assert_not_called()
+    redis_client.pipeline.assert_called_once_with(transaction=False)
+    pipe.execute.assert_called_once_with()
+
+
+def test_redis_pipeline_discards_on_error():
+    """Test that commands sent through a redis pipeline are not executed if the block raises."""
+    redis_client = unittest.mock.Mock()
+    pipe = redis_client.pipeline.return_value
+    with pytest.raises(ValueError):
+        with redis_pipeline(redis_client) as p:
+            p.set("a", 1)
+            raise ValueError
+    pipe.execute.assert_not_called()
+    pipe.reset.assert_called_once_with()